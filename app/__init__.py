@@ -1,9 +1,22 @@
+import logging
 import os
 
+import click
 from flask import Flask, redirect, url_for
-from sqlalchemy import inspect
 
+from .engine_profiles import install_fork_safety, install_sqlite_pragmas, resolve_profile
 from .extensions import db, login_manager
+from .migrations import upgrade as upgrade_schema
+from .migrations import upgrade_if_needed
+from .replicas import ReplicaSet, install_read_replicas, replica_bind_keys, sync_sqlite_replicas
+from .services.audit import install_audit_log
+from .services.costs import install_cost_rollups, rebuild_rollups
+from .services.search import install_search_indexing, rebuild_search_index
+from .services.table_versions import install_table_versions
+from .utils.loading import install_lazy_load_guard
+from .utils.metrics import install_instrumentation, instrument_engine
+from .utils.pubsub import init_pubsub
+from .utils.response_cache import init_response_cache
 
 
 def create_app():
@@ -26,34 +39,239 @@ def create_app():
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # профиль движка БД: пул для PostgreSQL, PRAGMA для SQLite
+    app.config["DB_PROFILE"] = os.environ.get("DB_PROFILE", "production")
+    app.config["DB_ENGINE_PROFILE"] = resolve_profile(app.config["DB_PROFILE"], db_url, os.environ)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = app.config["DB_ENGINE_PROFILE"]["engine_options"]
+
+    # реплики только для чтения (через запятую): на них уходят GET-запросы
+    replica_urls = [
+        url.strip().replace("postgres://", "postgresql://", 1)
+        for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",")
+        if url.strip()
+    ]
+    app.config["SQLALCHEMY_BINDS"] = replica_bind_keys(replica_urls)
+    # реплика с отставанием больше REPLICA_MAX_LAG секунд не используется;
+    # отставание проверяется раз в REPLICA_CHECK_INTERVAL секунд
+    app.config["REPLICA_MAX_LAG"] = float(os.environ.get("REPLICA_MAX_LAG", 10))
+    app.config["REPLICA_CHECK_INTERVAL"] = float(os.environ.get("REPLICA_CHECK_INTERVAL", 5))
+    # после запроса с записью пользователь столько секунд читает с основной БД
+    app.config["READ_YOUR_WRITES_SECONDS"] = float(os.environ.get("READ_YOUR_WRITES_SECONDS", 10))
+
+    # время жизни кэша счётчиков дашборда, секунд (0 — без кэша)
+    app.config["DASHBOARD_STATS_TTL"] = float(os.environ.get("DASHBOARD_STATS_TTL", 30))
+    # сводки проектов кэшируются по версиям таблиц; TTL лишь ограничивает память
+    app.config["PROJECT_SUMMARY_TTL"] = float(os.environ.get("PROJECT_SUMMARY_TTL", 300))
+    # размер страницы списков по умолчанию
+    app.config["LIST_PAGE_SIZE"] = int(os.environ.get("LIST_PAGE_SIZE", 50))
+    # отладка N+1: исключение при ленивой загрузке связи из шаблона
+    app.config["RAISE_ON_TEMPLATE_LAZY_LOAD"] = os.environ.get("RAISE_ON_TEMPLATE_LAZY_LOAD") == "1"
+    # применять миграции схемы при старте (иначе: flask db-upgrade)
+    app.config["AUTO_MIGRATE"] = os.environ.get("AUTO_MIGRATE", "1") == "1"
+    # кэш пользователей для user_loader: размер и время жизни, секунд
+    app.config["USER_CACHE_SIZE"] = int(os.environ.get("USER_CACHE_SIZE", 1024))
+    app.config["USER_CACHE_TTL"] = float(os.environ.get("USER_CACHE_TTL", 60))
+    # полнотекстовый поиск: обновление индекса при записи и размер выдачи
+    app.config["SEARCH_ENABLED"] = os.environ.get("SEARCH_ENABLED", "1") == "1"
+    app.config["SEARCH_RESULTS_LIMIT"] = int(os.environ.get("SEARCH_RESULTS_LIMIT", 50))
+    # выгрузки: сколько строк читать из курсора за раз
+    app.config["EXPORT_BATCH_SIZE"] = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+    # импорт: размер порции строк на один коммит
+    app.config["IMPORT_CHUNK_SIZE"] = int(os.environ.get("IMPORT_CHUNK_SIZE", 1000))
+    # Telegram-бот: свой пул соединений и число параллельно обрабатываемых обновлений
+    app.config["BOT_DB_POOL_SIZE"] = int(os.environ.get("BOT_DB_POOL_SIZE", 4))
+    app.config["BOT_DB_POOL_TIMEOUT"] = float(os.environ.get("BOT_DB_POOL_TIMEOUT", 10))
+    app.config["BOT_CONCURRENT_UPDATES"] = int(os.environ.get("BOT_CONCURRENT_UPDATES", 32))
+    # уведомления о дедлайнах (работают в процессе бота)
+    app.config["NOTIFY_ENABLED"] = os.environ.get("NOTIFY_ENABLED", "1") == "1"
+    app.config["NOTIFY_INTERVAL"] = float(os.environ.get("NOTIFY_INTERVAL", 300))
+    app.config["NOTIFY_WINDOWS"] = tuple(
+        int(d) for d in os.environ.get("NOTIFY_WINDOWS", "1,3").split(",") if d.strip()
+    )
+    app.config["NOTIFY_OVERDUE_DAYS"] = int(os.environ.get("NOTIFY_OVERDUE_DAYS", 7))
+    app.config["NOTIFY_ROLES"] = tuple(
+        r.strip() for r in os.environ.get("NOTIFY_ROLES", "admin,manager").split(",") if r.strip()
+    )
+    app.config["NOTIFY_RATE"] = int(os.environ.get("NOTIFY_RATE", 20))
+    # инструментация: Server-Timing, JSON-лог запросов, /metrics, лог медленных SQL
+    app.config["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "1") == "1"
+    app.config["SERVER_TIMING"] = os.environ.get("SERVER_TIMING", "1") == "1"
+    app.config["REQUEST_LOG"] = os.environ.get("REQUEST_LOG", "1") == "1"
+    app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 200))
+    # Bearer-токен для /metrics; без него метрики видит только администратор
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+    # кэш фрагментов страниц: memory (LRU процесса), disk (общий каталог) или none
+    app.config["RESPONSE_CACHE"] = os.environ.get("RESPONSE_CACHE", "memory")
+    app.config["RESPONSE_CACHE_DIR"] = os.environ.get(
+        "RESPONSE_CACHE_DIR", os.path.join(app.instance_path, "fragment-cache")
+    )
+    app.config["RESPONSE_CACHE_SIZE"] = int(os.environ.get("RESPONSE_CACHE_SIZE", 512))
+    app.config["RESPONSE_CACHE_TTL"] = float(os.environ.get("RESPONSE_CACHE_TTL", 600))
+    # журнал изменений: async (фоновая запись пачками), sync (в транзакции правки) или off
+    app.config["AUDIT_MODE"] = os.environ.get("AUDIT_MODE", "async")
+    app.config["AUDIT_BATCH_SIZE"] = int(os.environ.get("AUDIT_BATCH_SIZE", 500))
+    app.config["AUDIT_FLUSH_INTERVAL"] = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 1.0))
+    # живые комментарии (SSE): очередь подписчика, keepalive с опросом БД, время жизни потока
+    app.config["PUBSUB_QUEUE_SIZE"] = int(os.environ.get("PUBSUB_QUEUE_SIZE", 100))
+    app.config["SSE_KEEPALIVE"] = float(os.environ.get("SSE_KEEPALIVE", 15))
+    app.config["SSE_MAX_SECONDS"] = float(os.environ.get("SSE_MAX_SECONDS", 300))
+    app.config["SSE_RETRY_MS"] = int(os.environ.get("SSE_RETRY_MS", 3000))
+    # открытых потоков SSE на процесс (каждый держит поток воркера до SSE_MAX_SECONDS);
+    # сверх лимита поток отвечает 204, и страница раз в COMMENTS_POLL_SECONDS
+    # опрашивает comments.json. gunicorn_conf.py и asgi.py задают лимит по режиму
+    app.config["SSE_MAX_STREAMS"] = int(os.environ.get("SSE_MAX_STREAMS", 2))
+    app.config["COMMENTS_POLL_SECONDS"] = float(os.environ.get("COMMENTS_POLL_SECONDS", 15))
+    # поток перечитывает комментарии, созданные за последние SSE_REREAD_SECONDS:
+    # так доходят и те, чья транзакция закоммитилась позже комментария с большим id
+    app.config["SSE_REREAD_SECONDS"] = float(os.environ.get("SSE_REREAD_SECONDS", 30))
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    )
+
     db.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config["DB_ENGINE_PROFILE"]["sqlite_pragmas"])
+        install_instrumentation(app, db.engine)
+        install_fork_safety(db.engine)
+        install_audit_log(app, db.engine)
+        if app.config["SQLALCHEMY_BINDS"]:
+            replica_engines = {key: db.engines[key] for key in app.config["SQLALCHEMY_BINDS"]}
+            for key, engine in replica_engines.items():
+                profile = resolve_profile(app.config["DB_PROFILE"], engine.url, os.environ)
+                install_sqlite_pragmas(engine, profile["sqlite_pragmas"])
+                instrument_engine(app, engine)
+                install_fork_safety(engine)
+            install_read_replicas(app, ReplicaSet(
+                replica_engines,
+                db.engine,
+                max_lag=app.config["REPLICA_MAX_LAG"],
+                check_interval=app.config["REPLICA_CHECK_INTERVAL"],
+            ))
+    install_lazy_load_guard(app)
+    install_search_indexing(app)
+    install_cost_rollups(app)
+    install_table_versions(app)
+    init_response_cache(app)
+    init_pubsub(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
+    # API отвечает 401 вместо редиректа на форму входа
+    login_manager.blueprint_login_views["api"] = None
 
     @login_manager.user_loader
     def load_user(user_id):
-        from .models import User
-        return User.query.get(int(user_id))
+        from .services.user_cache import load_user_identity
+        return load_user_identity(int(user_id))
 
     with app.app_context():
         from . import models  # noqa
 
-        # ТОЛЬКО если БД пустая — создать таблицы
-        inspector = inspect(db.engine)
-        if not inspector.get_table_names():
-            db.create_all()
+        # новые таблицы, недостающие индексы и миграции; если отпечаток
+        # текущих моделей уже записан в БД — один SELECT без инспекции схемы
+        if app.config["AUTO_MIGRATE"]:
+            upgrade_if_needed(db.engine, db.metadata)
 
         from .views.dashboard import bp as dashboard_bp
         from .views.projects import bp as projects_bp
         from .views.tasks import bp as tasks_bp
         from .views.materials import bp as materials_bp
         from .views.auth import bp as auth_bp
+        from .views.search import bp as search_bp
+        from .views.export import bp as export_bp
+        from .views.costs import bp as costs_bp
+        from .views.diagnostics import bp as diagnostics_bp
+        from .views.metrics import bp as metrics_bp
+        from .views.api import bp as api_bp
+        from .views.timeline import bp as timeline_bp
+        from .views.audit import bp as audit_bp
 
         app.register_blueprint(dashboard_bp)
         app.register_blueprint(projects_bp)
         app.register_blueprint(tasks_bp)
         app.register_blueprint(materials_bp)
         app.register_blueprint(auth_bp)
+        app.register_blueprint(search_bp)
+        app.register_blueprint(export_bp)
+        app.register_blueprint(costs_bp)
+        app.register_blueprint(diagnostics_bp)
+        app.register_blueprint(metrics_bp)
+        app.register_blueprint(api_bp)
+        app.register_blueprint(timeline_bp)
+        app.register_blueprint(audit_bp)
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Применяет индексы и миграции схемы к текущей БД"""
+        created, applied = upgrade_schema(db.engine, db.metadata)
+        click.echo(f"indexes created: {', '.join(created) or '-'}")
+        click.echo(f"migrations applied: {', '.join(applied) or '-'}")
+
+    @app.cli.command("db-replica-sync")
+    def db_replica_sync():
+        """Копирует основную SQLite-БД в SQLite-реплики (локальная проверка реплик)"""
+        replica_engines = {key: db.engines[key] for key in app.config["SQLALCHEMY_BINDS"]}
+        synced = sync_sqlite_replicas(db.engine, replica_engines)
+        click.echo(f"replicas synced: {', '.join(synced) or '-'}")
+
+    @app.cli.command("search-rebuild")
+    def search_rebuild():
+        """Перестраивает полнотекстовый индекс с нуля"""
+        with db.engine.begin() as conn:
+            rebuild_search_index(conn)
+        click.echo("search index rebuilt")
+
+    @app.cli.command("costs-rebuild")
+    def costs_rebuild():
+        """Пересчитывает материализованные стоимости проектов с нуля"""
+        with db.engine.begin() as conn:
+            rebuild_rollups(conn)
+        click.echo("cost rollups rebuilt")
+
+    @app.cli.command("audit-prune")
+    @click.option("--keep-months", type=int, default=12, show_default=True)
+    def audit_prune(keep_months):
+        """Удаляет из журнала изменений месяцы старше --keep-months"""
+        from .services.audit import prune
+
+        with db.engine.begin() as conn:
+            removed = prune(conn, keep_months)
+        click.echo(f"audit events removed: {removed}")
+
+    def _run_import(import_fn, path, fmt):
+        from .services import importer
+
+        fmt = fmt or path.rsplit(".", 1)[-1].lower()
+        if fmt not in importer.IMPORT_FORMATS:
+            raise click.BadParameter("expected a .csv or .jsonl file", param_hint="PATH")
+        with open(path, "rb") as stream:
+            report = import_fn(
+                importer.read_rows(stream, fmt),
+                chunk_size=app.config["IMPORT_CHUNK_SIZE"],
+            )
+        for line_num, message in report.errors:
+            click.echo(f"line {line_num}: {message}", err=True)
+        click.echo(
+            f"created={report.created} updated={report.updated} errors={len(report.errors)} "
+            f"elapsed={report.elapsed:.2f}s rate={report.rows_per_second:.0f} rows/s"
+        )
+
+    @app.cli.command("import-materials")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]))
+    def import_materials_command(path, fmt):
+        """Импорт/обновление материалов из CSV или JSONL"""
+        from .services.importer import import_materials
+        _run_import(import_materials, path, fmt)
+
+    @app.cli.command("import-tasks")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]))
+    def import_tasks_command(path, fmt):
+        """Импорт задач из CSV или JSONL"""
+        from .services.importer import import_tasks
+        _run_import(import_tasks, path, fmt)
 
     @app.route("/health")
     def health():
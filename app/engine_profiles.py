@@ -0,0 +1,150 @@
+# app/engine_profiles.py
+#
+# Профили настроек движка БД по окружениям (DB_PROFILE):
+# пул соединений для PostgreSQL и PRAGMA на каждое соединение для SQLite.
+
+import os
+import weakref
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+
+# WAL: читатели не блокируют писателя и наоборот; synchronous=NORMAL
+# в WAL-режиме безопасен при падении процесса; busy_timeout вместо
+# мгновенного "database is locked"; cache_size < 0 — размер в КиБ
+_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+}
+
+PROFILES = {
+    "development": {
+        "postgresql": {
+            "pool_size": 5,
+            "max_overflow": 5,
+            "pool_timeout": 10,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+        },
+        "sqlite": dict(_SQLITE_PRAGMAS),
+    },
+    "production": {
+        "postgresql": {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+            "pool_pre_ping": True,
+            # меньше, чем idle-таймауты PgBouncer/облачных балансировщиков
+            "pool_recycle": 1800,
+            "pool_use_lifo": True,
+        },
+        "sqlite": dict(_SQLITE_PRAGMAS),
+    },
+    "test": {
+        "postgresql": {
+            "pool_size": 2,
+            "max_overflow": 0,
+            "pool_pre_ping": False,
+        },
+        "sqlite": dict(_SQLITE_PRAGMAS, synchronous="OFF", mmap_size=0),
+    },
+}
+
+# переменные окружения, перекрывающие значения профиля для PostgreSQL
+_POOL_ENV_OVERRIDES = {
+    "DB_POOL_SIZE": ("pool_size", int),
+    "DB_MAX_OVERFLOW": ("max_overflow", int),
+    "DB_POOL_TIMEOUT": ("pool_timeout", float),
+    "DB_POOL_RECYCLE": ("pool_recycle", int),
+}
+
+
+def _backend(database_url):
+    return make_url(database_url).get_backend_name()
+
+
+def resolve_profile(name, database_url, environ):
+    """
+    Настройки профиля для диалекта URL:
+    {"engine_options": {...}, "sqlite_pragmas": {...}}.
+    """
+    if name not in PROFILES:
+        raise ValueError(f"unknown DB_PROFILE {name!r}, expected one of {sorted(PROFILES)}")
+    profile = PROFILES[name]
+    backend = _backend(database_url)
+
+    if backend == "postgresql":
+        options = dict(profile["postgresql"])
+        for env_name, (option, cast) in _POOL_ENV_OVERRIDES.items():
+            if environ.get(env_name):
+                options[option] = cast(environ[env_name])
+        return {"engine_options": options, "sqlite_pragmas": {}}
+
+    if backend == "sqlite":
+        pragmas = dict(profile["sqlite"])
+        if environ.get("SQLITE_BUSY_TIMEOUT"):
+            pragmas["busy_timeout"] = int(environ["SQLITE_BUSY_TIMEOUT"])
+        return {"engine_options": {}, "sqlite_pragmas": pragmas}
+
+    return {"engine_options": {}, "sqlite_pragmas": {}}
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """PRAGMA выполняются на каждом новом соединении пула"""
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def install_fork_safety(engine):
+    """
+    gunicorn --preload создаёт приложение в master-процессе, и пул
+    соединений копируется в каждый воркер при fork(). В дочернем процессе
+    пул сбрасывается без закрытия унаследованных сокетов: ими продолжает
+    владеть родитель.
+    """
+    if not hasattr(os, "register_at_fork"):
+        return
+    engine_ref = weakref.ref(engine)
+
+    def _dispose_in_child():
+        engine = engine_ref()
+        if engine is not None:
+            engine.dispose(close=False)
+
+    os.register_at_fork(after_in_child=_dispose_in_child)
+
+
+def describe_engine(engine, profile_name, profile):
+    """Фактическое состояние движка для диагностики"""
+    info = {
+        "profile": profile_name,
+        "dialect": engine.dialect.name,
+        "driver": engine.dialect.driver,
+        "pool_class": type(engine.pool).__name__,
+        "pool_status": engine.pool.status(),
+        "engine_options": profile["engine_options"],
+    }
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            info["sqlite_pragmas"] = {
+                name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                for name in profile["sqlite_pragmas"]
+            }
+            info["sqlite_version"] = conn.execute(text("select sqlite_version()")).scalar()
+        elif engine.dialect.name == "postgresql":
+            info["server_version"] = conn.execute(text("SHOW server_version")).scalar()
+            info["max_connections"] = conn.execute(text("SHOW max_connections")).scalar()
+    return info
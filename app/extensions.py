@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 
-db = SQLAlchemy()
-login_manager = LoginManager()
\ No newline at end of file
+from app.replicas import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+login_manager = LoginManager()
@@ -0,0 +1,188 @@
+# app/migrations.py
+#
+# Лёгкие миграции схемы поверх create_all(): существующие таблицы
+# не пересоздаются, недостающие индексы и новые таблицы добавляются на месте.
+
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.schema import CreateIndex
+
+_migrations_table = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("name", String(255), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# версионные миграции (имя, функция(connection)) в порядке применения —
+# для изменений, которые нельзя вывести из моделей: новые колонки, перенос данных
+MIGRATIONS = []
+
+
+def migration(name):
+    """Регистрирует функцию как миграцию с уникальным именем"""
+    def decorator(fn):
+        MIGRATIONS.append((name, fn))
+        return fn
+    return decorator
+
+
+def upgrade(engine, metadata):
+    """
+    Приводит БД к моделям:
+    1. create_all — только отсутствующие таблицы;
+    2. индексы из моделей, которых ещё нет в существующих таблицах;
+    3. ещё не применённые миграции из MIGRATIONS;
+    4. строки table_versions для новых таблиц.
+
+    Возвращает (созданные индексы, применённые миграции).
+    """
+    metadata.create_all(engine)
+    created = ensure_indexes(engine, metadata)
+    applied = _apply_migrations(engine)
+    _seed_table_versions(engine, metadata)
+    _record_fingerprint(engine, schema_fingerprint(metadata))
+    return created, applied
+
+
+def upgrade_if_needed(engine, metadata):
+    """
+    upgrade() только если БД ещё не видела текущую версию моделей.
+
+    Проверка — один SELECT по отпечатку схемы вместо инспекции всех
+    таблиц и индексов, поэтому воркеры стартуют без лишних обращений к БД.
+    Возвращает None, если обновлять нечего.
+    """
+    fingerprint = schema_fingerprint(metadata)
+    try:
+        with engine.connect() as conn:
+            found = conn.execute(
+                select(_migrations_table.c.name).where(_migrations_table.c.name == fingerprint)
+            ).first()
+    except DBAPIError:
+        # schema_migrations ещё нет
+        found = None
+    if found is not None:
+        return None
+    return upgrade(engine, metadata)
+
+
+def schema_fingerprint(metadata):
+    """Отпечаток таблиц, колонок и индексов моделей вместе со списком миграций"""
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(f"table {table.name}\n".encode())
+        for column in table.columns:
+            digest.update(
+                f"column {column.name} {type(column.type).__name__} {column.nullable}\n".encode()
+            )
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            columns = ",".join(c.name for c in index.columns)
+            digest.update(f"index {index.name} {columns} {index.unique}\n".encode())
+    for name, _ in MIGRATIONS:
+        digest.update(f"migration {name}\n".encode())
+    return f"schema:{digest.hexdigest()[:16]}"
+
+
+def _seed_table_versions(engine, metadata):
+    from .services.table_versions import seed_table_versions
+
+    try:
+        with engine.begin() as conn:
+            seed_table_versions(conn, metadata.tables)
+    except IntegrityError:
+        # строки параллельно завёл другой воркер
+        pass
+
+
+def _record_fingerprint(engine, fingerprint):
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                _migrations_table.insert().values(name=fingerprint, applied_at=datetime.utcnow())
+            )
+    except IntegrityError:
+        pass
+
+
+def ensure_indexes(engine, metadata):
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    created = []
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            _create_index(engine, index)
+            created.append(index.name)
+    return created
+
+
+def _create_index(engine, index):
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY не блокирует запись в таблицу, но требует autocommit
+        ddl = ddl.replace("INDEX ", "INDEX CONCURRENTLY ", 1)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(ddl))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(ddl))
+
+
+def _apply_migrations(engine):
+    _migrations_table.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        done = set(conn.execute(select(_migrations_table.c.name)).scalars())
+
+    applied = []
+    for name, fn in MIGRATIONS:
+        if name in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                fn(conn)
+                conn.execute(
+                    _migrations_table.insert().values(name=name, applied_at=datetime.utcnow())
+                )
+        except IntegrityError:
+            # миграцию параллельно применил другой воркер
+            continue
+        applied.append(name)
+    return applied
+
+
+@migration("0001_search_index")
+def _search_index(conn):
+    from .services.search import create_search_index
+    create_search_index(conn)
+
+
+@migration("0002_cost_rollups")
+def _cost_rollups(conn):
+    from .services.costs import rebuild_rollups
+    rebuild_rollups(conn)
+
+
+@migration("0003_inventory")
+def _inventory(conn):
+    # колонка резерва в существующей таблице materials; create_all её не добавит
+    columns = {c["name"] for c in inspect(conn).get_columns("materials")}
+    if "reserved_quantity" not in columns:
+        conn.execute(text(
+            "ALTER TABLE materials ADD COLUMN reserved_quantity FLOAT NOT NULL DEFAULT 0"
+        ))
+    conn.execute(text("UPDATE materials SET stock_quantity = 0 WHERE stock_quantity IS NULL"))
+    # начальные остатки — движения инвентаризации, чтобы журнал сходился со снимком
+    conn.execute(text(
+        "INSERT INTO stock_movements "
+        "(material_id, project_id, kind, quantity, on_hand_after, reserved_after, note, created_at) "
+        "SELECT id, NULL, 'adjust', stock_quantity, stock_quantity, 0, :note, :now "
+        "FROM materials WHERE stock_quantity <> 0"
+    ), {"note": "Начальный остаток", "now": datetime.utcnow()})
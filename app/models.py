@@ -7,8 +7,10 @@ from flask_login import UserMixin
 from .extensions import db
 
 
+PROJECT_STATUS_CHOICES = ("active", "on_hold", "closed")
 TASK_STATUS_CHOICES = ("to_do", "in_progress", "done")
 TASK_PRIORITY_CHOICES = ("low", "medium", "high")
+STOCK_MOVEMENT_KINDS = ("receipt", "reserve", "consume", "release", "adjust")
 
 
 class User(UserMixin, db.Model):
@@ -43,6 +45,16 @@ class User(UserMixin, db.Model):
 
 class Project(db.Model):
     __tablename__ = "projects"
+    __table_args__ = (
+        # список по дате создания, фильтр по статусу + та же сортировка,
+        # GROUP BY status на дашборде читается из индекса
+        db.Index("ix_projects_created_at_id", "created_at", "id"),
+        db.Index("ix_projects_status_created_at_id", "status", "created_at", "id"),
+        db.Index("ix_projects_name_id", "name", "id"),
+        db.Index("ix_projects_client", "client"),
+        # диапазонные выборки по дедлайну для уведомлений
+        db.Index("ix_projects_deadline_status", "deadline", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
@@ -81,6 +93,16 @@ class Project(db.Model):
 
 class Task(db.Model):
     __tablename__ = "tasks"
+    __table_args__ = (
+        db.Index("ix_tasks_created_at_id", "created_at", "id"),
+        db.Index("ix_tasks_project_id_created_at_id", "project_id", "created_at", "id"),
+        db.Index("ix_tasks_status_created_at_id", "status", "created_at", "id"),
+        db.Index("ix_tasks_priority_created_at_id", "priority", "created_at", "id"),
+        db.Index("ix_tasks_title_id", "title", "id"),
+        # покрывающий индекс для GROUP BY status, priority на дашборде
+        db.Index("ix_tasks_status_priority", "status", "priority"),
+        db.Index("ix_tasks_end_date_status", "end_date", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -110,12 +132,18 @@ class Task(db.Model):
 
 class Material(db.Model):
     __tablename__ = "materials"
+    __table_args__ = (
+        db.Index("ix_materials_name_id", "name", "id"),
+        db.Index("ix_materials_created_at_id", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     unit = db.Column(db.String(50), nullable=False)
     price_per_unit = db.Column(db.Float, nullable=False)
     stock_quantity = db.Column(db.Float, default=0)
+    # зарезервировано под проекты; меняется только через app/services/inventory.py
+    reserved_quantity = db.Column(db.Float, nullable=False, default=0, server_default="0")
     description = db.Column(db.Text, nullable=True)
 
     project_materials = db.relationship(
@@ -137,6 +165,10 @@ class Material(db.Model):
 
 class ProjectMaterial(db.Model):
     __tablename__ = "project_materials"
+    __table_args__ = (
+        db.Index("ix_project_materials_project_id_material_id", "project_id", "material_id"),
+        db.Index("ix_project_materials_material_id", "material_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     quantity = db.Column(db.Float, nullable=False)
@@ -157,6 +189,10 @@ class ProjectMaterial(db.Model):
 
 class Comment(db.Model):
     __tablename__ = "comments"
+    __table_args__ = (
+        db.Index("ix_comments_project_id_created_at_id", "project_id", "created_at", "id"),
+        db.Index("ix_comments_user_id", "user_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text, nullable=False)
@@ -180,3 +216,171 @@ class Comment(db.Model):
             f"<Comment id={self.id} project_id={self.project_id} "
             f"user_id={self.user_id}>"
         )
+
+
+class ProjectCostRollup(db.Model):
+    """Материализованная стоимость материалов проекта (app/services/costs.py)"""
+
+    __tablename__ = "project_cost_rollups"
+    __table_args__ = (
+        db.Index("ix_project_cost_rollups_material_cost", "material_cost"),
+    )
+
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey("projects.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    material_cost = db.Column(db.Float, nullable=False, default=0)
+    line_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<ProjectCostRollup project_id={self.project_id} "
+            f"material_cost={self.material_cost}>"
+        )
+
+
+class MaterialCommitRollup(db.Model):
+    """Материализованный объём материала, заложенный в проекты"""
+
+    __tablename__ = "material_commit_rollups"
+
+    material_id = db.Column(
+        db.Integer,
+        db.ForeignKey("materials.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    committed_quantity = db.Column(db.Float, nullable=False, default=0)
+    project_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<MaterialCommitRollup material_id={self.material_id} "
+            f"committed_quantity={self.committed_quantity}>"
+        )
+
+
+class NotificationLog(db.Model):
+    """Отправленные уведомления о дедлайнах — защита от повторной отправки"""
+
+    __tablename__ = "notification_log"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "user_id", "bucket", "deadline", "kind", "object_id",
+            name="uq_notification_log_key",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)  # task, project
+    object_id = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.String(32), nullable=False)  # overdue, due_1d, due_3d...
+    deadline = db.Column(db.DateTime, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<NotificationLog user_id={self.user_id} {self.kind}={self.object_id} "
+            f"bucket={self.bucket!r}>"
+        )
+
+
+class TableVersion(db.Model):
+    """Счётчик изменений таблицы для кэша фрагментов и ETag (app/services/table_versions.py)"""
+
+    __tablename__ = "table_versions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<TableVersion {self.name}={self.version}>"
+
+
+class AuditEvent(db.Model):
+    """
+    Журнал изменений, только INSERT (app/services/audit.py).
+    period — месяц события: по нему строятся выборки за период
+    и удаляются старые месяцы (flask audit-prune).
+    """
+
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        db.Index("ix_audit_log_project_id_id", "project_id", "id"),
+        db.Index("ix_audit_log_user_id_id", "user_id", "id"),
+        db.Index("ix_audit_log_period_id", "period", "id"),
+        db.Index("ix_audit_log_table_name_object_id_id", "table_name", "object_id", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    table_name = db.Column(db.String(64), nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)
+    project_id = db.Column(db.Integer, nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(16), nullable=False)  # insert, update, delete, bulk_update
+    changes = db.Column(db.Text, nullable=False)  # JSON {поле: [было, стало]}
+
+    def __repr__(self):
+        return f"<AuditEvent {self.action} {self.table_name}={self.object_id}>"
+
+
+class StockMovement(db.Model):
+    """
+    Движение склада, только INSERT (app/services/inventory.py).
+    on_hand_after/reserved_after — снимок остатков материала после движения.
+    """
+
+    __tablename__ = "stock_movements"
+    __table_args__ = (
+        db.Index("ix_stock_movements_material_id_id", "material_id", "id"),
+        db.Index("ix_stock_movements_project_id_id", "project_id", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(
+        db.Integer, db.ForeignKey("materials.id", ondelete="CASCADE"), nullable=False
+    )
+    project_id = db.Column(
+        db.Integer, db.ForeignKey("projects.id", ondelete="SET NULL"), nullable=True
+    )
+    kind = db.Column(db.String(16), nullable=False)  # receipt, reserve, consume, release, adjust
+    quantity = db.Column(db.Float, nullable=False)  # adjust — со знаком
+    on_hand_after = db.Column(db.Float, nullable=False)
+    reserved_after = db.Column(db.Float, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    note = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StockMovement {self.kind} material_id={self.material_id} qty={self.quantity}>"
+
+
+class StockReservation(db.Model):
+    """Текущий резерв материала под проект (снимок, ведёт app/services/inventory.py)"""
+
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        db.Index("ix_stock_reservations_material_id", "material_id"),
+    )
+
+    project_id = db.Column(
+        db.Integer, db.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True
+    )
+    material_id = db.Column(
+        db.Integer, db.ForeignKey("materials.id", ondelete="CASCADE"), primary_key=True
+    )
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<StockReservation project_id={self.project_id} "
+            f"material_id={self.material_id} qty={self.quantity}>"
+        )
@@ -0,0 +1,228 @@
+# app/replicas.py
+#
+# Чтение с реплик БД. Реплики задаются DATABASE_REPLICA_URLS и становятся
+# binds Flask-SQLAlchemy (replica1, replica2, ...). Сессия GET/HEAD-запроса
+# отправляет SELECT на одну из реплик; flush, DML, SELECT ... FOR UPDATE
+# и всё, что идёт после первой записи в сессии, уходит на основную БД.
+# После запроса с записью пользователь READ_YOUR_WRITES_SECONDS читает
+# с основной БД, чтобы увидеть свои правки. Реплика с отставанием больше
+# REPLICA_MAX_LAG из выбора исключается.
+
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import select, text
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset(("GET", "HEAD"))
+
+# отметка в cookie-сессии: до этого момента (unix time) читать с основной БД
+PRIMARY_UNTIL_KEY = "_primary_until"
+
+# на PostgreSQL отставание считает сама реплика; равные LSN — догнала
+_PG_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def replica_bind_keys(urls):
+    """{"replica1": url, ...} для SQLALCHEMY_BINDS"""
+    return {f"replica{i}": url for i, url in enumerate(urls, start=1)}
+
+
+def _is_write(clause):
+    if clause is None:
+        return False
+    if getattr(clause, "is_dml", False):
+        return True
+    if getattr(clause, "_for_update_arg", None) is not None:
+        return True
+    # text() может быть чем угодно, поэтому на реплику идут только SELECT
+    return isinstance(clause, TextClause) and clause.text.lstrip()[:6].upper() != "SELECT"
+
+
+class RoutingSession(Session):
+    """
+    Сессия, выбирающая реплику для чтения. Маршрутизация включена, пока
+    в session.info лежит "replicas" (ReplicaSet); реплика выбирается
+    один раз на сессию, чтобы все чтения запроса видели один снимок.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = self._replica_for(clause)
+            if replica is not None:
+                return replica
+        if self._flushing or _is_write(clause):
+            self.info["wrote"] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_for(self, clause):
+        replicas = self.info.get("replicas")
+        if replicas is None or self._flushing or self.info.get("wrote") or _is_write(clause):
+            return None
+        if "replica" not in self.info:
+            self.info["replica"] = replicas.pick()
+        return self.info["replica"]
+
+
+class ReplicaSet:
+    """
+    Реплики и их отставание. Проверяет их фоновый поток раз в
+    check_interval секунд, pick() только читает последний результат:
+    недоступная реплика не задерживает запросы на таймаут соединения.
+    Поток запускается при первом pick() в текущем процессе, поэтому
+    переживает fork воркеров; до первой проверки чтение идёт с основной БД.
+    """
+
+    # не чаще, даже если REPLICA_CHECK_INTERVAL=0
+    MIN_INTERVAL = 0.1
+
+    def __init__(self, engines, primary, max_lag=10.0, check_interval=5.0):
+        self.engines = dict(engines)
+        self.primary = primary
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # bind -> отставание в секундах; None — реплика недоступна или не проверена
+        self._lag = dict.fromkeys(self.engines)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """Engine реплики для чтения или None — читать с основной БД"""
+        self._ensure_started()
+        healthy = [
+            key for key, lag in self._lag.items()
+            if lag is not None and lag <= self.max_lag
+        ]
+        return self.engines[random.choice(healthy)] if healthy else None
+
+    def status(self):
+        self._ensure_started()
+        return {
+            key: {"lag_seconds": lag, "healthy": lag is not None and lag <= self.max_lag}
+            for key, lag in self._lag.items()
+        }
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="replica-lag", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(max(self.check_interval, self.MIN_INTERVAL))
+
+    def refresh(self):
+        """Проверяет все реплики сейчас (фоновый поток, CLI)"""
+        for key, engine in self.engines.items():
+            try:
+                lag = self.measure_lag(engine)
+            except Exception:
+                logger.exception("replica %s check failed", key)
+                lag = None
+            healthy = lag is not None and lag <= self.max_lag
+            was_healthy = self._lag[key] is not None and self._lag[key] <= self.max_lag
+            if was_healthy and not healthy:
+                logger.warning("replica %s lag %s s, reads fall back to primary", key, lag)
+            elif healthy and not was_healthy:
+                logger.info("replica %s is back in rotation, lag %.1f s", key, lag)
+            self._lag[key] = lag
+
+    def measure_lag(self, engine):
+        """Отставание реплики в секундах"""
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as conn:
+                lag = conn.execute(_PG_LAG_SQL).scalar()
+            # NULL: сервер не в режиме восстановления, то есть не отстаёт
+            return float(lag or 0)
+        return self._table_versions_lag(engine)
+
+    def _table_versions_lag(self, engine):
+        """
+        Без встроенного отставания (копии SQLite) сравниваются версии таблиц.
+        Для отстающей таблицы берётся время последней правки, которую
+        реплика видела: оценка сверху, реплика скорее выпадет раньше, чем позже.
+        """
+        from .models import TableVersion
+
+        stmt = select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+        with self.primary.connect() as conn:
+            primary = {name: version for name, version, _ in conn.execute(stmt)}
+        with engine.connect() as conn:
+            replica = {name: (version, updated_at) for name, version, updated_at in conn.execute(stmt)}
+
+        now = datetime.utcnow()
+        lag = 0.0
+        for name, version in primary.items():
+            seen_version, seen_at = replica.get(name, (None, None))
+            if seen_version is None or seen_at is None:
+                return float("inf")
+            if seen_version < version:
+                lag = max(lag, (now - seen_at).total_seconds())
+        return lag
+
+
+def primary_only(view):
+    """GET-обработчик, который пишет в БД: все его запросы идут на основную БД"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from .extensions import db
+
+        db.session.info.pop("replicas", None)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def install_read_replicas(app, replica_set):
+    from .extensions import db
+
+    app.extensions["replicas"] = replica_set
+    window = app.config["READ_YOUR_WRITES_SECONDS"]
+
+    @app.before_request
+    def _route_reads():
+        if request.method in READ_METHODS and time.time() >= session.get(PRIMARY_UNTIL_KEY, 0):
+            db.session.info["replicas"] = replica_set
+
+    @app.after_request
+    def _pin_primary_after_write(response):
+        if request.method not in READ_METHODS or db.session.info.get("wrote"):
+            session[PRIMARY_UNTIL_KEY] = time.time() + window
+        return response
+
+
+def sync_sqlite_replicas(primary, engines):
+    """Копирует файл основной SQLite-БД в реплики (для локальной проверки)"""
+    synced = []
+    for key, engine in engines.items():
+        if engine.dialect.name != "sqlite" or primary.dialect.name != "sqlite":
+            continue
+        source = primary.raw_connection()
+        target = engine.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        synced.append(key)
+    return synced
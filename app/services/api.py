@@ -0,0 +1,261 @@
+"""
+Ресурсы JSON API (/api/v1) и чтение без ORM-объектов.
+
+Запросы выбирают только нужные колонки (fields=) и возвращают кортежи,
+которые сразу превращаются в dict для JSON. Связанные объекты (include=)
+догружаются одним запросом WHERE ... IN (...) на связь для всей страницы.
+"""
+
+from sqlalchemy import Integer, func
+
+from app.extensions import db
+from app.models import Comment, Material, Project, ProjectMaterial, Task, User
+
+MAX_BATCH_IDS = 200
+# связанных объектов на один объект в include= со списком; остальные —
+# по ссылке "more" на отфильтрованный список
+MAX_INCLUDE_ITEMS = 50
+
+
+class ApiError(ValueError):
+    """Некорректные параметры запроса к API (ответ 400)"""
+
+
+class Relation:
+    """
+    Связь для include=: строки target, у которых remote in (значения local).
+    many — список на объект, иначе один объект или None.
+    """
+
+    def __init__(self, target, local, remote, many):
+        self.target = target
+        self.local = local
+        self.remote = remote
+        self.many = many
+
+
+class Resource:
+    def __init__(self, name, model, fields, default_fields=None, sorts=None,
+                 filters=(), relations=None):
+        self.name = name
+        self.model = model
+        self.columns = {f: getattr(model, f) for f in fields}
+        self.default_fields = tuple(default_fields or fields)
+        # сортировки: ключ keyset-пагинации (последним — id) и направление
+        self.sorts = sorts or {"id": ((model.id,), False)}
+        self.default_sort = next(iter(self.sorts))
+        self.filters = {f: getattr(model, f) for f in filters}
+        self.relations = relations or {}
+
+    def parse_fields(self, raw):
+        if not raw:
+            return self.default_fields
+        names = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+        unknown = [f for f in names if f not in self.columns]
+        if unknown:
+            raise ApiError(f"unknown fields for {self.name}: {', '.join(unknown)}")
+        return names or self.default_fields
+
+    def select(self, fields, extra=()):
+        """
+        session.query по колонкам: строки — лёгкие кортежи, не объекты модели.
+        extra — служебные колонки после полей (ключ сортировки, связи);
+        в ответ они не попадают. Возвращает (query, {ключ колонки: позиция}).
+        """
+        columns = [self.columns[f] for f in fields]
+        positions = {c.key: i for i, c in enumerate(columns)}
+        for column in extra:
+            if column.key not in positions:
+                positions[column.key] = len(columns)
+                columns.append(column)
+        return db.session.query(*columns), positions
+
+    def apply_filters(self, query, args):
+        for name, column in self.filters.items():
+            raw = args.get(name)
+            if raw is None or raw == "":
+                continue
+            value = raw
+            if isinstance(column.type, Integer):
+                try:
+                    value = int(raw)
+                except ValueError:
+                    raise ApiError(f"{name} must be an integer") from None
+            query = query.filter(column == value)
+        return query
+
+
+def rows_to_dicts(fields, rows):
+    return [dict(zip(fields, row)) for row in rows]
+
+
+RESOURCES = {
+    r.name: r
+    for r in (
+        Resource(
+            "projects",
+            Project,
+            ("id", "name", "client", "status", "deadline", "description", "created_at", "updated_at"),
+            sorts={
+                "created": ((Project.created_at, Project.id), True),
+                "name": ((Project.name, Project.id), False),
+            },
+            filters=("status", "client"),
+            relations={
+                "tasks": Relation("tasks", Project.id, Task.project_id, many=True),
+                "materials": Relation("project_materials", Project.id, ProjectMaterial.project_id, many=True),
+                "comments": Relation("comments", Project.id, Comment.project_id, many=True),
+            },
+        ),
+        Resource(
+            "tasks",
+            Task,
+            ("id", "title", "description", "status", "priority", "start_date", "end_date",
+             "project_id", "created_at", "updated_at"),
+            sorts={
+                "created": ((Task.created_at, Task.id), True),
+                "title": ((Task.title, Task.id), False),
+            },
+            filters=("status", "priority", "project_id"),
+            relations={
+                "project": Relation("projects", Task.project_id, Project.id, many=False),
+            },
+        ),
+        Resource(
+            "materials",
+            Material,
+            ("id", "name", "unit", "price_per_unit", "stock_quantity", "description",
+             "created_at", "updated_at"),
+            sorts={
+                "name": ((Material.name, Material.id), False),
+                "created": ((Material.created_at, Material.id), True),
+            },
+            relations={
+                "projects": Relation("project_materials", Material.id, ProjectMaterial.material_id, many=True),
+            },
+        ),
+        Resource(
+            "project_materials",
+            ProjectMaterial,
+            ("id", "project_id", "material_id", "quantity"),
+            filters=("project_id", "material_id"),
+            relations={
+                "project": Relation("projects", ProjectMaterial.project_id, Project.id, many=False),
+                "material": Relation("materials", ProjectMaterial.material_id, Material.id, many=False),
+            },
+        ),
+        Resource(
+            "comments",
+            Comment,
+            ("id", "project_id", "user_id", "text", "created_at", "updated_at"),
+            sorts={"created": ((Comment.created_at, Comment.id), True)},
+            filters=("project_id", "user_id"),
+            relations={
+                "project": Relation("projects", Comment.project_id, Project.id, many=False),
+                "user": Relation("users", Comment.user_id, User.id, many=False),
+            },
+        ),
+        # только как include: telegram_id и роль наружу не отдаются
+        Resource("users", User, ("id", "username", "first_name", "last_name")),
+    )
+}
+
+# ресурсы с собственными адресами /api/v1/<name>
+PUBLIC_RESOURCES = ("projects", "tasks", "materials", "project_materials", "comments")
+
+
+def parse_includes(resource, raw):
+    if not raw:
+        return ()
+    names = tuple(dict.fromkeys(n.strip() for n in raw.split(",") if n.strip()))
+    unknown = [n for n in names if n not in resource.relations]
+    if unknown:
+        raise ApiError(f"unknown include for {resource.name}: {', '.join(unknown)}")
+    return names
+
+
+def parse_ids(raw):
+    try:
+        ids = list(dict.fromkeys(int(v) for v in raw.split(",") if v.strip()))
+    except ValueError:
+        raise ApiError("ids must be a comma-separated list of integers") from None
+    if not ids:
+        raise ApiError("ids is empty")
+    if len(ids) > MAX_BATCH_IDS:
+        raise ApiError(f"at most {MAX_BATCH_IDS} ids per request")
+    return ids
+
+
+def fetch_by_ids(resource, fields, ids, extra=()):
+    """Пакетное чтение: строки в порядке ids и список отсутствующих id"""
+    query, positions = resource.select(fields, extra=(resource.model.id, *extra))
+    rows = query.filter(resource.model.id.in_(ids)).all()
+    by_id = {row[positions["id"]]: row for row in rows}
+    found = [by_id[i] for i in ids if i in by_id]
+    missing = [i for i in ids if i not in by_id]
+    return found, missing
+
+
+def _related_rows(target, target_fields, relation, keys, limit):
+    """
+    Строки target для ключей keys. Для связи many — не больше limit + 1
+    на ключ (ROW_NUMBER по ключу): лишняя строка лишь показывает, что есть ещё.
+    """
+    query, positions = target.select(target_fields, extra=(relation.remote, target.model.id))
+    query = query.filter(relation.remote.in_(keys))
+    if not relation.many:
+        return query.order_by(target.model.id), positions
+    rank = func.row_number().over(partition_by=relation.remote, order_by=target.model.id)
+    ranked = query.add_columns(rank.label("include_rank")).subquery()
+    columns = list(ranked.c)[:-1]
+    limited = (
+        db.session.query(*columns)
+        .filter(ranked.c.include_rank <= limit + 1)
+        .order_by(ranked.c.include_rank)
+    )
+    return limited, positions
+
+
+def attach_includes(resource, items, rows, includes, fields_by_resource, more_url=None,
+                    limit=MAX_INCLUDE_ITEMS):
+    """
+    Дописывает в items (dict'ы, построенные из rows) связанные объекты:
+    один запрос на связь для всей страницы. Строки rows должны содержать
+    колонки include_columns(). Списки обрезаются до limit на объект;
+    у обрезанных в item["more"][связь] — more_url(ресурс, фильтр, значение).
+    """
+    if not includes or not rows:
+        return
+    for name in includes:
+        relation = resource.relations[name]
+        target = RESOURCES[relation.target]
+        local_key = relation.local.key
+        keys = {getattr(row, local_key) for row in rows}
+        keys.discard(None)
+
+        target_fields = target.parse_fields(fields_by_resource.get(target.name))
+        related = {}
+        if keys:
+            query, positions = _related_rows(target, target_fields, relation, keys, limit)
+            remote_index = positions[relation.remote.key]
+            for row in query:
+                obj = dict(zip(target_fields, row))
+                if relation.many:
+                    related.setdefault(row[remote_index], []).append(obj)
+                else:
+                    related[row[remote_index]] = obj
+
+        empty = [] if relation.many else None
+        for item, row in zip(items, rows):
+            key = getattr(row, local_key)
+            value = related.get(key, empty)
+            if relation.many and len(value) > limit:
+                value = value[:limit]
+                if more_url is not None:
+                    item.setdefault("more", {})[name] = more_url(target.name, relation.remote.key, key)
+            item[name] = value
+
+
+def include_columns(resource, includes):
+    """Колонки, которые нужны основной выборке, чтобы связать include"""
+    return tuple(resource.relations[name].local for name in includes)
@@ -0,0 +1,285 @@
+"""
+Журнал изменений на событиях сессии.
+
+after_flush снимает дифф полей изменённых объектов (история атрибутов
+ещё доступна), after_commit отдаёт накопленные записи писателю,
+откат их выбрасывает. Режимы AUDIT_MODE:
+  async — фоновый поток пишет пачками отдельным соединением, коммит
+          правки не ждёт записи журнала (при падении процесса
+          теряется не больше одной пачки);
+  sync  — записи вставляются в той же транзакции, что и правка;
+  off   — журнал не ведётся.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+
+from flask import current_app, has_app_context, has_request_context
+from flask_login import current_user
+from sqlalchemy import delete, event, inspect, insert
+from sqlalchemy.orm import Session
+
+from app.models import AuditEvent, Comment, Material, Project, ProjectMaterial, Task
+
+logger = logging.getLogger(__name__)
+
+_table = AuditEvent.__table__
+
+AUDITED = (Project, Task, Material, ProjectMaterial, Comment)
+# служебные поля, изменение которых само по себе не событие
+IGNORED_FIELDS = {"updated_at"}
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _project_id(obj):
+    if isinstance(obj, Project):
+        return obj.id
+    return getattr(obj, "project_id", None)
+
+
+def acting_user_id(session):
+    """Кто делает правку: session.info["audit_user_id"] (бот) или current_user"""
+    user_id = session.info.get("audit_user_id")
+    if user_id is not None:
+        return user_id
+    if has_request_context() and current_user.is_authenticated:
+        return int(current_user.get_id())
+    return None
+
+
+def make_event(table_name, object_id, action, changes, project_id=None, user_id=None, now=None):
+    now = now or datetime.utcnow()
+    return {
+        "period": now.strftime("%Y-%m"),
+        "occurred_at": now,
+        "table_name": table_name,
+        "object_id": object_id,
+        "project_id": project_id,
+        "user_id": user_id,
+        "action": action,
+        "changes": json.dumps(changes, ensure_ascii=False, default=str),
+    }
+
+
+def _diff(obj, action):
+    changes = {}
+    for attr in inspect(obj).mapper.column_attrs:
+        if attr.key in IGNORED_FIELDS:
+            continue
+        hist = inspect(obj).attrs[attr.key].history
+        if action == "insert":
+            value = getattr(obj, attr.key)
+            if value is not None:
+                changes[attr.key] = [None, _json_value(value)]
+        elif action == "delete":
+            old = (hist.unchanged or hist.deleted or [None])[0]
+            if old is not None:
+                changes[attr.key] = [_json_value(old), None]
+        elif hist.has_changes():
+            old = hist.deleted[0] if hist.deleted else None
+            new = hist.added[0] if hist.added else None
+            if old != new:
+                changes[attr.key] = [_json_value(old), _json_value(new)]
+    return changes
+
+
+def collect_events(session):
+    """События для new/dirty/deleted текущего flush"""
+    user_id = acting_user_id(session)
+    now = datetime.utcnow()
+    events = []
+    for action, objs in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objs:
+            if not isinstance(obj, AUDITED):
+                continue
+            changes = _diff(obj, action)
+            if not changes:
+                continue
+            events.append(make_event(
+                obj.__table__.name, obj.id, action, changes,
+                project_id=_project_id(obj), user_id=user_id, now=now,
+            ))
+    return events
+
+
+class AuditWriter:
+    """
+    Фоновая запись журнала пачками: до batch_size записей или раз в
+    interval секунд одним executemany INSERT. Поток запускается при
+    первой записи в текущем процессе, поэтому переживает fork воркеров.
+    """
+
+    def __init__(self, engine, batch_size=500, interval=1.0, max_queue=10000):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, events):
+        self._ensure_started()
+        for i, item in enumerate(events):
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                # очередь забита — пишем остаток сами, но не теряем
+                logger.warning("audit queue is full, writing %d events inline", len(events) - i)
+                self.write(events[i:])
+                return
+
+    def write(self, events):
+        if events:
+            with self.engine.begin() as conn:
+                conn.execute(insert(_table), events)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # после fork очередь родителя недействительна
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        try:
+            self.write(batch)
+        except Exception:
+            logger.exception("failed to write %d audit events", len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=5.0):
+        """Дожидается записи всего, что уже в очереди (тесты, выход процесса)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+class AuditLog:
+    """Режим AUDIT_MODE и фоновый писатель одного приложения: app.extensions["audit"]"""
+
+    def __init__(self, mode, writer=None):
+        self.mode = mode
+        self.writer = writer
+
+
+def _log_for(session):
+    """
+    Журнал, к которому относится сессия: session.info["audit"] (сессии
+    вне Flask, например у бота) или журнал текущего приложения.
+    """
+    log = session.info.get("audit")
+    if log is None and has_app_context():
+        log = current_app.extensions.get("audit")
+    return log
+
+
+def record(session, events):
+    """
+    Записи журнала от массовых операций в обход ORM: пишутся так же,
+    как события из flush — в транзакции (sync) или после коммита (async).
+    """
+    log = _log_for(session)
+    if log is None or log.mode == "off" or not events:
+        return
+    if log.mode == "sync":
+        session.connection().execute(insert(_table), events)
+    else:
+        session.info.setdefault("audit_pending", []).extend(events)
+
+
+def _after_flush(session, flush_context):
+    log = _log_for(session)
+    if log is not None and log.mode != "off":
+        record(session, collect_events(session))
+
+
+def _after_commit(session):
+    events = session.info.pop("audit_pending", None)
+    log = _log_for(session)
+    if events and log is not None and log.writer is not None:
+        log.writer.submit(events)
+
+
+def _discard_pending(session, *args):
+    # откат или новая транзакция: несостоявшиеся изменения не журналируются
+    session.info.pop("audit_pending", None)
+
+
+def install_audit_log(app, engine):
+    mode = app.config["AUDIT_MODE"]
+    if mode not in ("async", "sync", "off"):
+        raise ValueError(f"unknown AUDIT_MODE {mode!r}, expected async, sync or off")
+    writer = None
+    if mode == "async":
+        writer = AuditWriter(
+            engine,
+            batch_size=app.config["AUDIT_BATCH_SIZE"],
+            interval=app.config["AUDIT_FLUSH_INTERVAL"],
+        )
+        atexit.register(writer.flush)
+    # у каждого приложения свой журнал: второе приложение в процессе
+    # (бенчмарки, бот) пишет в свой engine, а не в engine первого
+    app.extensions["audit"] = AuditLog(mode, writer)
+    if mode == "off":
+        return
+
+    for name, fn in (
+        ("after_flush", _after_flush),
+        ("after_commit", _after_commit),
+        ("after_begin", _discard_pending),
+        ("after_soft_rollback", _discard_pending),
+    ):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+def flush_writer(timeout=5.0, app=None):
+    """Дожидается фоновой записи журнала приложения (по умолчанию текущего)"""
+    log = (app or current_app).extensions.get("audit")
+    if log is not None and log.writer is not None:
+        log.writer.flush(timeout)
+
+
+def prune(conn, keep_months, today=None):
+    """Удаляет месяцы журнала старше keep_months; возвращает число строк"""
+    today = today or datetime.utcnow().date()
+    year, month = today.year, today.month - keep_months + 1
+    while month <= 0:
+        year, month = year - 1, month + 12
+    cutoff = f"{year:04d}-{month:02d}"
+    return conn.execute(delete(_table).where(_table.c.period < cutoff)).rowcount
@@ -0,0 +1,126 @@
+# app/services/bot_data.py
+#
+# Доступ Telegram-бота к данным CRM. У бота свой engine с маленьким
+# ограниченным пулом и пул потоков того же размера: синхронные запросы
+# SQLAlchemy уходят из event loop в потоки, а число соединений бота
+# никогда не превышает BOT_DB_POOL_SIZE и не отнимает их у веб-воркеров.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.engine_profiles import install_sqlite_pragmas
+from app.models import TASK_STATUS_CHOICES, Project, Task, User
+
+
+class BotDataAccess:
+    def __init__(self, database_url, pool_size=4, pool_timeout=10.0, sqlite_pragmas=None, audit_log=None):
+        url = make_url(database_url)
+        engine_options = {"pool_pre_ping": True}
+        if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+            engine_options.update(
+                pool_size=pool_size,
+                max_overflow=0,
+                pool_timeout=pool_timeout,
+            )
+        self.engine = create_engine(url, **engine_options)
+        install_sqlite_pragmas(self.engine, sqlite_pragmas)
+        # сессии бота живут вне контекста Flask: журнал изменений передаётся явно
+        self._sessions = sessionmaker(
+            bind=self.engine, expire_on_commit=False, info={"audit": audit_log},
+        )
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="bot-db")
+
+    @classmethod
+    def from_app(cls, app):
+        return cls(
+            app.config["SQLALCHEMY_DATABASE_URI"],
+            pool_size=app.config["BOT_DB_POOL_SIZE"],
+            pool_timeout=app.config["BOT_DB_POOL_TIMEOUT"],
+            sqlite_pragmas=app.config["DB_ENGINE_PROFILE"]["sqlite_pragmas"],
+            audit_log=app.extensions.get("audit"),
+        )
+
+    async def run(self, fn, *args):
+        """Выполняет fn(session, *args) в потоке пула и коммитит сессию"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._call, fn, *args))
+
+    def _call(self, fn, *args):
+        with self._sessions() as session:
+            result = fn(session, *args)
+            session.commit()
+            return result
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.engine.dispose()
+
+
+# === запросы; каждый принимает сессию и возвращает простые данные ===
+
+def find_user(session, telegram_id):
+    """(id, role) зарегистрированного пользователя CRM или None"""
+    return session.execute(
+        select(User.id, User.role).where(User.telegram_id == telegram_id)
+    ).first()
+
+
+def open_tasks(session, limit=20):
+    """Незакрытые задачи: сначала с ближайшим дедлайном"""
+    return session.execute(
+        select(Task.id, Task.title, Task.status, Task.priority, Task.end_date, Project.name)
+        .join(Project, Task.project_id == Project.id)
+        .where(Task.status != "done")
+        .order_by(Task.end_date.is_(None), Task.end_date, Task.id)
+        .limit(limit)
+    ).all()
+
+
+def due_tasks(session, now, days, limit=50):
+    """Незакрытые задачи с дедлайном до now + days, включая просроченные"""
+    return session.execute(
+        select(Task.id, Task.title, Task.status, Task.end_date, Project.name)
+        .join(Project, Task.project_id == Project.id)
+        .where(Task.status != "done")
+        .where(Task.end_date.is_not(None))
+        .where(Task.end_date <= now + timedelta(days=days))
+        .order_by(Task.end_date, Task.id)
+        .limit(limit)
+    ).all()
+
+
+def project_summary(session, project_id):
+    """Проект и число его задач по статусам, или None"""
+    project = session.execute(
+        select(Project.id, Project.name, Project.client, Project.status, Project.deadline)
+        .where(Project.id == project_id)
+    ).first()
+    if project is None:
+        return None
+    by_status = dict(
+        session.execute(
+            select(Task.status, func.count(Task.id))
+            .where(Task.project_id == project_id)
+            .group_by(Task.status)
+        ).all()
+    )
+    return project, by_status
+
+
+def set_task_status(session, task_id, status, user_id=None):
+    """Меняет статус задачи; возвращает её название или None"""
+    if status not in TASK_STATUS_CHOICES:
+        raise ValueError(status)
+    # автор правки для журнала изменений
+    session.info["audit_user_id"] = user_id
+    task = session.get(Task, task_id)
+    if task is None:
+        return None
+    task.status = status
+    return task.title
@@ -0,0 +1,88 @@
+# app/services/comments.py
+#
+# Лента комментариев проекта. Страница — один запрос: колонки комментария
+# и имя автора через JOIN, keyset по (created_at, id) на индексе
+# ix_comments_project_id_created_at_id, поэтому проект с 10k комментариев
+# открывается так же быстро, как пустой.
+
+from sqlalchemy import or_, select
+
+from app.extensions import db
+from app.models import Comment, User
+
+# ключ keyset-пагинации ленты: новые сверху
+THREAD_COLUMNS = (Comment.created_at, Comment.id)
+
+MAX_COMMENT_LENGTH = 5000
+
+
+def thread_query(project_id):
+    """Query строк ленты (без сортировки — её задаёт пагинация)"""
+    return (
+        db.session.query(
+            Comment.id,
+            Comment.text,
+            Comment.created_at,
+            Comment.user_id,
+            User.username,
+            User.first_name,
+            User.last_name,
+        )
+        .join(User, Comment.user_id == User.id)
+        .filter(Comment.project_id == project_id)
+    )
+
+
+def newer_than(conn, project_id, last_id, since=None, limit=100):
+    """
+    Комментарии с id > last_id по возрастанию — догрузка для SSE.
+    С since — ещё и созданные не раньше since: id выдаётся до коммита,
+    и комментарий с меньшим id может стать видимым позже большего.
+    """
+    newer = Comment.id > last_id
+    if since is not None:
+        newer = or_(newer, Comment.created_at >= since)
+    return conn.execute(
+        select(
+            Comment.id,
+            Comment.text,
+            Comment.created_at,
+            Comment.user_id,
+            User.username,
+            User.first_name,
+            User.last_name,
+        )
+        .join(User, Comment.user_id == User.id)
+        .where(Comment.project_id == project_id)
+        .where(newer)
+        .order_by(Comment.id)
+        .limit(limit)
+    ).all()
+
+
+def latest_id(conn, project_id):
+    return conn.execute(
+        select(Comment.id)
+        .where(Comment.project_id == project_id)
+        .order_by(Comment.id.desc())
+        .limit(1)
+    ).scalar() or 0
+
+
+def author_name(row):
+    full = " ".join(part for part in (row.first_name, row.last_name) if part)
+    return full or row.username or f"#{row.user_id}"
+
+
+def comment_dict(row):
+    return {
+        "id": row.id,
+        "text": row.text,
+        "created_at": row.created_at.isoformat(),
+        "user_id": row.user_id,
+        "author": author_name(row),
+    }
+
+
+def topic(project_id):
+    return f"comments:{project_id}"
@@ -0,0 +1,247 @@
+# app/services/costs.py
+#
+# Стоимость материалов по проектам и заложенные объёмы по материалам.
+# Агрегаты считаются в SQL и хранятся в project_cost_rollups /
+# material_commit_rollups; после каждого flush пересчитываются только
+# строки затронутых проектов и материалов.
+
+from datetime import datetime
+
+from sqlalchemy import delete, distinct, event, func, insert, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Material,
+    MaterialCommitRollup,
+    Project,
+    ProjectCostRollup,
+    ProjectMaterial,
+)
+
+_project_rollups = ProjectCostRollup.__table__
+_material_rollups = MaterialCommitRollup.__table__
+
+
+def _project_cost_select():
+    return (
+        select(
+            ProjectMaterial.project_id,
+            func.sum(ProjectMaterial.quantity * Material.price_per_unit),
+            func.count(ProjectMaterial.id),
+        )
+        .join(Material, ProjectMaterial.material_id == Material.id)
+        .group_by(ProjectMaterial.project_id)
+    )
+
+
+def _material_commit_select():
+    return (
+        select(
+            ProjectMaterial.material_id,
+            func.sum(ProjectMaterial.quantity),
+            func.count(distinct(ProjectMaterial.project_id)),
+        )
+        .group_by(ProjectMaterial.material_id)
+    )
+
+
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _store_rollups(conn, table, key, rows, ids, live):
+    """
+    INSERT ... ON CONFLICT DO UPDATE по первичному ключу и удаление строк
+    тех ids, которых больше нет в live (подзапрос ключей с агрегатом). DELETE + INSERT здесь нельзя:
+    две транзакции READ COMMITTED, пересчитывающие один проект, обе
+    вставляли бы после удаления, и вторая падала бы на первичном ключе.
+    """
+    stale = delete(table).where(table.c[key].not_in(live))
+    if ids is not None:
+        stale = stale.where(table.c[key].in_(ids))
+    conn.execute(stale)
+    if not rows:
+        return
+    dialect_insert = _UPSERT_INSERTS.get(conn.dialect.name)
+    if dialect_insert is None:
+        conn.execute(delete(table).where(table.c[key].in_([row[key] for row in rows])))
+        conn.execute(insert(table), rows)
+        return
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[key]],
+        set_={name: stmt.excluded[name] for name in rows[0] if name != key},
+    )
+    conn.execute(stmt, rows)
+
+
+def refresh_project_costs(conn, project_ids=None):
+    """Пересчитывает стоимость проектов (всех, если project_ids=None)"""
+    stmt = _project_cost_select()
+    if project_ids is not None:
+        project_ids = list(project_ids)
+        if not project_ids:
+            return
+        stmt = stmt.where(ProjectMaterial.project_id.in_(project_ids))
+
+    now = datetime.utcnow()
+    rows = [
+        {"project_id": pid, "material_cost": cost or 0.0, "line_count": lines, "updated_at": now}
+        for pid, cost, lines in conn.execute(stmt)
+    ]
+    _store_rollups(
+        conn, _project_rollups, "project_id", rows, project_ids,
+        live=select(ProjectMaterial.project_id).join(Material, ProjectMaterial.material_id == Material.id),
+    )
+
+
+def refresh_material_commitments(conn, material_ids=None):
+    """Пересчитывает заложенные в проекты объёмы материалов"""
+    stmt = _material_commit_select()
+    if material_ids is not None:
+        material_ids = list(material_ids)
+        if not material_ids:
+            return
+        stmt = stmt.where(ProjectMaterial.material_id.in_(material_ids))
+
+    now = datetime.utcnow()
+    rows = [
+        {"material_id": mid, "committed_quantity": qty or 0.0, "project_count": projects, "updated_at": now}
+        for mid, qty, projects in conn.execute(stmt)
+    ]
+    _store_rollups(
+        conn, _material_rollups, "material_id", rows, material_ids,
+        live=select(ProjectMaterial.material_id),
+    )
+
+
+def refresh_for_price_change(conn, material_ids):
+    """Цена материала изменилась: пересчитать проекты, где он используется"""
+    material_ids = list(material_ids)
+    if not material_ids:
+        return
+    project_ids = conn.execute(
+        select(ProjectMaterial.project_id)
+        .where(ProjectMaterial.material_id.in_(material_ids))
+        .distinct()
+    ).scalars().all()
+    refresh_project_costs(conn, project_ids)
+
+
+def rebuild_rollups(conn):
+    refresh_project_costs(conn)
+    refresh_material_commitments(conn)
+
+
+def portfolio_summary(session, top=5):
+    """Итоги портфеля, самые дорогие проекты и перерасход склада"""
+    totals = session.execute(
+        select(
+            func.coalesce(func.sum(ProjectCostRollup.material_cost), 0.0),
+            func.count(ProjectCostRollup.project_id),
+        )
+    ).one()
+
+    top_projects = session.execute(
+        select(Project.id, Project.name, ProjectCostRollup.material_cost)
+        .join(Project, Project.id == ProjectCostRollup.project_id)
+        .order_by(ProjectCostRollup.material_cost.desc())
+        .limit(top)
+    ).all()
+
+    shortage = MaterialCommitRollup.committed_quantity - func.coalesce(Material.stock_quantity, 0)
+    short_materials = session.execute(
+        select(
+            Material.id,
+            Material.name,
+            Material.unit,
+            MaterialCommitRollup.committed_quantity,
+            Material.stock_quantity,
+        )
+        .join(Material, Material.id == MaterialCommitRollup.material_id)
+        .where(shortage > 0)
+        .order_by(shortage.desc())
+        .limit(top)
+    ).all()
+
+    return {
+        "total_material_cost": totals[0],
+        "projects_with_materials": totals[1],
+        "top_projects": [
+            {"id": pid, "name": name, "material_cost": cost}
+            for pid, name, cost in top_projects
+        ],
+        "short_materials": [
+            {
+                "id": mid,
+                "name": name,
+                "unit": unit,
+                "committed_quantity": committed,
+                "stock_quantity": stock or 0.0,
+            }
+            for mid, name, unit, committed, stock in short_materials
+        ],
+    }
+
+
+def project_cost_lines(session, project_id):
+    """Строки сметы проекта одним запросом"""
+    rows = session.execute(
+        select(
+            Material.id,
+            Material.name,
+            Material.unit,
+            ProjectMaterial.quantity,
+            Material.price_per_unit,
+        )
+        .join(Material, ProjectMaterial.material_id == Material.id)
+        .where(ProjectMaterial.project_id == project_id)
+        .order_by(Material.name, ProjectMaterial.id)
+    ).all()
+    return [
+        {
+            "material_id": mid,
+            "name": name,
+            "unit": unit,
+            "quantity": qty,
+            "price_per_unit": price,
+            "total": qty * price,
+        }
+        for mid, name, unit, qty, price in rows
+    ]
+
+
+def _history_values(obj, attr):
+    hist = inspect(obj).attrs[attr].history
+    return [v for v in (*hist.added, *hist.deleted, *hist.unchanged) if v is not None]
+
+
+def _after_flush(session, flush_context):
+    project_ids = set()
+    material_ids = set()
+    repriced = set()
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ProjectMaterial):
+            project_ids.update(_history_values(obj, "project_id"))
+            material_ids.update(_history_values(obj, "material_id"))
+        elif isinstance(obj, Material):
+            if obj in session.deleted:
+                material_ids.add(obj.id)
+            elif inspect(obj).attrs.price_per_unit.history.has_changes():
+                repriced.add(obj.id)
+        elif isinstance(obj, Project) and obj in session.deleted:
+            project_ids.add(obj.id)
+
+    if not (project_ids or material_ids or repriced):
+        return
+
+    conn = session.connection()
+    refresh_project_costs(conn, project_ids)
+    refresh_material_commitments(conn, material_ids)
+    refresh_for_price_change(conn, repriced)
+
+
+def install_cost_rollups(app):
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
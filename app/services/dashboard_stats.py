@@ -0,0 +1,66 @@
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import Project, Task
+from app.utils.cache import TTLCache
+from app.utils.response_cache import table_state
+
+# старый и новый токен одновременно: запросы к отстающей реплике
+# и к основной БД не вытесняют друг друга
+_cache = TTLCache(maxsize=4)
+COUNTER_TABLES = ("projects", "tasks")
+
+
+def get_dashboard_counters():
+    """
+    Счётчики дашборда: два GROUP BY-запроса вместо десяти COUNT(*).
+
+    Результат кэшируется в процессе на DASHBOARD_STATS_TTL секунд под
+    токеном версий таблиц, прочитанным той же сессией, что и счётчики:
+    ответ отстающей реплики не выдаётся читающему с основной БД.
+    """
+    key = table_state(COUNTER_TABLES)[0]
+    counters = _cache.get(key)
+    if counters is None:
+        counters = _compute_counters()
+        _cache.set(key, counters, ttl=current_app.config["DASHBOARD_STATS_TTL"])
+    return dict(counters)
+
+
+def invalidate_dashboard_counters():
+    """Сбрасывает кэш после записи в projects/tasks"""
+    _cache.invalidate()
+
+
+def _compute_counters():
+    project_rows = (
+        db.session.query(Project.status, func.count(Project.id))
+        .group_by(Project.status)
+        .all()
+    )
+    task_rows = (
+        db.session.query(Task.status, Task.priority, func.count(Task.id))
+        .group_by(Task.status, Task.priority)
+        .all()
+    )
+
+    projects_by_status = {status: count for status, count in project_rows}
+    tasks_by_status = {}
+    tasks_by_priority = {}
+    for status, priority, count in task_rows:
+        tasks_by_status[status] = tasks_by_status.get(status, 0) + count
+        tasks_by_priority[priority] = tasks_by_priority.get(priority, 0) + count
+
+    return {
+        "total_projects": sum(projects_by_status.values()),
+        "active_projects": projects_by_status.get("active", 0),
+        "closed_projects": projects_by_status.get("closed", 0),
+        "total_tasks": sum(tasks_by_status.values()),
+        "tasks_to_do": tasks_by_status.get("to_do", 0),
+        "tasks_in_progress": tasks_by_status.get("in_progress", 0),
+        "tasks_done": tasks_by_status.get("done", 0),
+        "high_priority": tasks_by_priority.get("high", 0),
+        "medium_priority": tasks_by_priority.get("medium", 0),
+        "low_priority": tasks_by_priority.get("low", 0),
+    }
@@ -0,0 +1,169 @@
+# app/services/export.py
+#
+# Потоковая выгрузка таблиц: строки читаются из курсора порциями
+# (yield_per, на PostgreSQL — серверный курсор) и сразу отдаются клиенту.
+
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Material, Project, ProjectMaterial, Task
+
+
+def projects_export():
+    headers = ("ID", "Название", "Клиент", "Статус", "Дедлайн", "Описание", "Создан", "Обновлён")
+    stmt = select(
+        Project.id,
+        Project.name,
+        Project.client,
+        Project.status,
+        Project.deadline,
+        Project.description,
+        Project.created_at,
+        Project.updated_at,
+    ).order_by(Project.id)
+    return headers, stmt
+
+
+def tasks_export(project_id=None):
+    headers = (
+        "ID", "Название", "Проект", "Статус", "Приоритет",
+        "Начало", "Дедлайн", "Описание", "Создана", "Обновлена",
+    )
+    stmt = (
+        select(
+            Task.id,
+            Task.title,
+            Project.name,
+            Task.status,
+            Task.priority,
+            Task.start_date,
+            Task.end_date,
+            Task.description,
+            Task.created_at,
+            Task.updated_at,
+        )
+        .join(Project, Task.project_id == Project.id)
+        .order_by(Task.id)
+    )
+    if project_id is not None:
+        stmt = stmt.where(Task.project_id == project_id)
+    return headers, stmt
+
+
+def material_bill_export(project_id):
+    headers = ("Материал", "Ед. изм.", "Количество", "Цена за единицу", "Сумма")
+    stmt = (
+        select(
+            Material.name,
+            Material.unit,
+            ProjectMaterial.quantity,
+            Material.price_per_unit,
+            (ProjectMaterial.quantity * Material.price_per_unit).label("total"),
+        )
+        .join(Material, ProjectMaterial.material_id == Material.id)
+        .where(ProjectMaterial.project_id == project_id)
+        .order_by(Material.name, ProjectMaterial.id)
+    )
+    return headers, stmt
+
+
+# предел строк листа XLSX (вместе с заголовком): больше Excel не откроет
+XLSX_MAX_ROWS = 1_048_576
+# длина имени листа в Excel
+XLSX_TITLE_LENGTH = 31
+
+# с этих символов Excel и LibreOffice начинают формулу
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    """Текст, похожий на формулу, экранируется апострофом (CSV injection)"""
+    value = _cell(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _iter_batches(stmt, batch_size):
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def stream_csv(headers, stmt, batch_size):
+    """
+    Генератор CSV-чанков: по одному на порцию строк из курсора.
+    BOM в начале, чтобы Excel открыл кириллицу в UTF-8.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(headers)
+    yield buf.getvalue()
+
+    for partition in _iter_batches(stmt, batch_size):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([_csv_cell(v) for v in row] for row in partition)
+        yield buf.getvalue()
+
+
+def build_xlsx(headers, stmt, batch_size, title):
+    """
+    XLSX в режиме write_only: строки пишутся на диск по мере чтения,
+    память не растёт. Zip-контейнер XLSX нельзя отдавать до записи
+    последней строки, поэтому файл сначала собирается во временном файле.
+    Строки сверх XLSX_MAX_ROWS продолжаются на следующих листах
+    «Название (2)», «Название (3)», ... с тем же заголовком.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def xlsx_cell(value):
+        # управляющие символы из пользовательского текста openpyxl не
+        # пишет (IllegalCharacterError посреди выгрузки); строка с "="
+        # остаётся текстом, а не формулой
+        if not isinstance(value, str):
+            return value
+        cell = WriteOnlyCell(ws, ILLEGAL_CHARACTERS_RE.sub("", value))
+        cell.data_type = "s"
+        return cell
+
+    def new_sheet(number):
+        suffix = f" ({number})" if number > 1 else ""
+        sheet = wb.create_sheet(title=title[:XLSX_TITLE_LENGTH - len(suffix)] + suffix)
+        sheet.append(list(headers))
+        return sheet
+
+    wb = Workbook(write_only=True)
+    sheets = 1
+    ws = new_sheet(sheets)
+    rows_on_sheet = 1
+    for partition in _iter_batches(stmt, batch_size):
+        for row in partition:
+            if rows_on_sheet >= XLSX_MAX_ROWS:
+                sheets += 1
+                ws = new_sheet(sheets)
+                rows_on_sheet = 1
+            ws.append([xlsx_cell(v) for v in row])
+            rows_on_sheet += 1
+
+    out = tempfile.TemporaryFile()
+    wb.save(out)
+    out.seek(0)
+    return out
@@ -0,0 +1,298 @@
+# app/services/importer.py
+#
+# Массовый импорт материалов и задач из CSV/JSONL. Строки проверяются
+# по тем же правилам, что и формы materials.create_material / tasks.create_task,
+# пишутся пакетным executemany и коммитятся порциями.
+
+import csv
+import io
+import json
+import math
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+
+from app.extensions import db
+from app.models import Material, Project, Task
+from app.services import costs, inventory, search, table_versions
+from app.services.dashboard_stats import invalidate_dashboard_counters
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+
+class RowError(ValueError):
+    """Строка файла не прошла проверку"""
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # [(номер строки, сообщение)]
+        self.elapsed = 0.0
+
+    @property
+    def processed(self):
+        return self.created + self.updated + len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (
+            f"создано: {self.created}, обновлено: {self.updated}, "
+            f"ошибок: {len(self.errors)}, {self.rows_per_second:.0f} строк/с"
+        )
+
+
+def read_rows(stream, fmt):
+    """
+    Читает бинарный поток как CSV (с заголовком) или JSONL.
+    Отдаёт (номер строки, dict) либо (номер строки, RowError).
+    """
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_num, RowError("Некорректный JSON")
+                continue
+            if not isinstance(row, dict):
+                yield line_num, RowError("Ожидается JSON-объект")
+                continue
+            yield line_num, row
+    else:
+        raise ValueError(f"unknown import format: {fmt}")
+
+
+def _field(row, name):
+    value = row.get(name)
+    return "" if value is None else str(value).strip()
+
+
+def clean_material(row):
+    name = _field(row, "name")
+    unit = _field(row, "unit")
+    price_per_unit = _field(row, "price_per_unit")
+    stock_quantity = _field(row, "stock_quantity")
+    description = _field(row, "description")
+
+    if not name:
+        raise RowError("Название материала обязательно")
+    if not unit:
+        raise RowError("Единица измерения обязательна")
+    if not price_per_unit:
+        raise RowError("Цена за единицу обязательна")
+    try:
+        price = float(price_per_unit)
+    except ValueError:
+        raise RowError("Некорректное значение цены")
+    if not math.isfinite(price):
+        raise RowError("Некорректное значение цены")
+    # пустая колонка — остаток не трогать (upsert только цены или описания)
+    qty = None
+    if stock_quantity:
+        try:
+            qty = float(stock_quantity)
+        except ValueError:
+            raise RowError("Некорректное значение количества на складе")
+        if not math.isfinite(qty):
+            raise RowError("Некорректное значение количества на складе")
+        if qty < 0:
+            raise RowError("Количество на складе не может быть отрицательным")
+
+    return {
+        "name": name,
+        "unit": unit,
+        "price_per_unit": price,
+        "stock_quantity": qty,
+        "description": description or None,
+    }
+
+
+def clean_task(row):
+    title = _field(row, "title")
+    description = _field(row, "description")
+    project_id = _field(row, "project_id")
+    status = _field(row, "status") or "to_do"
+    priority = _field(row, "priority") or "medium"
+    deadline_str = _field(row, "deadline")
+
+    if not title:
+        raise RowError("Название задачи обязательно")
+    if not project_id:
+        raise RowError("Выберите проект")
+    try:
+        project_id = int(project_id)
+    except ValueError:
+        raise RowError("Некорректный project_id")
+    deadline = None
+    if deadline_str:
+        try:
+            deadline = datetime.fromisoformat(deadline_str)
+        except ValueError:
+            raise RowError("Некорректная дата дедлайна")
+
+    return {
+        "title": title,
+        "description": description or None,
+        "project_id": project_id,
+        "status": status,
+        "priority": priority,
+        "end_date": deadline,
+    }
+
+
+def _chunks(rows, size, clean, report):
+    chunk = []
+    for line_num, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            chunk.append((line_num, clean(row)))
+        except RowError as exc:
+            report.errors.append((line_num, str(exc)))
+            continue
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_materials(rows, chunk_size=1000, user_id=None):
+    """
+    Upsert материалов по названию: существующие находятся одним
+    SELECT ... WHERE name IN (...) по индексу, затем пакетные UPDATE и INSERT.
+    Уникального ограничения на materials.name в схеме нет, поэтому
+    ON CONFLICT здесь неприменим. Внутри файла побеждает последняя строка.
+
+    Остаток на складе меняется не UPDATE'ом, а движениями инвентаризации
+    (inventory.apply_many) в транзакции inventory.locked_session,
+    строки с остатком меньше резерва — ошибки. Без stock_quantity остаток
+    существующего материала не меняется, новый создаётся с нулём. Если
+    движение порции всё же отклонено (StockError), порция откатывается
+    и все её строки — ошибки.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+
+    for chunk in _chunks(rows, chunk_size, clean_material, report):
+        by_name = {}
+        line_of = {}
+        for line_num, values in chunk:
+            by_name[values["name"]] = values
+            line_of[values["name"]] = line_num
+        # SQLite: BEGIN IMMEDIATE и очередь процесса, как у остальных движений
+        try:
+            with inventory.locked_session(db.session) as conn:
+                existing = dict(
+                    db.session.execute(
+                        select(Material.name, Material.id).where(Material.name.in_(list(by_name)))
+                    ).all()
+                )
+
+                stock = inventory.lock_stock(conn, existing.values())
+                for name, material_id in list(existing.items()):
+                    reserved = stock[material_id][1]
+                    qty = by_name[name]["stock_quantity"]
+                    if qty is not None and qty + inventory.EPSILON < reserved:
+                        report.errors.append((
+                            line_of[name],
+                            f"Остаток {by_name[name]['stock_quantity']:g} меньше резерва {reserved:g}",
+                        ))
+                        del by_name[name]
+
+                now = datetime.utcnow()
+                updates = []
+                targets = {}
+                for name, values in by_name.items():
+                    if name in existing:
+                        values = dict(values, id=existing[name], updated_at=now)
+                        qty = values.pop("stock_quantity")
+                        if qty is not None:
+                            targets[values["id"]] = qty
+                        updates.append(values)
+                inserts = [
+                    dict(values, stock_quantity=0.0)
+                    for name, values in by_name.items()
+                    if name not in existing
+                ]
+
+                ids = []
+                if updates:
+                    db.session.execute(update(Material), updates)
+                    ids.extend(u["id"] for u in updates)
+                if inserts:
+                    # без sort_by_parameter_order порядок RETURNING при insertmanyvalues
+                    # не обязан совпадать с порядком строк, а остатки сопоставляются по zip
+                    new_ids = list(db.session.scalars(
+                        insert(Material).returning(Material.id, sort_by_parameter_order=True), inserts
+                    ))
+                    ids.extend(new_ids)
+                    for material_id, values in zip(new_ids, inserts):
+                        qty = by_name[values["name"]]["stock_quantity"]
+                        if qty is not None:
+                            targets[material_id] = qty
+                if targets:
+                    inventory.apply_many(conn, "adjust", targets, user_id=user_id, note="Импорт")
+                search.reindex(conn, "material", ids)
+                costs.refresh_for_price_change(conn, [u["id"] for u in updates])
+                if ids:
+                    table_versions.mark(db.session, ["materials"])
+                db.session.commit()
+        except inventory.StockError as exc:
+            # locked_session уже откатил порцию; прежние порции закоммичены
+            report.errors.extend(
+                (line_of[name], f"Порция не импортирована: {exc}") for name in by_name
+            )
+            continue
+
+        report.updated += len(updates)
+        report.created += len(inserts)
+
+    report.errors.sort()
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def import_tasks(rows, chunk_size=1000):
+    """Пакетная вставка задач; ссылки на несуществующие проекты — ошибки строк"""
+    report = ImportReport()
+    started = time.perf_counter()
+
+    for chunk in _chunks(rows, chunk_size, clean_task, report):
+        project_ids = {values["project_id"] for _, values in chunk}
+        known = set(
+            db.session.scalars(select(Project.id).where(Project.id.in_(project_ids)))
+        )
+
+        inserts = []
+        for line_num, values in chunk:
+            if values["project_id"] not in known:
+                report.errors.append((line_num, f"Проект {values['project_id']} не найден"))
+            else:
+                inserts.append(values)
+
+        if inserts:
+            ids = list(db.session.scalars(insert(Task).returning(Task.id), inserts))
+            conn = db.session.connection()
+            search.reindex(conn, "task", ids)
+            table_versions.mark(db.session, ["tasks"])
+            db.session.commit()
+            report.created += len(inserts)
+
+    if report.created:
+        invalidate_dashboard_counters()
+    report.errors.sort()
+    report.elapsed = time.perf_counter() - started
+    return report
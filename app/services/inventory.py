@@ -0,0 +1,334 @@
+"""
+Складской учёт: журнал движений и атомарные резервы.
+
+Остатки лежат снимком в строке материала (stock_quantity — на складе,
+reserved_quantity — в резерве), поэтому чтение — O(1). Любое изменение
+снимка идёт только через apply(): строка материала блокируется
+(SELECT ... FOR UPDATE на PostgreSQL; на SQLite транзакцию открывает
+BEGIN IMMEDIATE в locked_transaction), проверяются остатки, обновляются
+снимок и резерв проекта и дописывается движение — всё в одной транзакции.
+
+Движения:
+  receipt  — приход:            on_hand += q
+  reserve  — резерв под проект: reserved += q, не больше доступного
+  release  — снятие резерва:    reserved -= q, не больше резерва проекта
+  consume  — списание из резерва: on_hand -= q, reserved -= q
+  adjust   — инвентаризация:    on_hand = новое значение (в журнале — разница)
+"""
+
+import math
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+
+from app.models import Material, Project, ProjectMaterial, StockMovement, StockReservation
+from app.services import table_versions
+
+_materials = Material.__table__
+_projects = Project.__table__
+_movements = StockMovement.__table__
+_reservations = StockReservation.__table__
+
+# погрешность float при сравнении остатков
+EPSILON = 1e-9
+
+# таблицы, версии которых меняет движение; apply() их не увеличивает —
+# это делает вызывающий (run_movement, locked_session, table_versions.mark)
+MOVEMENT_TABLES = ("materials", "stock_movements")
+
+
+class StockError(ValueError):
+    """Движение невозможно: не хватает остатка или резерва, неверные данные"""
+
+
+# SQLite: движения одного процесса встают в очередь на threading.Lock,
+# а не опрашивают файловую блокировку с растущими паузами busy_timeout
+_sqlite_locks = weakref.WeakKeyDictionary()
+_sqlite_locks_guard = threading.Lock()
+
+
+def _process_lock(engine):
+    with _sqlite_locks_guard:
+        lock = _sqlite_locks.get(engine)
+        if lock is None:
+            lock = _sqlite_locks[engine] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def locked_transaction(engine):
+    """
+    Отдельное соединение с транзакцией, в которой можно блокировать строки.
+    SQLite блокирует базу целиком: BEGIN IMMEDIATE сразу берёт блокировку
+    записи (ждёт busy_timeout), иначе отложенная транзакция, успевшая
+    прочитать, получила бы SQLITE_BUSY при попытке записи.
+    """
+    if engine.dialect.name != "sqlite":
+        with engine.begin() as conn:
+            yield conn
+        return
+    with _process_lock(engine), engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+@contextmanager
+def locked_session(session):
+    """
+    То же для транзакции сессии ORM, когда движения идут вместе с правками
+    моделей (удаление проекта, импорт). Отдаёт соединение сессии; коммит
+    делается внутри блока, при исключении сессия откатывается, версии
+    MOVEMENT_TABLES увеличиваются после коммита. На SQLite
+    BEGIN IMMEDIATE выполняется, если драйвер ещё не открыл транзакцию;
+    открытая транзакция уже что-то записала и держит блокировку записи.
+    """
+    conn = session.connection()
+    if conn.dialect.name != "sqlite":
+        table_versions.mark(session, MOVEMENT_TABLES)
+        try:
+            yield conn
+        except BaseException:
+            session.rollback()
+            raise
+        return
+    with _process_lock(conn.engine):
+        conn = session.connection()
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        table_versions.mark(session, MOVEMENT_TABLES)
+        try:
+            yield conn
+        except BaseException:
+            session.rollback()
+            raise
+
+
+def lock_stock(conn, material_ids):
+    """
+    {id: [на складе, в резерве]} с блокировкой строк материалов до конца
+    транзакции; порядок id исключает взаимные блокировки.
+    """
+    rows = conn.execute(
+        select(_materials.c.id, _materials.c.stock_quantity, _materials.c.reserved_quantity)
+        .where(_materials.c.id.in_(sorted(material_ids)))
+        .order_by(_materials.c.id)
+        .with_for_update()
+    ).all()
+    return {row.id: [row.stock_quantity or 0.0, row.reserved_quantity or 0.0] for row in rows}
+
+
+def _project_reservation(conn, project_id, material_id):
+    return conn.execute(
+        select(_reservations.c.quantity)
+        .where(_reservations.c.project_id == project_id)
+        .where(_reservations.c.material_id == material_id)
+    ).scalar()
+
+
+def _set_reservation(conn, project_id, material_id, current, quantity, now):
+    # строку резерва меняет только держатель блокировки материала — гонки нет
+    if current is None:
+        conn.execute(insert(_reservations).values(
+            project_id=project_id, material_id=material_id, quantity=quantity, updated_at=now,
+        ))
+    else:
+        conn.execute(
+            update(_reservations)
+            .where(_reservations.c.project_id == project_id)
+            .where(_reservations.c.material_id == material_id)
+            .values(quantity=quantity, updated_at=now)
+        )
+
+
+def _check_project(conn, kind, project_id):
+    """
+    На SQLite внешние ключи не проверяются: резерв несуществующего проекта
+    навсегда занял бы остаток, а снять его release_project было бы некому.
+    Резервировать под закрытый проект нельзя, снимать и списывать — можно.
+    """
+    row = conn.execute(
+        select(_projects.c.status).where(_projects.c.id == project_id)
+    ).first()
+    if row is None:
+        raise StockError(f"Проект {project_id} не найден")
+    if kind == "reserve" and row.status == "closed":
+        raise StockError(f"Проект {project_id} закрыт")
+
+
+def apply(conn, kind, material_id, quantity, project_id=None, user_id=None, note=None):
+    """
+    Выполняет одно движение в транзакции conn и возвращает снимок
+    {"on_hand", "reserved", "available"}; StockError, если нельзя.
+    """
+    return apply_many(conn, kind, {material_id: quantity}, project_id, user_id, note)[material_id]
+
+
+def apply_many(conn, kind, quantities, project_id=None, user_id=None, note=None):
+    """
+    Одно движение по нескольким материалам (например, резерв всей
+    спецификации проекта): либо проходят все, либо ни одно.
+    """
+    if kind not in ("receipt", "reserve", "release", "consume", "adjust"):
+        raise StockError(f"Неизвестный тип движения: {kind}")
+    if kind in ("reserve", "release", "consume") and project_id is None:
+        raise StockError("Для резерва и списания нужен проект")
+    for material_id, qty in quantities.items():
+        # float("nan") проходит сравнение qty < 0, а NaN в снимке ломает все проверки
+        if qty is None or not math.isfinite(qty):
+            raise StockError("Некорректное количество")
+        if qty < 0 or (qty == 0 and kind != "adjust"):
+            raise StockError("Количество должно быть положительным")
+    if project_id is not None:
+        _check_project(conn, kind, project_id)
+
+    snapshot = lock_stock(conn, quantities)
+    missing = set(quantities) - set(snapshot)
+    if missing:
+        raise StockError(f"Материал {min(missing)} не найден")
+
+    now = datetime.utcnow()
+    movements = []
+    result = {}
+    for material_id in sorted(quantities):
+        qty = quantities[material_id]
+        on_hand, reserved = snapshot[material_id]
+        delta = qty
+
+        if kind == "receipt":
+            on_hand += qty
+        elif kind == "adjust":
+            if qty + EPSILON < reserved:
+                raise StockError(
+                    f"Материал {material_id}: остаток {qty} меньше резерва {reserved}"
+                )
+            delta = qty - on_hand
+            if abs(delta) < EPSILON:
+                result[material_id] = {"on_hand": on_hand, "reserved": reserved, "available": on_hand - reserved}
+                continue
+            on_hand = qty
+        else:
+            held = _project_reservation(conn, project_id, material_id)
+            held_qty = held or 0.0
+            if kind == "reserve":
+                if on_hand - reserved + EPSILON < qty:
+                    raise StockError(
+                        f"Материал {material_id}: доступно {on_hand - reserved:g}, запрошено {qty:g}"
+                    )
+                reserved += qty
+                held_qty += qty
+            else:
+                if held_qty + EPSILON < qty:
+                    raise StockError(
+                        f"Материал {material_id}: в резерве проекта {held_qty:g}, запрошено {qty:g}"
+                    )
+                reserved -= qty
+                held_qty -= qty
+                if kind == "consume":
+                    on_hand -= qty
+            _set_reservation(conn, project_id, material_id, held, max(held_qty, 0.0), now)
+
+        reserved = max(reserved, 0.0)
+        conn.execute(
+            update(_materials)
+            .where(_materials.c.id == material_id)
+            .values(stock_quantity=on_hand, reserved_quantity=reserved, updated_at=now)
+        )
+        movements.append({
+            "material_id": material_id,
+            "project_id": project_id,
+            "kind": kind,
+            "quantity": delta,
+            "on_hand_after": on_hand,
+            "reserved_after": reserved,
+            "user_id": user_id,
+            "note": note,
+            "created_at": now,
+        })
+        result[material_id] = {"on_hand": on_hand, "reserved": reserved, "available": on_hand - reserved}
+
+    if movements:
+        conn.execute(insert(_movements), movements)
+    return result
+
+
+def run_movement(engine, kind, material_id, quantity, project_id=None, user_id=None, note=None):
+    """apply() в собственной заблокированной транзакции"""
+    with locked_transaction(engine) as conn:
+        result = apply(conn, kind, material_id, quantity, project_id, user_id, note)
+        deferred = table_versions.bump_or_defer(conn, MOVEMENT_TABLES)
+    if deferred:
+        table_versions.bump_committed(engine, MOVEMENT_TABLES)
+    return result
+
+
+def stock_of(conn, material_id):
+    row = conn.execute(
+        select(_materials.c.stock_quantity, _materials.c.reserved_quantity)
+        .where(_materials.c.id == material_id)
+    ).first()
+    if row is None:
+        return None
+    on_hand, reserved = row.stock_quantity or 0.0, row.reserved_quantity or 0.0
+    return {"on_hand": on_hand, "reserved": reserved, "available": on_hand - reserved}
+
+
+def reservations_of(conn, material_id):
+    """[(project_id, quantity)] ненулевых резервов материала"""
+    return conn.execute(
+        select(_reservations.c.project_id, _reservations.c.quantity)
+        .where(_reservations.c.material_id == material_id)
+        .where(_reservations.c.quantity > EPSILON)
+        .order_by(_reservations.c.project_id)
+    ).all()
+
+
+def release_project(conn, project_id, user_id=None, note=None):
+    """Снимает все резервы проекта (перед удалением проекта)"""
+    held = dict(conn.execute(
+        select(_reservations.c.material_id, _reservations.c.quantity)
+        .where(_reservations.c.project_id == project_id)
+        .where(_reservations.c.quantity > EPSILON)
+    ).all())
+    if held:
+        apply_many(conn, "release", held, project_id, user_id, note)
+    return held
+
+
+def project_demand(conn, material_id):
+    """
+    Потребность проектов в материале (сумма ProjectMaterial.quantity)
+    рядом с их текущим резервом: [(project_id, нужно, в резерве)].
+    """
+    needed = dict(conn.execute(
+        select(ProjectMaterial.project_id, func.sum(ProjectMaterial.quantity))
+        .where(ProjectMaterial.material_id == material_id)
+        .group_by(ProjectMaterial.project_id)
+    ).all())
+    held = dict(reservations_of(conn, material_id))
+    return [
+        (project_id, needed.get(project_id, 0.0), held.get(project_id, 0.0))
+        for project_id in sorted(set(needed) | set(held))
+    ]
+
+
+def reconcile(conn, material_id):
+    """
+    Остатки, пересчитанные по журналу, для сверки со снимком:
+    on_hand = приход + инвентаризация - списание, reserved = резерв - снятие - списание.
+    """
+    sums = dict(conn.execute(
+        select(_movements.c.kind, func.sum(_movements.c.quantity))
+        .where(_movements.c.material_id == material_id)
+        .group_by(_movements.c.kind)
+    ).all())
+    on_hand = sums.get("receipt", 0) + sums.get("adjust", 0) - sums.get("consume", 0)
+    reserved = sums.get("reserve", 0) - sums.get("release", 0) - sums.get("consume", 0)
+    return {"on_hand": on_hand, "reserved": reserved}
@@ -0,0 +1,296 @@
+# app/services/notifications.py
+#
+# Уведомления о дедлайнах задач и проектов через Telegram-бота.
+#
+# Окна ("корзины") — диапазоны по дедлайну: просрочено за последние
+# NOTIFY_OVERDUE_DAYS дней, [0, w1), [w1, w2)... дней вперёд. Каждая
+# корзина — диапазонный запрос по индексу (end_date, status), без
+# сканирования всех задач. Получатели — пользователи с ролями
+# NOTIFY_ROLES; каждому уходит одна сводка на прогон.
+#
+# Перед отправкой сообщение «застолбляется» строками notification_log
+# с уникальным ключом (пользователь, корзина, дедлайн, объект): после
+# рестарта застолбленное не отправляется повторно, а при ошибке
+# отправки строки снимаются и уйдут в следующем прогоне.
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from app.models import NotificationLog, Project, Task, User
+
+logger = logging.getLogger(__name__)
+
+# лимит Telegram — 4096 символов на сообщение
+MAX_MESSAGE_LENGTH = 4000
+
+
+class DueItem:
+    __slots__ = ("kind", "object_id", "title", "project", "deadline")
+
+    def __init__(self, kind, object_id, title, project, deadline):
+        self.kind = kind
+        self.object_id = object_id
+        self.title = title
+        self.project = project
+        self.deadline = deadline
+
+    @property
+    def key(self):
+        return self.kind, self.object_id, self.deadline
+
+
+def make_buckets(now, windows, overdue_days):
+    """[(имя, начало, конец)] — непересекающиеся диапазоны дедлайнов"""
+    buckets = [("overdue", now - timedelta(days=overdue_days), now)]
+    lo = now
+    for days in sorted(windows):
+        hi = now + timedelta(days=days)
+        buckets.append((f"due_{days}d", lo, hi))
+        lo = hi
+    return buckets
+
+
+# === запросы (session, ...) для BotDataAccess.run ===
+
+def fetch_recipients(session, roles):
+    return session.execute(
+        select(User.id, User.telegram_id).where(User.role.in_(roles)).order_by(User.id)
+    ).all()
+
+
+def fetch_due_items(session, lo, hi):
+    """Незакрытые задачи и проекты с дедлайном в [lo, hi)"""
+    tasks = session.execute(
+        select(Task.id, Task.title, Project.name, Task.end_date)
+        .join(Project, Task.project_id == Project.id)
+        .where(Task.end_date >= lo, Task.end_date < hi, Task.status != "done")
+        .order_by(Task.end_date, Task.id)
+    ).all()
+    projects = session.execute(
+        select(Project.id, Project.name, Project.deadline)
+        .where(Project.deadline >= lo, Project.deadline < hi, Project.status != "closed")
+        .order_by(Project.deadline, Project.id)
+    ).all()
+    return [DueItem("project", pid, name, None, deadline) for pid, name, deadline in projects] + [
+        DueItem("task", tid, title, project, deadline) for tid, title, project, deadline in tasks
+    ]
+
+
+def fetch_sent_keys(session, user_id, bucket, lo, hi):
+    return set(
+        session.execute(
+            select(NotificationLog.kind, NotificationLog.object_id, NotificationLog.deadline)
+            .where(
+                NotificationLog.user_id == user_id,
+                NotificationLog.bucket == bucket,
+                NotificationLog.deadline >= lo,
+                NotificationLog.deadline < hi,
+            )
+        ).all()
+    )
+
+
+def claim(session, user_id, entries, now):
+    """
+    Застолбляет [(корзина, DueItem)] за пользователем.
+    False — их уже застолбил другой процесс.
+    """
+    try:
+        session.execute(
+            insert(NotificationLog),
+            [
+                {
+                    "user_id": user_id,
+                    "kind": item.kind,
+                    "object_id": item.object_id,
+                    "bucket": bucket,
+                    "deadline": item.deadline,
+                    "sent_at": now,
+                }
+                for bucket, item in entries
+            ],
+        )
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        return False
+    return True
+
+
+def release(session, user_id, entries):
+    keys = [(bucket, item.kind, item.object_id, item.deadline) for bucket, item in entries]
+    session.execute(
+        delete(NotificationLog).where(
+            NotificationLog.user_id == user_id,
+            tuple_(
+                NotificationLog.bucket,
+                NotificationLog.kind,
+                NotificationLog.object_id,
+                NotificationLog.deadline,
+            ).in_(keys),
+        )
+    )
+
+
+# === формирование и отправка ===
+
+BUCKET_TITLES = {"overdue": "Просрочено"}
+
+
+def _bucket_title(bucket):
+    if bucket in BUCKET_TITLES:
+        return BUCKET_TITLES[bucket]
+    return f"Срок в ближайшие {bucket[4:-1]} дн."
+
+
+def _line(item):
+    where = f" [{item.project}]" if item.project else ""
+    label = "Проект" if item.kind == "project" else f"#{item.object_id}"
+    return f"• {label} {item.title}{where} — {item.deadline.strftime('%d.%m.%Y %H:%M')}"
+
+
+def compose_messages(entries):
+    """
+    Делит [(корзина, DueItem)] на сообщения не длиннее MAX_MESSAGE_LENGTH.
+    Возвращает [(текст, entries сообщения)].
+    """
+    messages = []
+    text, chunk, current_bucket = "Дедлайны", [], None
+    for bucket, item in entries:
+        header = f"\n\n{_bucket_title(bucket)}:" if bucket != current_bucket else ""
+        line = f"{header}\n{_line(item)}"
+        if chunk and len(text) + len(line) > MAX_MESSAGE_LENGTH:
+            messages.append((text, chunk))
+            text, chunk = "Дедлайны (продолжение)", []
+            line = f"\n\n{_bucket_title(bucket)}:\n{_line(item)}"
+        text += line
+        chunk.append((bucket, item))
+        current_bucket = bucket
+    if chunk:
+        messages.append((text, chunk))
+    return messages
+
+
+class BotTransport:
+    """Отправка через telegram.Bot из приложения бота"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def send(self, chat_id, text):
+        await self.bot.send_message(chat_id=chat_id, text=text)
+
+
+class DeadlineNotifier:
+    """
+    Один прогон — run_once(); run_forever() повторяет его каждые interval секунд.
+
+    clock (текущее время для дедлайнов), monotonic и sleep подменяются
+    в тестах фейковыми; transport — объект с async send(chat_id, text).
+    """
+
+    def __init__(
+        self,
+        data,
+        transport,
+        windows=(1, 3),
+        overdue_days=7,
+        roles=("admin", "manager"),
+        rate_per_second=20,
+        clock=datetime.utcnow,
+        monotonic=time.monotonic,
+        sleep=asyncio.sleep,
+    ):
+        self.data = data
+        self.transport = transport
+        self.windows = tuple(windows)
+        self.overdue_days = overdue_days
+        self.roles = tuple(roles)
+        self.rate_per_second = rate_per_second
+        self.clock = clock
+        self.monotonic = monotonic
+        self.sleep = sleep
+
+    @classmethod
+    def from_app(cls, app, data, transport, **kwargs):
+        return cls(
+            data,
+            transport,
+            windows=app.config["NOTIFY_WINDOWS"],
+            overdue_days=app.config["NOTIFY_OVERDUE_DAYS"],
+            roles=app.config["NOTIFY_ROLES"],
+            rate_per_second=app.config["NOTIFY_RATE"],
+            **kwargs,
+        )
+
+    async def run_once(self):
+        now = self.clock()
+        recipients = await self.data.run(fetch_recipients, self.roles)
+        if not recipients:
+            return {"recipients": 0, "items": 0, "messages": 0, "failed": 0}
+
+        buckets = make_buckets(now, self.windows, self.overdue_days)
+        due = []
+        for bucket, lo, hi in buckets:
+            items = await self.data.run(fetch_due_items, lo, hi)
+            due.append((bucket, lo, hi, items))
+
+        outbox = []  # (user_id, chat_id, текст, entries)
+        for user_id, chat_id in recipients:
+            entries = []
+            for bucket, lo, hi, items in due:
+                if not items:
+                    continue
+                sent = await self.data.run(fetch_sent_keys, user_id, bucket, lo, hi)
+                entries.extend((bucket, item) for item in items if item.key not in sent)
+            for text, chunk in compose_messages(entries):
+                outbox.append((user_id, chat_id, text, chunk))
+
+        stats = {
+            "recipients": len(recipients),
+            "items": sum(len(items) for *_, items in due),
+            "messages": 0,
+            "failed": 0,
+        }
+        await self._dispatch(outbox, now, stats)
+        return stats
+
+    async def _dispatch(self, outbox, now, stats):
+        """Партиями по rate_per_second сообщений не чаще раза в секунду"""
+        batch_size = max(1, int(self.rate_per_second))
+        for start in range(0, len(outbox), batch_size):
+            started = self.monotonic()
+            batch = outbox[start:start + batch_size]
+            results = await asyncio.gather(*(self._send(msg, now) for msg in batch))
+            stats["messages"] += sum(1 for ok in results if ok)
+            stats["failed"] += sum(1 for ok in results if ok is False)
+            if start + batch_size < len(outbox):
+                remaining = 1.0 - (self.monotonic() - started)
+                if remaining > 0:
+                    await self.sleep(remaining)
+
+    async def _send(self, message, now):
+        user_id, chat_id, text, entries = message
+        if not await self.data.run(claim, user_id, entries, now):
+            return None
+        try:
+            await self.transport.send(chat_id, text)
+        except Exception as exc:
+            logger.warning("deadline notification to user %s failed: %s", user_id, exc)
+            await self.data.run(release, user_id, entries)
+            return False
+        return True
+
+    async def run_forever(self, interval):
+        while True:
+            try:
+                stats = await self.run_once()
+                logger.info("deadline notifications: %s", stats)
+            except Exception:
+                logger.exception("deadline notification run failed")
+            await self.sleep(interval)
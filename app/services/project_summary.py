@@ -0,0 +1,173 @@
+# app/services/project_summary.py
+#
+# Сводка проекта: задачи по статусам и приоритетам, стоимость материалов,
+# последний комментарий и последняя активность. Для любого числа проектов —
+# четыре сгруппированных запроса по project_id IN (...), без обхода связей.
+#
+# Готовые сводки кэшируются в процессе по (project_id, версии таблиц из
+# SUMMARY_TABLES): любая запись в задачи, комментарии или смету меняет
+# версию (app/services/table_versions.py), и старая сводка больше не находится.
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models import (
+    TASK_PRIORITY_CHOICES,
+    TASK_STATUS_CHOICES,
+    Comment,
+    Project,
+    ProjectCostRollup,
+    Task,
+    User,
+)
+from app.utils.cache import TTLCache
+from app.utils.response_cache import table_state
+
+# таблицы, от которых зависит сводка; ими же кэшируются фрагменты со сводками
+SUMMARY_TABLES = ("projects", "tasks", "comments", "project_materials", "materials")
+
+_cache = TTLCache(maxsize=1024)
+
+
+def _empty(project):
+    return {
+        "id": project.id,
+        "name": project.name,
+        "client": project.client,
+        "status": project.status,
+        "deadline": project.deadline,
+        "tasks_total": 0,
+        "tasks_by_status": dict.fromkeys(TASK_STATUS_CHOICES, 0),
+        "tasks_by_priority": dict.fromkeys(TASK_PRIORITY_CHOICES, 0),
+        "material_cost": 0.0,
+        "material_lines": 0,
+        "comments_total": 0,
+        "last_comment": None,
+        "last_activity": project.updated_at,
+    }
+
+
+def _bump_activity(summary, moment):
+    if moment is not None and (summary["last_activity"] is None or moment > summary["last_activity"]):
+        summary["last_activity"] = moment
+
+
+def compute_summaries(session, project_ids):
+    """{project_id: сводка} без кэша; несуществующие id пропускаются"""
+    ids = sorted(set(project_ids))
+    if not ids:
+        return {}
+
+    projects = session.execute(
+        select(
+            Project.id, Project.name, Project.client, Project.status,
+            Project.deadline, Project.updated_at,
+        ).where(Project.id.in_(ids))
+    ).all()
+    result = {p.id: _empty(p) for p in projects}
+    ids = list(result)
+    if not ids:
+        return result
+
+    task_rows = session.execute(
+        select(
+            Task.project_id, Task.status, Task.priority,
+            func.count(Task.id), func.max(Task.updated_at),
+        )
+        .where(Task.project_id.in_(ids))
+        .group_by(Task.project_id, Task.status, Task.priority)
+    )
+    for project_id, status, priority, count, updated_at in task_rows:
+        summary = result[project_id]
+        summary["tasks_total"] += count
+        by_status = summary["tasks_by_status"]
+        by_status[status] = by_status.get(status, 0) + count
+        by_priority = summary["tasks_by_priority"]
+        by_priority[priority] = by_priority.get(priority, 0) + count
+        _bump_activity(summary, updated_at)
+
+    # стоимость уже посчитана в project_cost_rollups (app/services/costs.py)
+    cost_rows = session.execute(
+        select(ProjectCostRollup.project_id, ProjectCostRollup.material_cost, ProjectCostRollup.line_count)
+        .where(ProjectCostRollup.project_id.in_(ids))
+    )
+    for project_id, cost, lines in cost_rows:
+        result[project_id]["material_cost"] = cost or 0.0
+        result[project_id]["material_lines"] = lines
+
+    # последний комментарий каждого проекта: ROW_NUMBER по индексу
+    # ix_comments_project_id_created_at_id, вместе с автором и общим числом
+    ranked = (
+        select(
+            Comment.id, Comment.project_id, Comment.text, Comment.created_at, Comment.user_id,
+            func.row_number().over(
+                partition_by=Comment.project_id,
+                order_by=(Comment.created_at.desc(), Comment.id.desc()),
+            ).label("rn"),
+            func.count().over(partition_by=Comment.project_id).label("total"),
+        )
+        .where(Comment.project_id.in_(ids))
+        .subquery()
+    )
+    comment_rows = session.execute(
+        select(
+            ranked.c.project_id, ranked.c.id, ranked.c.text, ranked.c.created_at,
+            ranked.c.user_id, ranked.c.total, User.username, User.first_name, User.last_name,
+        )
+        .outerjoin(User, User.id == ranked.c.user_id)
+        .where(ranked.c.rn == 1)
+    )
+    for row in comment_rows:
+        summary = result[row.project_id]
+        summary["comments_total"] = row.total
+        full_name = " ".join(part for part in (row.first_name, row.last_name) if part)
+        summary["last_comment"] = {
+            "id": row.id,
+            "text": row.text,
+            "created_at": row.created_at,
+            "user_id": row.user_id,
+            "author": full_name or row.username or f"#{row.user_id}",
+        }
+        _bump_activity(summary, row.created_at)
+
+    return result
+
+
+def get_summaries(project_ids):
+    """
+    Сводки из кэша процесса; недостающие считаются одним пакетом
+    compute_summaries(). Возвращаемые словари общие с кэшем — не менять.
+    """
+    token, _ = table_state(SUMMARY_TABLES)
+    ttl = current_app.config["PROJECT_SUMMARY_TTL"]
+    found = {}
+    missing = []
+    for project_id in dict.fromkeys(project_ids):
+        summary = _cache.get((project_id, token))
+        if summary is None:
+            missing.append(project_id)
+        else:
+            found[project_id] = summary
+    if missing:
+        for project_id, summary in compute_summaries(db.session, missing).items():
+            _cache.set((project_id, token), summary, ttl=ttl)
+            found[project_id] = summary
+    return found
+
+
+def get_summary(project_id):
+    """Сводка одного проекта или None"""
+    return get_summaries([project_id]).get(project_id)
+
+
+def summary_json(summary):
+    """Сводка для JSON: даты в ISO 8601"""
+    data = dict(summary)
+    for key in ("deadline", "last_activity"):
+        data[key] = data[key].isoformat() if data[key] else None
+    if data["last_comment"] is not None:
+        data["last_comment"] = dict(
+            data["last_comment"], created_at=data["last_comment"]["created_at"].isoformat()
+        )
+    return data
@@ -0,0 +1,278 @@
+# app/services/search.py
+#
+# Полнотекстовый поиск по проектам, задачам, материалам и комментариям.
+# SQLite: виртуальная таблица FTS5, PostgreSQL: таблица с tsvector и GIN.
+# Индекс обновляется в той же транзакции, что и сами данные (after_flush).
+
+import re
+from itertools import chain
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.orm import Session
+
+from app.models import Comment, Material, Project, Task
+
+SEARCH_TABLE = "search_index"
+
+# doc_id = object_id * len(KINDS) + код типа: удаление и замена
+# документа идут по первичному ключу, без сканирования индекса
+KINDS = ("project", "task", "material", "comment")
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(value):
+    """Ё и ё ищутся как е"""
+    return (value or "").replace("ё", "е").replace("Ё", "Е")
+
+
+def _sql_normalize(expr):
+    return f"replace(replace(coalesce({expr}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def doc_id(kind, object_id):
+    return object_id * len(KINDS) + _KIND_CODES[kind]
+
+
+def document_for(obj):
+    """Документ индекса для модели или None, если модель не индексируется"""
+    if isinstance(obj, Project):
+        kind, project_id, title, body = "project", obj.id, obj.name, f"{obj.client or ''} {obj.description or ''}"
+    elif isinstance(obj, Task):
+        kind, project_id, title, body = "task", obj.project_id, obj.title, obj.description
+    elif isinstance(obj, Material):
+        kind, project_id, title, body = "material", None, obj.name, obj.description
+    elif isinstance(obj, Comment):
+        kind, project_id, title, body = "comment", obj.project_id, "", obj.text
+    else:
+        return None
+    return {
+        "doc_id": doc_id(kind, obj.id),
+        "kind": kind,
+        "object_id": obj.id,
+        "project_id": project_id,
+        "title": normalize(title),
+        "body": normalize(body),
+    }
+
+
+# kind -> (таблица, project_id, title, body) для заполнения индекса из SQL
+_SQL_SOURCES = {
+    "project": ("projects", "id", "name", "coalesce(client, '') || ' ' || coalesce(description, '')"),
+    "task": ("tasks", "project_id", "title", "description"),
+    "material": ("materials", "NULL", "name", "description"),
+    "comment": ("comments", "project_id", "''", "text"),
+}
+
+
+def _insert_select(kind, key_column, by_ids=False):
+    table, project_id, title, body = _SQL_SOURCES[kind]
+    sql = (
+        f"INSERT INTO {SEARCH_TABLE} ({key_column}, kind, object_id, project_id, title, body) "
+        f"SELECT id * {len(KINDS)} + {_KIND_CODES[kind]}, '{kind}', id, {project_id}, "
+        f"{_sql_normalize(title)}, {_sql_normalize(body)} FROM {table}"
+    )
+    stmt = text(sql + " WHERE id IN :ids" if by_ids else sql)
+    if by_ids:
+        stmt = stmt.bindparams(bindparam("ids", expanding=True))
+    return stmt
+
+
+class SqliteFtsBackend:
+    name = "sqlite"
+
+    def create(self, conn):
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, project_id UNINDEXED, title, body, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+
+    def upsert(self, conn, docs):
+        self.delete(conn, [d["doc_id"] for d in docs])
+        conn.execute(
+            text(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, project_id, title, body) "
+                "VALUES (:doc_id, :kind, :object_id, :project_id, :title, :body)"
+            ),
+            docs,
+        )
+
+    def delete(self, conn, doc_ids):
+        conn.execute(
+            text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :doc_id"),
+            [{"doc_id": i} for i in doc_ids],
+        )
+
+    def rebuild(self, conn):
+        conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        for kind in KINDS:
+            conn.execute(_insert_select(kind, "rowid"))
+        conn.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+
+    def reindex(self, conn, kind, ids):
+        self.delete(conn, [doc_id(kind, i) for i in ids])
+        conn.execute(_insert_select(kind, "rowid", by_ids=True), {"ids": list(ids)})
+
+    def search(self, conn, tokens, kind, limit):
+        match = " ".join(f'"{t}"*' for t in tokens)
+        # bm25: title весит больше body; меньшее значение — более релевантно
+        sql = (
+            f"SELECT kind, object_id, project_id, title, substr(body, 1, 200) AS body, "
+            f"bm25({SEARCH_TABLE}, 0, 0, 0, 4.0, 1.0) AS rank "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+        )
+        params = {"match": match, "limit": limit}
+        if kind:
+            sql += "AND kind = :kind "
+            params["kind"] = kind
+        sql += "ORDER BY rank LIMIT :limit"
+        return conn.execute(text(sql), params).mappings().all()
+
+
+class PostgresFtsBackend:
+    name = "postgresql"
+
+    # 'simple' без стемминга: одинаково работает для русского и английского
+    config = "simple"
+
+    def create(self, conn):
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            "doc_id BIGINT PRIMARY KEY, kind VARCHAR(16) NOT NULL, object_id INTEGER NOT NULL, "
+            "project_id INTEGER, title TEXT NOT NULL DEFAULT '', body TEXT NOT NULL DEFAULT '', "
+            f"tsv tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{self.config}', title), 'A') || "
+            f"setweight(to_tsvector('{self.config}', body), 'B')) STORED)"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{SEARCH_TABLE}_tsv ON {SEARCH_TABLE} USING GIN (tsv)"
+        ))
+
+    def upsert(self, conn, docs):
+        conn.execute(
+            text(
+                f"INSERT INTO {SEARCH_TABLE} (doc_id, kind, object_id, project_id, title, body) "
+                "VALUES (:doc_id, :kind, :object_id, :project_id, :title, :body) "
+                "ON CONFLICT (doc_id) DO UPDATE SET project_id = EXCLUDED.project_id, "
+                "title = EXCLUDED.title, body = EXCLUDED.body"
+            ),
+            docs,
+        )
+
+    def delete(self, conn, doc_ids):
+        conn.execute(
+            text(f"DELETE FROM {SEARCH_TABLE} WHERE doc_id = ANY(:doc_ids)"),
+            {"doc_ids": list(doc_ids)},
+        )
+
+    def rebuild(self, conn):
+        conn.execute(text(f"TRUNCATE {SEARCH_TABLE}"))
+        for kind in KINDS:
+            conn.execute(_insert_select(kind, "doc_id"))
+
+    def reindex(self, conn, kind, ids):
+        self.delete(conn, [doc_id(kind, i) for i in ids])
+        conn.execute(_insert_select(kind, "doc_id", by_ids=True), {"ids": list(ids)})
+
+    def search(self, conn, tokens, kind, limit):
+        query = " & ".join(f"{t}:*" for t in tokens)
+        sql = (
+            "SELECT kind, object_id, project_id, title, left(body, 200) AS body, "
+            f"ts_rank_cd(tsv, q) AS rank FROM {SEARCH_TABLE}, "
+            f"to_tsquery('{self.config}', :query) AS q WHERE tsv @@ q "
+        )
+        params = {"query": query, "limit": limit}
+        if kind:
+            sql += "AND kind = :kind "
+            params["kind"] = kind
+        sql += "ORDER BY rank DESC LIMIT :limit"
+        return conn.execute(text(sql), params).mappings().all()
+
+
+_BACKENDS = {
+    "sqlite": SqliteFtsBackend(),
+    "postgresql": PostgresFtsBackend(),
+}
+
+
+def get_backend(dialect_name):
+    """Бэкенд поиска для диалекта БД или None, если поиск не поддерживается"""
+    return _BACKENDS.get(dialect_name)
+
+
+def create_search_index(conn):
+    backend = get_backend(conn.dialect.name)
+    if backend is None:
+        return
+    backend.create(conn)
+    backend.rebuild(conn)
+
+
+def rebuild_search_index(conn):
+    backend = get_backend(conn.dialect.name)
+    if backend is not None:
+        backend.rebuild(conn)
+
+
+def search(conn, query, kind=None, limit=50):
+    """
+    Ранжированный поиск: каждое слово запроса ищется как префикс,
+    все слова должны встретиться в документе.
+    """
+    backend = get_backend(conn.dialect.name)
+    tokens = [t.lower() for t in _TOKEN_RE.findall(normalize(query))]
+    if backend is None or not tokens:
+        return []
+    return backend.search(conn, tokens, kind, limit)
+
+
+def reindex(conn, kind, ids):
+    """Переиндексирует строки одного типа по id (после массовых INSERT/UPDATE)"""
+    backend = get_backend(conn.dialect.name)
+    if backend is not None and ids:
+        backend.reindex(conn, kind, ids)
+
+
+def remove(conn, kind, ids):
+    """Удаляет документы одного типа по id (после массовых DELETE)"""
+    backend = get_backend(conn.dialect.name)
+    if backend is not None and ids:
+        backend.delete(conn, [doc_id(kind, i) for i in ids])
+
+
+def index_documents(conn, objs):
+    """Переиндексирует объекты моделей, например после массовых операций"""
+    backend = get_backend(conn.dialect.name)
+    docs = [d for d in map(document_for, objs) if d is not None]
+    if backend is not None and docs:
+        backend.upsert(conn, docs)
+
+
+def _after_flush(session, flush_context):
+    if not session.info.get("search_indexing", True):
+        return
+    deleted = [d for d in map(document_for, session.deleted) if d is not None]
+    changed = [
+        d for d in map(document_for, chain(session.new, session.dirty))
+        if d is not None
+    ]
+    if not deleted and not changed:
+        return
+
+    conn = session.connection()
+    backend = get_backend(conn.dialect.name)
+    if backend is None:
+        return
+    if deleted:
+        backend.delete(conn, [d["doc_id"] for d in deleted])
+    if changed:
+        backend.upsert(conn, changed)
+
+
+def install_search_indexing(app):
+    if not app.config.get("SEARCH_ENABLED"):
+        return
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
@@ -0,0 +1,113 @@
+"""
+Версии таблиц для кэша фрагментов и ETag.
+
+Flush, изменивший строки ORM-модели, помечает её таблицу, а после
+коммита сессии version помеченных таблиц увеличивается отдельной
+короткой транзакцией. UPDATE строки версии внутри транзакции правки
+держал бы блокировку строки до коммита и выстраивал бы в очередь все
+пишущие транзакции одной таблицы. Читатель между коммитом и bump видит
+новые данные со старым токеном — такой кэш лишь свежее своего ключа.
+SQLite блокирует базу целиком, поэтому там bump идёт прямо в транзакции.
+Массовые Core-запросы (импорт) вызывают mark() сами.
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import TableVersion
+
+logger = logging.getLogger(__name__)
+
+_table = TableVersion.__table__
+
+PENDING_KEY = "table_versions_pending"
+
+
+def bump(conn, tables, now=None):
+    """version += 1 и updated_at = now для перечисленных таблиц"""
+    names = sorted(set(tables))
+    if not names:
+        return
+    conn.execute(
+        update(_table)
+        .where(_table.c.name.in_(names))
+        .values(version=_table.c.version + 1, updated_at=now or datetime.utcnow())
+    )
+
+
+def bump_committed(engine, tables):
+    """bump() в собственной транзакции — после коммита самой правки"""
+    if tables:
+        with engine.begin() as conn:
+            bump(conn, tables)
+
+
+def bump_or_defer(conn, tables):
+    """
+    На SQLite — bump() сразу в транзакции conn: база и так пускает одного
+    писателя, а отдельная транзакция после коммита снова ждала бы
+    блокировку файла. Иначе ничего не делает и возвращает True —
+    вызывающий делает bump_committed() после коммита.
+    """
+    if conn.dialect.name == "sqlite":
+        bump(conn, tables)
+        return False
+    return True
+
+
+def mark(session, tables):
+    """Версии таблиц увеличатся вместе с коммитом сессии (см. bump_or_defer)"""
+    if bump_or_defer(session.connection(), tables):
+        session.info.setdefault(PENDING_KEY, set()).update(tables)
+
+
+def seed_table_versions(conn, table_names):
+    """Заводит строки для таблиц, у которых их ещё нет"""
+    existing = set(conn.execute(select(_table.c.name)).scalars())
+    missing = sorted(set(table_names) - existing - {_table.name})
+    if missing:
+        now = datetime.utcnow()
+        conn.execute(insert(_table), [{"name": n, "version": 0, "updated_at": now} for n in missing])
+
+
+def current_versions(session, tables):
+    """{таблица: (version, updated_at)}; таблицы без строки не попадают в ответ"""
+    rows = session.execute(
+        select(_table.c.name, _table.c.version, _table.c.updated_at)
+        .where(_table.c.name.in_(sorted(set(tables))))
+    )
+    return {name: (version, updated_at) for name, version, updated_at in rows}
+
+
+def _after_flush(session, flush_context):
+    tables = {obj.__table__.name for obj in (*session.new, *session.deleted)}
+    tables.update(
+        obj.__table__.name
+        for obj in session.dirty
+        if session.is_modified(obj, include_collections=False)
+    )
+    tables.discard(_table.name)
+    if tables:
+        mark(session, tables)
+
+
+def _after_commit(session):
+    # после отката пометки остаются до следующего коммита: лишний bump
+    # лишь сбрасывает кэш, а пропущенный оставил бы его устаревшим
+    tables = session.info.pop(PENDING_KEY, None)
+    if not tables:
+        return
+    try:
+        bump_committed(session.get_bind(), tables)
+    except Exception:
+        # правка уже закоммичена, запрос не должен из-за этого падать
+        logger.exception("failed to bump table versions for %s", sorted(tables))
+
+
+def install_table_versions(app):
+    for name, fn in (("after_flush", _after_flush), ("after_commit", _after_commit)):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
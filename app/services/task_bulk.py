@@ -0,0 +1,217 @@
+"""
+Массовые операции над задачами Core-запросами UPDATE/DELETE.
+
+Строки не загружаются в сессию, поэтому хуки after_flush не срабатывают:
+поисковый индекс, журнал изменений и счётчики дашборда обновляются
+здесь явно, в той же транзакции, а версии таблиц помечаются для bump
+после коммита.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, delete, or_, select, update
+
+from app.extensions import db
+from app.models import TASK_PRIORITY_CHOICES, TASK_STATUS_CHOICES, Project, Task
+from app.services import audit, search, table_versions
+from app.services.dashboard_stats import invalidate_dashboard_counters
+
+MAX_BULK_IDS = 5000
+
+
+class BulkError(ValueError):
+    """Некорректный выбор задач или изменения"""
+
+
+def parse_ids(values):
+    """id из списка значений формы/JSON; допускаются строки через запятую"""
+    ids = []
+    for value in values:
+        for part in str(value).split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                ids.append(int(part))
+            except ValueError:
+                raise BulkError(f"Некорректный id задачи: {part}") from None
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BULK_IDS:
+        raise BulkError(f"Не больше {MAX_BULK_IDS} задач за раз")
+    return ids
+
+
+def selection(ids=None, status=None, priority=None, project_id=None):
+    """
+    Условие WHERE для набора задач: список id или фильтры списка задач.
+    Пустой выбор — ошибка, чтобы случайно не задеть все задачи.
+    """
+    conditions = []
+    if ids:
+        conditions.append(Task.id.in_(ids))
+    if status:
+        conditions.append(Task.status == status)
+    if priority:
+        conditions.append(Task.priority == priority)
+    if project_id:
+        conditions.append(Task.project_id == project_id)
+    if not conditions:
+        raise BulkError("Не выбрано ни одной задачи")
+    return and_(*conditions)
+
+
+def clean_changes(status=None, priority=None, project_id=None, end_date=None, clear_end_date=False):
+    """Проверяет изменения; возвращает dict колонка -> значение"""
+    changes = {}
+    if status:
+        if status not in TASK_STATUS_CHOICES:
+            raise BulkError(f"Неизвестный статус: {status}")
+        changes["status"] = status
+    if priority:
+        if priority not in TASK_PRIORITY_CHOICES:
+            raise BulkError(f"Неизвестный приоритет: {priority}")
+        changes["priority"] = priority
+    if project_id:
+        try:
+            project_id = int(project_id)
+        except (TypeError, ValueError):
+            raise BulkError("Некорректный проект") from None
+        if db.session.get(Project, project_id) is None:
+            raise BulkError(f"Проект {project_id} не найден")
+        changes["project_id"] = project_id
+    if clear_end_date:
+        changes["end_date"] = None
+    elif end_date:
+        try:
+            changes["end_date"] = datetime.fromisoformat(str(end_date))
+        except ValueError:
+            raise BulkError("Некорректная дата дедлайна") from None
+    if not changes:
+        raise BulkError("Не указано, что изменить")
+    return changes
+
+
+def _changed_rows(conn, stmt, where):
+    """
+    (id, project_id) затронутых строк: RETURNING, если диалект умеет,
+    иначе SELECT заранее. Для UPDATE project_id — уже новый.
+    """
+    supported = conn.dialect.delete_returning if stmt.is_delete else conn.dialect.update_returning
+    if supported:
+        return conn.execute(stmt.returning(Task.id, Task.project_id)).all()
+    rows = conn.execute(select(Task.id, Task.project_id).where(where)).all()
+    if rows:
+        conn.execute(stmt.where(Task.id.in_([r.id for r in rows])))
+    return rows
+
+
+def _audit(action, rows):
+    """rows: [(id задачи, id проекта, дифф полей)]"""
+    user_id = audit.acting_user_id(db.session)
+    audit.record(db.session, [
+        audit.make_event("tasks", task_id, action, changes, project_id=project_id, user_id=user_id)
+        for task_id, project_id, changes in rows
+    ])
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _update_returning_old(conn, matching, changes, values):
+    """
+    PostgreSQL: UPDATE ... FROM (SELECT ... FOR UPDATE) RETURNING — прежние
+    значения приходят из того же выражения. Строку, которую параллельная
+    транзакция изменила до блокировки, FOR UPDATE перечитывает и заново
+    проверяет условием.
+    """
+    old = (
+        select(Task.id, *(getattr(Task, name).label(f"old_{name}") for name in changes))
+        .where(matching)
+        .with_for_update()
+        .subquery("old")
+    )
+    rows = conn.execute(
+        update(Task)
+        .where(Task.id == old.c.id)
+        .values(**values)
+        .returning(Task.id, Task.project_id, *(old.c[f"old_{name}"] for name in changes))
+        .execution_options(synchronize_session=False)
+    ).all()
+    return [(row[0], row[1], row[2:]) for row in rows]
+
+
+def _update_locked(conn, matching, changes, values):
+    """
+    Остальные диалекты: RETURNING на SQLite не видит прежних значений.
+    Сначала берётся блокировка записи (на SQLite — BEGIN IMMEDIATE, SELECT
+    ... FOR UPDATE там ничего не блокирует), прежние значения читаются
+    SELECT, затем один UPDATE с тем же условием меняет ровно эти строки.
+    """
+    if conn.dialect.name == "sqlite" and not conn.connection.driver_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    rows = conn.execute(
+        select(Task.id, Task.project_id, *(getattr(Task, name) for name in changes))
+        .where(matching)
+        .with_for_update()
+    ).all()
+    if rows:
+        conn.execute(
+            update(Task).where(matching).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    return [(row[0], changes.get("project_id", row[1]), row[2:]) for row in rows]
+
+
+def bulk_update(where, changes):
+    """
+    Один UPDATE по условию. Строки, где все поля уже равны новым значениям,
+    не трогаются и не получают новый updated_at. Возвращает число
+    изменённых задач.
+    """
+    differs = or_(*(getattr(Task, name).is_distinct_from(value) for name, value in changes.items()))
+    matching = and_(where, differs)
+    values = dict(changes, updated_at=datetime.utcnow())
+    conn = db.session.connection()
+    if conn.dialect.name == "postgresql":
+        rows = _update_returning_old(conn, matching, changes, values)
+    else:
+        rows = _update_locked(conn, matching, changes, values)
+    ids = [task_id for task_id, _, _ in rows]
+    if ids:
+        # в документе задачи есть project_id
+        if "project_id" in changes:
+            search.reindex(conn, "task", ids)
+        table_versions.mark(db.session, ["tasks"])
+        _audit("bulk_update", [
+            (
+                task_id,
+                project_id,
+                {
+                    name: [_json_value(before), _json_value(value)]
+                    for (name, value), before in zip(changes.items(), old)
+                    if before != value
+                },
+            )
+            for task_id, project_id, old in rows
+        ])
+    db.session.commit()
+    if ids:
+        invalidate_dashboard_counters()
+    return len(ids)
+
+
+def bulk_delete(where):
+    """Один DELETE по условию; возвращает число удалённых задач"""
+    stmt = delete(Task).where(where).execution_options(synchronize_session=False)
+    conn = db.session.connection()
+    rows = _changed_rows(conn, stmt, where)
+    ids = [r.id for r in rows]
+    if ids:
+        search.remove(conn, "task", ids)
+        table_versions.mark(db.session, ["tasks"])
+        _audit("delete", [(task_id, project_id, {}) for task_id, project_id in rows])
+    db.session.commit()
+    if ids:
+        invalidate_dashboard_counters()
+    return len(ids)
@@ -0,0 +1,166 @@
+"""
+Таймлайн задач: пересечения, загрузка по неделям, просроченные задачи.
+
+Всё считается за O(n log n) по отсортированным границам интервалов
+(sweep line + бинарный поиск) вместо попарного сравнения задач.
+Даты в ответе — целые дни от origin, колонки — параллельные списки:
+так JSON для 50 тыс. задач остаётся компактным.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select
+
+from app.models import Project, Task
+
+LATE_LIMIT = 100
+DUE_SOON_DAYS = 3
+
+
+def fetch_intervals(session, project_id=None, date_from=None, date_to=None):
+    """
+    Кортежи (id, title, status, priority, project_id, start, end) задач
+    с дедлайном. Без даты начала задача считается однодневной.
+    Окно [date_from, date_to] отбирает пересекающиеся с ним задачи.
+    """
+    stmt = select(
+        Task.id, Task.title, Task.status, Task.priority, Task.project_id,
+        Task.start_date, Task.end_date,
+    ).where(Task.end_date.is_not(None))
+    if project_id is not None:
+        stmt = stmt.where(Task.project_id == project_id)
+    else:
+        stmt = stmt.join(Project, Project.id == Task.project_id).where(Project.status != "closed")
+    if date_from is not None:
+        stmt = stmt.where(Task.end_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(
+            or_(Task.start_date <= date_to, and_(Task.start_date.is_(None), Task.end_date <= date_to))
+        )
+
+    rows = []
+    for task_id, title, status, priority, pid, start, end in session.execute(stmt):
+        if start is None or start > end:
+            start = end
+        rows.append((task_id, title, status, priority, pid, start.date(), end.date()))
+    rows.sort(key=lambda r: (r[5], r[6], r[0]))
+    return rows
+
+
+def overlap_counts(starts, ends):
+    """
+    Для каждого интервала [s, e] (включительно) — сколько других
+    интервалов с ним пересекаются: начавшиеся не позже e минус
+    закончившиеся раньше s, минус сам интервал.
+    """
+    sorted_starts = sorted(starts)
+    sorted_ends = sorted(ends)
+    return [
+        bisect_right(sorted_starts, e) - bisect_left(sorted_ends, s) - 1
+        for s, e in zip(starts, ends)
+    ]
+
+
+def overlap_clusters(starts, ends):
+    """
+    Номера групп пересекающихся по цепочке задач и пиковая одновременность.
+    Интервалы должны быть отсортированы по началу.
+    """
+    clusters = []
+    cluster = -1
+    reach = None
+    for s, e in zip(starts, ends):
+        if reach is None or s > reach:
+            cluster += 1
+            reach = e
+        else:
+            reach = max(reach, e)
+        clusters.append(cluster)
+
+    # пиковая одновременность: события начала (+1) раньше событий конца (-1) того же дня
+    events = sorted([(s, 0) for s in starts] + [(e, 1) for e in ends])
+    active = peak = 0
+    peak_day = None
+    for day, kind in events:
+        if kind == 0:
+            active += 1
+            if active > peak:
+                peak, peak_day = active, day
+        else:
+            active -= 1
+    return clusters, peak, peak_day
+
+
+def weekly_load(starts, ends, origin):
+    """
+    Число задач, активных хотя бы день недели, по неделям с понедельника
+    origin. Разностный массив: +1 в неделю начала, -1 после недели конца.
+    """
+    if not starts:
+        return []
+    first = [(s - origin).days // 7 for s in starts]
+    last = [(e - origin).days // 7 for e in ends]
+    diff = [0] * (max(last) + 2)
+    for a, b in zip(first, last):
+        diff[a] += 1
+        diff[b + 1] -= 1
+    load, active = [], 0
+    for delta in diff[:-1]:
+        active += delta
+        load.append(active)
+    return load
+
+
+def build_timeline(session, project_id=None, date_from=None, date_to=None, today=None):
+    today = today or datetime.utcnow().date()
+    rows = fetch_intervals(session, project_id, date_from, date_to)
+
+    ids = [r[0] for r in rows]
+    starts = [r[5] for r in rows]
+    ends = [r[6] for r in rows]
+    origin = min(starts) if starts else today
+    origin -= timedelta(days=origin.weekday())
+
+    overlaps = overlap_counts(starts, ends)
+    clusters, peak, peak_day = overlap_clusters(starts, ends)
+    load = weekly_load(starts, ends, origin)
+
+    # просроченные и горящие незакрытые задачи: сначала сильнее опоздавшие, затем high
+    priority_rank = {"high": 0, "medium": 1, "low": 2}
+    soon = today + timedelta(days=DUE_SOON_DAYS)
+    late = sorted(
+        (i for i, r in enumerate(rows) if r[2] != "done" and r[6] <= soon),
+        key=lambda i: (ends[i], priority_rank.get(rows[i][3], 3), ids[i]),
+    )[:LATE_LIMIT]
+
+    return {
+        "origin": origin.isoformat(),
+        "today": (today - origin).days,
+        "tasks": {
+            "id": ids,
+            "title": [r[1] for r in rows],
+            "status": [r[2] for r in rows],
+            "priority": [r[3] for r in rows],
+            "project_id": [r[4] for r in rows],
+            "start": [(s - origin).days for s in starts],
+            "end": [(e - origin).days for e in ends],
+            "overlaps": overlaps,
+            "cluster": clusters,
+        },
+        "weeks": {
+            "start": [i * 7 for i in range(len(load))],
+            "active": load,
+        },
+        "late": {
+            "index": late,
+            "days_late": [(today - ends[i]).days for i in late],
+        },
+        "summary": {
+            "tasks": len(rows),
+            "clusters": clusters[-1] + 1 if clusters else 0,
+            "peak_concurrency": peak,
+            "peak_day": (peak_day - origin).days if peak_day else None,
+            "late": sum(1 for r in rows if r[2] != "done" and r[6] < today),
+        },
+    }
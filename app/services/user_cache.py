@@ -0,0 +1,79 @@
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import User
+from app.utils.cache import TTLCache
+
+_IDENTITY_COLUMNS = (
+    User.id,
+    User.telegram_id,
+    User.username,
+    User.first_name,
+    User.last_name,
+    User.role,
+)
+
+_cache = None
+
+
+class UserIdentity(UserMixin):
+    """
+    Лёгкий снимок пользователя для current_user.
+
+    Не привязан к сессии SQLAlchemy, поэтому его можно держать в кэше
+    между запросами; если нужна ORM-модель — User.query.get(current_user.id).
+    """
+
+    def __init__(self, id, telegram_id, username, first_name, last_name, role):
+        self.id = id
+        self.telegram_id = telegram_id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+
+    def get_id(self):
+        return str(self.id)
+
+    def __repr__(self):
+        return f"<UserIdentity id={self.id} username={self.username!r} role={self.role!r}>"
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(
+            maxsize=current_app.config["USER_CACHE_SIZE"],
+            ttl=current_app.config["USER_CACHE_TTL"],
+        )
+    return _cache
+
+
+def load_user_identity(user_id):
+    """
+    user_loader для Flask-Login: в пределах запроса Flask-Login сам хранит
+    current_user, между запросами снимок берётся из LRU/TTL-кэша воркера.
+    """
+    cache = _get_cache()
+    identity = cache.get(user_id)
+    if identity is not None:
+        return identity
+
+    # снимок живёт в кэше USER_CACHE_TTL, поэтому читается с основной БД,
+    # а не с реплики: иначе после смены роли кэш заполнился бы старой
+    row = db.session.execute(
+        select(*_IDENTITY_COLUMNS).where(User.id == user_id),
+        bind_arguments={"bind": db.engine},
+    ).first()
+    if row is None:
+        return None
+    identity = UserIdentity(*row)
+    cache.set(user_id, identity)
+    return identity
+
+
+def invalidate_user(user_id):
+    """Сбрасывает снимок после изменения пользователя (например, роли)"""
+    _get_cache().invalidate(user_id)
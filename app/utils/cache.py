@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Потокобезопасный LRU-кэш с временем жизни записей.
+
+    Живёт в памяти процесса: у каждого gunicorn-воркера своя копия,
+    поэтому TTL ограничивает, насколько устаревшими могут быть данные
+    в соседних воркерах после инвалидации в текущем.
+    """
+
+    def __init__(self, maxsize=128, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Удаляет одну запись или, без аргумента, весь кэш"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
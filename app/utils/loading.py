@@ -0,0 +1,43 @@
+from flask import before_render_template, g, has_app_context, template_rendered
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class LazyLoadInTemplateError(RuntimeError):
+    """Шаблон обратился к незагруженной связи (N+1)"""
+
+
+def install_lazy_load_guard(app):
+    """
+    Отладочный режим RAISE_ON_TEMPLATE_LAZY_LOAD: любая ленивая загрузка
+    связи во время рендеринга шаблона бросает LazyLoadInTemplateError.
+
+    Всё, что нужно шаблону, view обязан загрузить заранее через
+    joinedload/selectinload, тогда число запросов на страницу фиксировано.
+    """
+    if not app.config.get("RAISE_ON_TEMPLATE_LAZY_LOAD"):
+        return
+
+    def _enter(sender, template, context, **extra):
+        g._template_depth = g.get("_template_depth", 0) + 1
+
+    def _leave(sender, template, context, **extra):
+        g._template_depth = g.get("_template_depth", 1) - 1
+
+    before_render_template.connect(_enter, app, weak=False)
+    template_rendered.connect(_leave, app, weak=False)
+
+    if not event.contains(Session, "do_orm_execute", _check_lazy_load):
+        event.listen(Session, "do_orm_execute", _check_lazy_load)
+
+
+def _check_lazy_load(orm_execute_state):
+    if orm_execute_state.lazy_loaded_from is None:
+        return
+    if not has_app_context() or not g.get("_template_depth"):
+        return
+    state = orm_execute_state.lazy_loaded_from
+    raise LazyLoadInTemplateError(
+        f"lazy load from {state.class_.__name__} id={state.identity} "
+        f"during template rendering; add an eager loader option in the view"
+    )
@@ -0,0 +1,299 @@
+"""
+Инструментация запросов: SQL, шаблоны, общее время.
+
+На каждый HTTP-запрос считаются число SQL-запросов, суммарное время в БД,
+время рендеринга шаблонов и самые медленные выражения. Результат уходит
+в заголовок Server-Timing, в лог одной JSON-строкой и в гистограммы,
+которые отдаёт /metrics в текстовом формате Prometheus.
+
+Гистограммы живут в памяти процесса: при нескольких воркерах gunicorn
+каждый отдаёт свои значения, суммирует их Prometheus.
+"""
+
+import heapq
+import json
+import logging
+import threading
+import time
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SLOWEST_STATEMENTS = 3
+STATEMENT_LOG_LIMIT = 500
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонный счётчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Гистограмма Prometheus: накопительные бакеты, сумма и количество"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, labels, le), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), count
+
+
+class MetricsRegistry:
+    """Набор метрик одного приложения"""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "crm_request_duration_seconds", "HTTP request duration",
+            ("endpoint", "method", "status"),
+        )
+        self.request_db_time = Histogram(
+            "crm_request_db_seconds", "Time spent in SQL per HTTP request", ("endpoint",),
+        )
+        self.request_render_time = Histogram(
+            "crm_request_render_seconds", "Template rendering time per HTTP request", ("endpoint",),
+        )
+        self.request_queries = Histogram(
+            "crm_request_queries", "SQL statements per HTTP request", ("endpoint",),
+            buckets=QUERY_COUNT_BUCKETS,
+        )
+        self.slow_queries = Counter(
+            "crm_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS", ("endpoint",),
+        )
+        self.metrics = (
+            self.request_duration,
+            self.request_db_time,
+            self.request_render_time,
+            self.request_queries,
+            self.slow_queries,
+        )
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    """Счётчики одного HTTP-запроса, лежат в g"""
+
+    __slots__ = ("started", "queries", "db_time", "render_time", "render_depth",
+                 "render_started", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+        self.render_started = 0.0
+        # куча (длительность, SQL) из SLOWEST_STATEMENTS самых медленных:
+        # импорт из тысяч выражений не копит их все до конца запроса
+        self.statements = []
+
+    def add_statement(self, elapsed, statement):
+        item = (elapsed, statement)
+        if len(self.statements) < SLOWEST_STATEMENTS:
+            heapq.heappush(self.statements, item)
+        elif elapsed > self.statements[0][0]:
+            heapq.heapreplace(self.statements, item)
+
+    def slowest(self):
+        return sorted(self.statements, key=lambda item: item[0], reverse=True)
+
+
+def _current_stats():
+    if not has_request_context():
+        return None
+    return g.get("_request_stats")
+
+
+def _endpoint():
+    return request.url_rule.endpoint if request.url_rule is not None else "<unmatched>"
+
+
+def instrument_engine(app, engine):
+    """
+    Счётчики SQL для движка; вызывается и для дополнительных движков
+    (реплик), чтобы их запросы попадали в статистику того же запроса.
+    """
+    registry = app.extensions.get("metrics")
+    if registry is None:
+        return
+    slow_threshold = app.config["SLOW_QUERY_MS"] / 1000.0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["_query_started"].pop()
+        stats = _current_stats()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+            stats.add_statement(elapsed, statement)
+        if slow_threshold and elapsed >= slow_threshold:
+            endpoint = _endpoint() if has_request_context() else "<none>"
+            registry.slow_queries.inc((endpoint,))
+            logger.warning(
+                "slow query %.1fms endpoint=%s: %s",
+                elapsed * 1000, endpoint, statement[:STATEMENT_LOG_LIMIT],
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("_query_started"):
+            conn.info["_query_started"].pop()
+
+
+def install_instrumentation(app, engine):
+    """
+    Подключает счётчики к событиям движка SQLAlchemy и хукам Flask.
+
+    Медленные запросы (SLOW_QUERY_MS) пишутся в лог и вне HTTP-запроса,
+    например в CLI-командах.
+    """
+    if not app.config.get("METRICS_ENABLED"):
+        return None
+
+    registry = MetricsRegistry()
+    app.extensions["metrics"] = registry
+    server_timing = app.config["SERVER_TIMING"]
+    request_log = app.config["REQUEST_LOG"]
+    instrument_engine(app, engine)
+
+    def _render_enter(sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None:
+            if stats.render_depth == 0:
+                stats.render_started = time.perf_counter()
+            stats.render_depth += 1
+
+    def _render_leave(sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None and stats.render_depth:
+            stats.render_depth -= 1
+            if stats.render_depth == 0:
+                stats.render_time += time.perf_counter() - stats.render_started
+
+    before_render_template.connect(_render_enter, app, weak=False)
+    template_rendered.connect(_render_leave, app, weak=False)
+
+    @app.before_request
+    def _start_request_stats():
+        g._request_stats = RequestStats()
+
+    @app.after_request
+    def _finish_request_stats(response):
+        stats = g.pop("_request_stats", None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.started
+        endpoint = _endpoint()
+
+        registry.request_duration.observe((endpoint, request.method, str(response.status_code)), total)
+        registry.request_db_time.observe((endpoint,), stats.db_time)
+        registry.request_render_time.observe((endpoint,), stats.render_time)
+        registry.request_queries.observe((endpoint,), stats.queries)
+
+        if server_timing:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                f"tpl;dur={stats.render_time * 1000:.1f}, "
+                f"total;dur={total * 1000:.1f}",
+            )
+        if request_log:
+            logger.info(json.dumps({
+                "event": "request",
+                "method": request.method,
+                "path": request.path,
+                "endpoint": endpoint,
+                "status": response.status_code,
+                "duration_ms": round(total * 1000, 2),
+                "db_ms": round(stats.db_time * 1000, 2),
+                "render_ms": round(stats.render_time * 1000, 2),
+                "queries": stats.queries,
+                "slowest": [
+                    {"ms": round(elapsed * 1000, 2), "sql": statement[:STATEMENT_LOG_LIMIT]}
+                    for elapsed, statement in stats.slowest()
+                ],
+            }, ensure_ascii=False))
+        return response
+
+    return registry
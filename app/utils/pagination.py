@@ -0,0 +1,176 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from flask import abort, current_app, request, url_for
+from sqlalchemy import tuple_
+
+PAGE_SIZES = (20, 50, 100, 200)
+
+
+class Page:
+    """Страница keyset-пагинации: элементы и курсоры соседних страниц"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.next_url = None
+        self.prev_url = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; ValueError, если он повреждён"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return [_decode_value(v) for v in values]
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if len(value) != 1 or not isinstance(next(iter(value.values())), str):
+            raise ValueError("invalid cursor")
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise ValueError("invalid cursor")
+    if value is not None and not isinstance(value, (str, int, float)):
+        raise ValueError("invalid cursor")
+    return value
+
+
+def _check_types(values, columns):
+    """
+    Значения курсора должны подходить по типу к колонкам сортировки:
+    иначе сравнение падает в драйвере БД (500), а не даёт 400.
+    """
+    for value, column in zip(values, columns):
+        try:
+            expected = column.type.python_type
+        except NotImplementedError:
+            continue
+        if expected is float:
+            expected = (int, float)
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError("invalid cursor")
+
+
+def keyset_paginate(query, columns, per_page, after=None, before=None, descending=False):
+    """
+    Keyset-пагинация по кортежу колонок (последней должен быть уникальный id).
+
+    Вместо OFFSET строится условие (col1, ..., id) > (значения из курсора),
+    поэтому глубокие страницы стоят столько же, сколько первая,
+    если под сортировку есть индекс.
+    """
+    key = tuple_(*columns)
+    backwards = before is not None
+    cursor = before if backwards else after
+
+    # при движении назад сортировка и сравнение разворачиваются
+    reverse = descending != backwards
+    if cursor is not None:
+        values = tuple_(*cursor)
+        query = query.filter(key < values if reverse else key > values)
+    query = query.order_by(*[c.desc() if reverse else c.asc() for c in columns])
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor([getattr(row, c.key) for c in columns])
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor is not None
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = cursor_of(rows[-1])
+        if has_prev:
+            prev_cursor = cursor_of(rows[0])
+    return Page(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def get_per_page():
+    """Размер страницы из ?per_page=, только из разрешённых значений"""
+    per_page = request.args.get("per_page", type=int)
+    if per_page in PAGE_SIZES:
+        return per_page
+    return current_app.config["LIST_PAGE_SIZE"]
+
+
+def paginate_request(query, columns, descending=False):
+    """
+    Применяет keyset-пагинацию к query по аргументам запроса
+    (?after=, ?before=, ?per_page=) и проставляет ссылки на соседние страницы.
+    """
+    try:
+        after = decode_cursor(request.args["after"]) if request.args.get("after") else None
+        before = decode_cursor(request.args["before"]) if request.args.get("before") else None
+        for cursor in (after, before):
+            if cursor is not None:
+                if len(cursor) != len(columns):
+                    raise ValueError("invalid cursor")
+                _check_types(cursor, columns)
+    except ValueError:
+        abort(400)
+
+    page = keyset_paginate(
+        query,
+        columns,
+        get_per_page(),
+        after=after,
+        before=before,
+        descending=descending,
+    )
+
+    args = request.args.to_dict()
+    args.pop("after", None)
+    args.pop("before", None)
+    args.update(request.view_args or {})
+    if page.has_next:
+        page.next_url = url_for(request.endpoint, after=page.next_cursor, **args)
+    if page.has_prev:
+        page.prev_url = url_for(request.endpoint, before=page.prev_cursor, **args)
+    return page
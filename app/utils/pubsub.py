@@ -0,0 +1,96 @@
+"""
+Лёгкий pub/sub внутри процесса для Server-Sent Events.
+
+Подписчик — ограниченная очередь; publish() никогда не блокирует
+пишущий запрос: если клиент не успевает читать, его очередь помечается
+переполненной, и поток SSE закрывается, а браузер переподключается
+с Last-Event-ID и дочитывает пропущенное из БД.
+
+Брокер видит только свой процесс: события из других воркеров
+поток SSE подбирает опросом БД по таймауту (см. views/projects.comment_stream).
+
+Открытый поток SSE занимает поток воркера (в gthread и sync), поэтому
+их число на процесс ограничено max_streams; сверх лимита страница
+опрашивает comments.json.
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class Subscription:
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Следующее сообщение или None по таймауту"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    def __init__(self, queue_size=100, max_streams=None):
+        self.queue_size = queue_size
+        self.max_streams = max_streams
+        self._topics = {}  # topic -> set(Subscription)
+        self._streams = 0
+        self._lock = threading.Lock()
+
+    def acquire_stream(self):
+        """Занимает место под поток SSE; False — лимит процесса исчерпан"""
+        with self._lock:
+            if self.max_streams is not None and self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self):
+        with self._lock:
+            self._streams -= 1
+
+    def streams(self):
+        with self._lock:
+            return self._streams
+
+    @contextmanager
+    def subscribe(self, topic):
+        sub = Subscription(self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(sub)
+        try:
+            yield sub
+        finally:
+            with self._lock:
+                subs = self._topics.get(topic)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._topics[topic]
+
+    def publish(self, topic, message):
+        """Рассылает сообщение подписчикам темы; возвращает их число"""
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+        for sub in subs:
+            sub.put(message)
+        return len(subs)
+
+    def subscribers(self, topic):
+        with self._lock:
+            return len(self._topics.get(topic, ()))
+
+
+def init_pubsub(app):
+    app.extensions["pubsub"] = Broker(
+        app.config["PUBSUB_QUEUE_SIZE"], max_streams=app.config["SSE_MAX_STREAMS"]
+    )
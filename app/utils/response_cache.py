@@ -0,0 +1,224 @@
+"""
+Кэш отрендеренных фрагментов и условные GET.
+
+Ключ фрагмента: имя, роль пользователя, версии таблиц, от которых он
+зависит (app/services/table_versions.py), и параметры запроса. Коммит
+в таблицу меняет версию, и старые записи просто перестают находиться;
+вытесняет их LRU или TTL бэкенда.
+
+conditional_get() отдаёт ETag и Last-Modified по тем же версиям и
+отвечает 304 до вызова view — без запросов к данным и без шаблонов.
+"""
+
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+from app.extensions import db
+from app.services.table_versions import current_versions
+from app.utils.cache import TTLCache
+
+
+class MemoryBackend:
+    """LRU в памяти процесса"""
+
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+
+class DiskBackend:
+    """
+    Файлы в каталоге, общем для всех воркеров и переживающем рестарт.
+    Запись атомарная (временный файл + rename), лишние файлы удаляются
+    по времени изменения раз в PRUNE_EVERY записей.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self, directory, maxsize, ttl):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + ".html")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".html"):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        continue
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.maxsize]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def _templates_digest(app):
+    """Отпечаток шаблонов: после деплоя старые фрагменты и ETag недействительны"""
+    digest = hashlib.sha256()
+    root = os.path.join(app.root_path, app.template_folder)
+    for dirpath, _, filenames in sorted(os.walk(root)):
+        for filename in sorted(filenames):
+            stat = os.stat(os.path.join(dirpath, filename))
+            digest.update(f"{dirpath}/{filename}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+    return digest.hexdigest()[:12]
+
+
+def init_response_cache(app):
+    kind = app.config["RESPONSE_CACHE"]
+    size, ttl = app.config["RESPONSE_CACHE_SIZE"], app.config["RESPONSE_CACHE_TTL"]
+    if kind == "memory":
+        backend = MemoryBackend(size, ttl)
+    elif kind == "disk":
+        backend = DiskBackend(app.config["RESPONSE_CACHE_DIR"], size, ttl)
+    elif kind == "none":
+        backend = None
+    else:
+        raise ValueError(f"unknown RESPONSE_CACHE {kind!r}, expected memory, disk or none")
+    app.extensions["response_cache"] = backend
+    app.extensions["response_cache_salt"] = _templates_digest(app)
+
+
+def _role():
+    return current_user.role if current_user.is_authenticated else "anonymous"
+
+
+def table_state(tables):
+    """
+    (токен версий, Last-Modified) для набора таблиц. Версии читаются
+    одним SELECT и запоминаются в g до конца запроса.
+    """
+    known = g.setdefault("_table_versions", {})
+    missing = [t for t in tables if t not in known]
+    if missing:
+        found = current_versions(db.session, missing)
+        for name in missing:
+            known[name] = found.get(name, (0, None))
+
+    token = ",".join(f"{t}:{known[t][0]}" for t in sorted(tables))
+    stamps = [known[t][1] for t in tables if known[t][1] is not None]
+    return token, max(stamps) if stamps else None
+
+
+def cached_fragment(name, tables, render, vary=""):
+    """
+    Отрендеренный фрагмент из кэша или render() с сохранением.
+    vary — то, от чего ещё зависит фрагмент (обычно строка запроса).
+    """
+    backend = current_app.extensions.get("response_cache")
+    if backend is None:
+        return Markup(render())
+
+    token, _ = table_state(tables)
+    key = "|".join((
+        name, _role(), token, str(vary), current_app.extensions["response_cache_salt"],
+    ))
+    html = backend.get(key)
+    if html is None:
+        html = str(render())
+        backend.set(key, html)
+    return Markup(html)
+
+
+def conditional_get(*tables):
+    """
+    Декоратор view: ETag/Last-Modified по версиям таблиц и 304 на
+    совпадающий условный GET. ETag учитывает пользователя (имя в шапке)
+    и адрес со строкой запроса. Пока в сессии ждут flash-сообщения,
+    304 не отдаётся, чтобы страница их показала.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+
+            token, last_modified = table_state(tables)
+            user_id = current_user.get_id() if current_user.is_authenticated else "-"
+            etag = hashlib.sha1("|".join((
+                request.full_path, user_id, _role(), token,
+                current_app.extensions["response_cache_salt"],
+            )).encode()).hexdigest()[:20]
+
+            if "_flashes" not in session:
+                not_modified = False
+                if request.if_none_match:
+                    not_modified = request.if_none_match.contains_weak(etag)
+                elif request.if_modified_since and last_modified is not None:
+                    not_modified = last_modified.replace(microsecond=0) <= (
+                        request.if_modified_since.replace(tzinfo=None)
+                    )
+                if not_modified:
+                    response = current_app.response_class(status=304)
+                    _set_validators(response, etag, last_modified)
+                    return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # браузер хранит копию, но перепроверяет её на каждом заходе;
+    # общие прокси страницу не кэшируют
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
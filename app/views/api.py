@@ -0,0 +1,131 @@
+import json
+from datetime import date, datetime
+
+from flask import Blueprint, abort, current_app, request, url_for
+from flask_login import login_required
+from werkzeug.exceptions import HTTPException
+
+from app.services.api import (
+    PUBLIC_RESOURCES,
+    RESOURCES,
+    ApiError,
+    attach_includes,
+    fetch_by_ids,
+    include_columns,
+    parse_ids,
+    parse_includes,
+    rows_to_dicts,
+)
+from app.utils.pagination import paginate_request
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json(payload, status=200):
+    body = json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":"))
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+@bp.errorhandler(ApiError)
+def _api_error(exc):
+    return _json({"error": str(exc)}, status=400)
+
+
+@bp.errorhandler(HTTPException)
+def _http_error(exc):
+    return _json({"error": exc.name.lower()}, status=exc.code)
+
+
+def _resource(name):
+    if name not in PUBLIC_RESOURCES:
+        abort(404)
+    return RESOURCES[name]
+
+
+def _more_url(resource_name, filter_name, value):
+    return url_for("api.list_objects", resource_name=resource_name, **{filter_name: value})
+
+
+def _requested_fields():
+    """fields[<ресурс>]=a,b — поля для основного ресурса и для include"""
+    return {
+        name: request.args.get(f"fields[{name}]")
+        for name in RESOURCES
+        if request.args.get(f"fields[{name}]")
+    }
+
+
+@bp.route("/")
+@login_required
+def index():
+    return _json({
+        "resources": {
+            name: {
+                "url": url_for("api.list_objects", resource_name=name),
+                "fields": list(RESOURCES[name].columns),
+                "sorts": list(RESOURCES[name].sorts),
+                "filters": list(RESOURCES[name].filters),
+                "include": list(RESOURCES[name].relations),
+            }
+            for name in PUBLIC_RESOURCES
+        }
+    })
+
+
+@bp.route("/<resource_name>")
+@login_required
+def list_objects(resource_name):
+    """
+    Список с keyset-пагинацией (?after=, ?before=, ?per_page=, ?sort=)
+    и фильтрами по полям, либо пакетное чтение ?ids=1,2,3.
+    """
+    resource = _resource(resource_name)
+    fields_by_resource = _requested_fields()
+    fields = resource.parse_fields(
+        request.args.get("fields") or fields_by_resource.get(resource.name)
+    )
+    includes = parse_includes(resource, request.args.get("include"))
+    extra = include_columns(resource, includes)
+
+    if request.args.get("ids"):
+        rows, missing = fetch_by_ids(resource, fields, parse_ids(request.args["ids"]), extra=extra)
+        payload = {"data": None, "missing": missing}
+    else:
+        sort = request.args.get("sort", resource.default_sort)
+        if sort not in resource.sorts:
+            raise ApiError(f"unknown sort for {resource.name}: {sort}")
+        columns, descending = resource.sorts[sort]
+        query, _ = resource.select(fields, extra=(*columns, *extra))
+        query = resource.apply_filters(query, request.args)
+        page = paginate_request(query, columns, descending=descending)
+        rows = page.items
+        payload = {"data": None, "links": {"next": page.next_url, "prev": page.prev_url}}
+
+    items = rows_to_dicts(fields, rows)
+    attach_includes(resource, items, rows, includes, fields_by_resource, more_url=_more_url)
+    payload["data"] = items
+    return _json(payload)
+
+
+@bp.route("/<resource_name>/<int:object_id>")
+@login_required
+def get_object(resource_name, object_id):
+    resource = _resource(resource_name)
+    fields_by_resource = _requested_fields()
+    fields = resource.parse_fields(
+        request.args.get("fields") or fields_by_resource.get(resource.name)
+    )
+    includes = parse_includes(resource, request.args.get("include"))
+
+    rows, _ = fetch_by_ids(resource, fields, [object_id], extra=include_columns(resource, includes))
+    if not rows:
+        abort(404)
+    items = rows_to_dicts(fields, rows)
+    attach_includes(resource, items, rows, includes, fields_by_resource, more_url=_more_url)
+    return _json({"data": items[0]})
@@ -0,0 +1,75 @@
+import json
+
+from flask import Blueprint, abort, jsonify, render_template, request
+from flask_login import current_user, login_required
+
+from app.extensions import db
+from app.models import AuditEvent, Project
+from app.services.audit import flush_writer
+from app.utils.pagination import paginate_request
+
+bp = Blueprint("audit", __name__, url_prefix="/audit")
+
+
+def _feed(condition):
+    """Лента событий по условию, новые сверху; ?table= сужает до одной таблицы"""
+    # при async-записи события последних секунд могут быть ещё в очереди
+    if request.args.get("wait") == "1":
+        flush_writer()
+    query = AuditEvent.query.filter(condition)
+    table = request.args.get("table", "").strip()
+    if table:
+        query = query.filter(AuditEvent.table_name == table)
+    return paginate_request(query, (AuditEvent.id,), descending=True)
+
+
+def _event_dict(e):
+    return {
+        "id": e.id,
+        "occurred_at": e.occurred_at.isoformat(),
+        "table": e.table_name,
+        "object_id": e.object_id,
+        "project_id": e.project_id,
+        "user_id": e.user_id,
+        "action": e.action,
+        "changes": json.loads(e.changes),
+    }
+
+
+def _feed_json(page):
+    return jsonify({
+        "data": [_event_dict(e) for e in page.items],
+        "links": {"next": page.next_url, "prev": page.prev_url},
+    })
+
+
+@bp.route("/projects/<int:project_id>.json")
+@login_required
+def project_feed_json(project_id):
+    if db.session.get(Project, project_id) is None:
+        abort(404)
+    return _feed_json(_feed(AuditEvent.project_id == project_id))
+
+
+@bp.route("/projects/<int:project_id>")
+@login_required
+def project_feed(project_id):
+    project = db.session.get(Project, project_id)
+    if project is None:
+        abort(404)
+    page = _feed(AuditEvent.project_id == project_id)
+    return render_template(
+        "audit_feed.html",
+        project=project,
+        events=[_event_dict(e) for e in page.items],
+        page=page,
+    )
+
+
+@bp.route("/users/<int:user_id>.json")
+@login_required
+def user_feed_json(user_id):
+    # свою историю видит каждый, чужую — администратор
+    if current_user.role != "admin" and int(current_user.get_id()) != user_id:
+        abort(403)
+    return _feed_json(_feed(AuditEvent.user_id == user_id))
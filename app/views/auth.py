@@ -14,6 +14,8 @@ from flask_login import login_user, logout_user, login_required
 
 from app.extensions import db
 from app.models import User
+from app.replicas import primary_only
+from app.services.user_cache import invalidate_user
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -26,6 +28,7 @@ def login():
 
 
 @bp.route("/telegram-callback", methods=["GET"])
+@primary_only
 def telegram_callback():
     """Telegram Login Widget callback"""
     bot_token = current_app.config.get("TELEGRAM_BOT_TOKEN")
@@ -80,12 +83,14 @@ def logout():
 
 
 @bp.route("/setup-admin/<int:telegram_id>")
+@primary_only
 def setup_admin(telegram_id):
     """Служебный роут для назначения админа"""
     user = User.query.filter_by(telegram_id=telegram_id).first()
     if user:
         user.role = "admin"
         db.session.commit()
+        invalidate_user(user.id)
         return f"User {telegram_id} is now admin"
     return f"User {telegram_id} not found", 404
 
@@ -0,0 +1,29 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required
+from sqlalchemy.orm import raiseload
+
+from app.extensions import db
+from app.models import Project, ProjectCostRollup
+from app.services.costs import portfolio_summary, project_cost_lines
+
+bp = Blueprint("costs", __name__, url_prefix="/costs")
+
+
+@bp.route("/summary.json")
+@login_required
+def summary():
+    return jsonify(portfolio_summary(db.session, top=10))
+
+
+@bp.route("/projects/<int:project_id>.json")
+@login_required
+def project_cost(project_id):
+    project = Project.query.options(raiseload("*")).get_or_404(project_id)
+    rollup = db.session.get(ProjectCostRollup, project.id)
+    return jsonify(
+        {
+            "project_id": project.id,
+            "material_cost": rollup.material_cost if rollup else 0.0,
+            "lines": project_cost_lines(db.session, project.id),
+        }
+    )
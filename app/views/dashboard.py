@@ -1,41 +1,53 @@
 from flask import Blueprint, render_template
 from flask_login import login_required
+from sqlalchemy import select
 
-from app.models import Project, Task  # Attachment добавим, когда включишь файлы
+from app.extensions import db
+from app.models import Project  # Attachment добавим, когда включишь файлы
+from app.services.costs import portfolio_summary
+from app.services.dashboard_stats import get_dashboard_counters
+from app.services.project_summary import SUMMARY_TABLES, get_summaries
+from app.utils.response_cache import cached_fragment, conditional_get
 
 bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
 
+# таблицы, от которых зависят фрагменты дашборда
+TILE_TABLES = SUMMARY_TABLES
+COST_TABLES = ("projects", "materials", "project_materials")
+
+
 @bp.route("/")
 @login_required
+@conditional_get(*TILE_TABLES, *COST_TABLES)
 def dashboard():
-    counters = {
-        "total_projects": Project.query.count(),
-        "active_projects": Project.query.filter_by(status="active").count(),
-        "closed_projects": Project.query.filter_by(status="closed").count(),
-        "total_tasks": Task.query.count(),
-        "tasks_to_do": Task.query.filter_by(status="to_do").count(),
-        "tasks_in_progress": Task.query.filter_by(status="in_progress").count(),
-        "tasks_done": Task.query.filter_by(status="done").count(),
-        # материалы убираем, раз они сейчас отрублены
-        "high_priority": Task.query.filter_by(priority="high").count(),
-        "medium_priority": Task.query.filter_by(priority="medium").count(),
-        "low_priority": Task.query.filter_by(priority="low").count(),
-    }
-
-    # последние активные проекты для плиток
-    projects = (
-        Project.query
-        .filter(Project.status != "closed")
-        .order_by(Project.created_at.desc())
-        .limit(8)
-        .all()
-    )
+    counters = get_dashboard_counters()
+
+    def render_tiles():
+        # последние активные проекты для плиток; счётчики задач, стоимость
+        # и последний комментарий — пакетом сводок (app/services/project_summary.py)
+        rows = db.session.execute(
+            select(Project.id, Project.description)
+            .where(Project.status != "closed")
+            .order_by(Project.created_at.desc())
+            .limit(8)
+        ).all()
+        summaries = get_summaries([pid for pid, _ in rows])
+        tiles = [
+            dict(summaries[pid], description=description)
+            for pid, description in rows
+            if pid in summaries
+        ]
+        return render_template("components/project_tiles.html", projects=tiles)
+
+    def render_costs():
+        return render_template("components/cost_widget.html", costs=portfolio_summary(db.session))
 
     # TODO: когда вернёшь Attachment и исполнителей, можно сюда добавить агрегаты
 
     return render_template(
         "dashboard.html",
         counters=counters,
-        projects=projects,
+        project_tiles=cached_fragment("project_tiles", TILE_TABLES, render_tiles),
+        cost_widget=cached_fragment("cost_widget", COST_TABLES, render_costs),
     )
@@ -0,0 +1,23 @@
+from flask import Blueprint, current_app, jsonify
+from flask_login import login_required
+
+from app.engine_profiles import describe_engine
+from app.extensions import db
+from app.utils.security import roles_required
+
+bp = Blueprint("diagnostics", __name__, url_prefix="/diagnostics")
+
+
+@bp.route("/db")
+@login_required
+@roles_required("admin")
+def database():
+    info = describe_engine(
+        db.engine,
+        current_app.config["DB_PROFILE"],
+        current_app.config["DB_ENGINE_PROFILE"],
+    )
+    replicas = current_app.extensions.get("replicas")
+    if replicas is not None:
+        info["replicas"] = replicas.status()
+    return jsonify(info)
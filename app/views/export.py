@@ -0,0 +1,54 @@
+from flask import Blueprint, Response, current_app, request, send_file, stream_with_context
+from flask_login import login_required
+from sqlalchemy.orm import raiseload
+
+from app.models import Project
+from app.services.export import (
+    build_xlsx,
+    material_bill_export,
+    projects_export,
+    stream_csv,
+    tasks_export,
+)
+
+bp = Blueprint("export", __name__, url_prefix="/export")
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _export_response(headers, stmt, filename, fmt):
+    batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+    if fmt == "csv":
+        return Response(
+            stream_with_context(stream_csv(headers, stmt, batch_size)),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'},
+        )
+    return send_file(
+        build_xlsx(headers, stmt, batch_size, title=filename),
+        mimetype=XLSX_MIMETYPE,
+        as_attachment=True,
+        download_name=f"{filename}.xlsx",
+    )
+
+
+@bp.route("/projects.<any(csv, xlsx):fmt>")
+@login_required
+def export_projects(fmt):
+    headers, stmt = projects_export()
+    return _export_response(headers, stmt, "projects", fmt)
+
+
+@bp.route("/tasks.<any(csv, xlsx):fmt>")
+@login_required
+def export_tasks(fmt):
+    headers, stmt = tasks_export(project_id=request.args.get("project_id", type=int))
+    return _export_response(headers, stmt, "tasks", fmt)
+
+
+@bp.route("/projects/<int:project_id>/materials.<any(csv, xlsx):fmt>")
+@login_required
+def export_material_bill(project_id, fmt):
+    project = Project.query.options(raiseload("*")).get_or_404(project_id)
+    headers, stmt = material_bill_export(project.id)
+    return _export_response(headers, stmt, f"project_{project.id}_materials", fmt)
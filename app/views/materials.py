@@ -1,18 +1,48 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_required
+import math
+
+from flask import Blueprint, abort, current_app, jsonify, render_template, request, redirect, url_for, flash
+from flask_login import current_user, login_required
+from sqlalchemy import select
+from sqlalchemy.orm import raiseload
 
 from app.extensions import db
-from app.models import Material
+from app.models import STOCK_MOVEMENT_KINDS, Material, Project, StockMovement
+from app.services import importer, inventory, table_versions
+from app.utils.pagination import get_per_page, paginate_request
+from app.utils.response_cache import cached_fragment, conditional_get
 from app.utils.security import roles_required
 
 bp = Blueprint("materials", __name__, url_prefix="/materials")
 
+# варианты сортировки списка: ключ keyset-пагинации и направление
+MATERIAL_SORTS = {
+    "name": ((Material.name, Material.id), False),
+    "created": ((Material.created_at, Material.id), True),
+}
+
 
 @bp.route("/")
 @login_required
+@conditional_get("materials")
 def list_materials():
-    materials = Material.query.order_by(Material.name.asc()).all()
-    return render_template("materials_list.html", materials=materials)
+    sort = request.args.get("sort", "name")
+    if sort not in MATERIAL_SORTS:
+        sort = "name"
+
+    def render_table():
+        columns, descending = MATERIAL_SORTS[sort]
+        query = Material.query.options(raiseload("*"))
+        page = paginate_request(query, columns, descending=descending)
+        return render_template("components/materials_table.html", materials=page.items, page=page)
+
+    return render_template(
+        "materials_list.html",
+        table=cached_fragment(
+            "materials_table", ("materials",), render_table, vary=request.query_string
+        ),
+        per_page=get_per_page(),
+        sort=sort,
+    )
 
 
 @bp.route("/new", methods=["GET", "POST"])
@@ -39,6 +69,8 @@ def create_material():
         try:
             price = float(price_per_unit)
         except ValueError:
+            price = math.nan
+        if not math.isfinite(price):
             flash("Некорректное значение цены", "danger")
             return redirect(url_for("materials.create_material"))
 
@@ -54,10 +86,23 @@ def create_material():
             name=name,
             unit=unit,
             price_per_unit=price,
-            stock_quantity=qty,
+            stock_quantity=0.0,
             description=description or None,
         )
         db.session.add(material)
+        db.session.flush()
+        # начальный остаток — приход в журнале склада, в той же транзакции
+        if qty:
+            try:
+                inventory.apply(
+                    db.session.connection(), "receipt", material.id, qty,
+                    user_id=current_user.id, note="Начальный остаток",
+                )
+                table_versions.mark(db.session, inventory.MOVEMENT_TABLES)
+            except inventory.StockError as exc:
+                db.session.rollback()
+                flash(str(exc), "danger")
+                return redirect(url_for("materials.create_material"))
         db.session.commit()
 
         flash("Материал создан", "success")
@@ -76,7 +121,6 @@ def edit_material(material_id):
         name = request.form.get("name", "").strip()
         unit = request.form.get("unit", "").strip()
         price_per_unit = request.form.get("price_per_unit", "").strip()
-        stock_quantity = request.form.get("stock_quantity", "").strip()
         description = request.form.get("description", "").strip()
 
         if not name:
@@ -89,30 +133,118 @@ def edit_material(material_id):
         try:
             price = float(price_per_unit)
         except ValueError:
+            price = math.nan
+        if not math.isfinite(price):
             flash("Некорректное значение цены", "danger")
             return redirect(url_for("materials.edit_material", material_id=material.id))
 
-        qty = 0.0
-        if stock_quantity:
-            try:
-                qty = float(stock_quantity)
-            except ValueError:
-                flash("Некорректное значение количества на складе", "danger")
-                return redirect(url_for("materials.edit_material", material_id=material.id))
-
+        # остаток формой не правится: значение из формы устаревает, пока
+        # она открыта, и затёрло бы параллельные приходы и резервы.
+        # Остаток меняется только движениями на странице склада
         material.name = name
         material.unit = unit
         material.price_per_unit = price
-        material.stock_quantity = qty
         material.description = description or None
-
         db.session.commit()
+
         flash("Материал обновлён", "success")
         return redirect(url_for("materials.list_materials"))
 
     return render_template("material_form.html", material=material)
 
 
+def _movement_dict(m):
+    return {
+        "id": m.id,
+        "kind": m.kind,
+        "quantity": m.quantity,
+        "project_id": m.project_id,
+        "on_hand_after": m.on_hand_after,
+        "reserved_after": m.reserved_after,
+        "user_id": m.user_id,
+        "note": m.note,
+        "created_at": m.created_at.isoformat(),
+    }
+
+
+def _movements_page(material_id):
+    query = StockMovement.query.filter(StockMovement.material_id == material_id)
+    project_id = request.args.get("project_id", type=int)
+    if project_id:
+        query = query.filter(StockMovement.project_id == project_id)
+    return paginate_request(query, (StockMovement.id,), descending=True)
+
+
+@bp.route("/<int:material_id>/stock", methods=["GET", "POST"])
+@login_required
+def stock(material_id):
+    """Остатки, резервы проектов и журнал движений материала"""
+    material = db.session.get(Material, material_id)
+    if material is None:
+        abort(404)
+
+    if request.method == "POST":
+        if current_user.role not in ("admin", "manager"):
+            abort(403)
+        kind = request.form.get("kind", "")
+        project_id = request.form.get("project_id", type=int)
+        note = request.form.get("note", "").strip()[:255] or None
+        try:
+            quantity = float(request.form.get("quantity", "").strip())
+        except ValueError:
+            flash("Некорректное количество", "danger")
+            return redirect(url_for("materials.stock", material_id=material_id))
+        try:
+            inventory.run_movement(
+                db.engine, kind, material_id, quantity,
+                project_id=project_id, user_id=current_user.id, note=note,
+            )
+        except inventory.StockError as exc:
+            flash(str(exc), "danger")
+        else:
+            flash("Движение проведено", "success")
+        return redirect(url_for("materials.stock", material_id=material_id))
+
+    conn = db.session.connection()
+    demand = inventory.project_demand(conn, material_id)
+    project_names = dict(db.session.execute(
+        select(Project.id, Project.name).where(Project.id.in_([row[0] for row in demand]))
+    ).all())
+    projects = db.session.execute(
+        select(Project.id, Project.name).where(Project.status != "closed").order_by(Project.name)
+    ).all()
+    return render_template(
+        "material_stock.html",
+        material=material,
+        stock=inventory.stock_of(conn, material_id),
+        demand=demand,
+        project_names=project_names,
+        projects=projects,
+        kinds=STOCK_MOVEMENT_KINDS,
+        page=_movements_page(material_id),
+    )
+
+
+@bp.route("/<int:material_id>/stock.json")
+@login_required
+def stock_json(material_id):
+    conn = db.session.connection()
+    snapshot = inventory.stock_of(conn, material_id)
+    if snapshot is None:
+        abort(404)
+    page = _movements_page(material_id)
+    return jsonify({
+        "material_id": material_id,
+        "stock": snapshot,
+        "reservations": [
+            {"project_id": project_id, "quantity": quantity}
+            for project_id, quantity in inventory.reservations_of(conn, material_id)
+        ],
+        "movements": [_movement_dict(m) for m in page.items],
+        "next": page.next_url,
+    })
+
+
 @bp.route("/<int:material_id>/delete", methods=["POST"])
 @login_required
 @roles_required("admin", "manager")
@@ -122,3 +254,35 @@ def delete_material(material_id):
     db.session.commit()
     flash("Материал удалён", "success")
     return redirect(url_for("materials.list_materials"))
+
+
+@bp.route("/import", methods=["GET", "POST"])
+@login_required
+@roles_required("admin", "manager")
+def import_materials():
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Выберите файл", "danger")
+            return redirect(url_for("materials.import_materials"))
+
+        fmt = request.form.get("format") or upload.filename.rsplit(".", 1)[-1].lower()
+        if fmt not in importer.IMPORT_FORMATS:
+            flash("Поддерживаются файлы CSV и JSONL", "danger")
+            return redirect(url_for("materials.import_materials"))
+
+        report = importer.import_materials(
+            importer.read_rows(upload.stream, fmt),
+            chunk_size=current_app.config["IMPORT_CHUNK_SIZE"],
+            user_id=current_user.id,
+        )
+        flash(f"Импорт завершён: {report.summary()}", "warning" if report.errors else "success")
+
+    return render_template(
+        "import_form.html",
+        title="Импорт материалов",
+        fields=("name", "unit", "price_per_unit", "stock_quantity", "description"),
+        back_url=url_for("materials.list_materials"),
+        report=report,
+    )
@@ -0,0 +1,29 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+from flask_login import current_user
+
+bp = Blueprint("metrics", __name__)
+
+
+@bp.route("/metrics")
+def metrics():
+    """
+    Метрики процесса для Prometheus: с METRICS_TOKEN — по Bearer-токену,
+    без него — только администратору (в метках видны все маршруты)
+    """
+    registry = current_app.extensions.get("metrics")
+    if registry is None:
+        abort(404)
+
+    token = current_app.config["METRICS_TOKEN"]
+    if token:
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied, f"Bearer {token}"):
+            abort(401)
+    elif not current_user.is_authenticated:
+        abort(401)
+    elif current_user.role != "admin":
+        abort(403)
+
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
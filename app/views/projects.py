@@ -1,19 +1,62 @@
-from datetime import datetime
+import json
+import time
+from datetime import datetime, timedelta
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_required
+from flask import (
+    Blueprint, Response, abort, current_app, flash, jsonify, redirect, render_template, request, url_for,
+)
+from flask_login import current_user, login_required
+from sqlalchemy.orm import raiseload
 
 from app.extensions import db
-from app.models import Project, Comment
+from app.models import PROJECT_STATUS_CHOICES, Project, Comment
+from app.services import comments, inventory
+from app.services.project_summary import SUMMARY_TABLES, get_summary, summary_json
+from app.services.dashboard_stats import invalidate_dashboard_counters
+from app.utils.pagination import get_per_page, paginate_request
+from app.utils.response_cache import cached_fragment, conditional_get
 
 bp = Blueprint("projects", __name__, url_prefix="/projects")
 
+# варианты сортировки списка: ключ keyset-пагинации и направление
+PROJECT_SORTS = {
+    "created": ((Project.created_at, Project.id), True),
+    "name": ((Project.name, Project.id), False),
+}
+
 
 @bp.route("/")
 @login_required
+@conditional_get("projects")
 def list_projects():
-    projects = Project.query.order_by(Project.created_at.desc()).all()
-    return render_template("projects_list.html", projects=projects)
+    sort = request.args.get("sort", "created")
+    if sort not in PROJECT_SORTS:
+        sort = "created"
+    status = request.args.get("status", "").strip()
+    client = request.args.get("client", "").strip()
+
+    def render_table():
+        # шаблон списка не обращается к связям
+        query = Project.query.options(raiseload("*"))
+        if status:
+            query = query.filter(Project.status == status)
+        if client:
+            query = query.filter(Project.client.startswith(client, autoescape=True))
+
+        columns, descending = PROJECT_SORTS[sort]
+        page = paginate_request(query, columns, descending=descending)
+        return render_template("components/projects_table.html", projects=page.items, page=page)
+
+    return render_template(
+        "projects_list.html",
+        table=cached_fragment(
+            "projects_table", ("projects",), render_table, vary=request.query_string
+        ),
+        per_page=get_per_page(),
+        sort=sort,
+        filters={"status": status, "client": client},
+        statuses=PROJECT_STATUS_CHOICES,
+    )
 
 
 @bp.route("/new", methods=["GET", "POST"])
@@ -46,6 +89,7 @@ def create_project():
         )
         db.session.add(project)
         db.session.commit()
+        invalidate_dashboard_counters()
 
         flash("Проект создан", "success")
         return redirect(url_for("projects.list_projects"))
@@ -56,8 +100,134 @@ def create_project():
 @bp.route("/<int:project_id>")
 @login_required
 def view_project(project_id):
-    project = Project.query.get_or_404(project_id)
-    return render_template("project_detail.html", project=project)
+    project = Project.query.options(raiseload("*")).get_or_404(project_id)
+    page = paginate_request(
+        comments.thread_query(project.id), comments.THREAD_COLUMNS, descending=True
+    )
+    return render_template(
+        "project_detail.html",
+        project=project,
+        summary=get_summary(project.id),
+        comments=[comments.comment_dict(row) for row in page.items],
+        page=page,
+    )
+
+
+@bp.route("/<int:project_id>/summary.json")
+@login_required
+@conditional_get(*SUMMARY_TABLES)
+def summary(project_id):
+    """Сводка проекта: задачи, стоимость материалов, последний комментарий"""
+    data = get_summary(project_id)
+    if data is None:
+        abort(404)
+    return jsonify({"data": summary_json(data)})
+
+
+@bp.route("/<int:project_id>/comments.json")
+@login_required
+def comments_json(project_id):
+    """Страница ленты комментариев; links.next — более старые"""
+    if db.session.get(Project, project_id) is None:
+        abort(404)
+    page = paginate_request(
+        comments.thread_query(project_id), comments.THREAD_COLUMNS, descending=True
+    )
+    return jsonify({
+        "data": [comments.comment_dict(row) for row in page.items],
+        "links": {"next": page.next_url, "prev": page.prev_url},
+    })
+
+
+def _sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+
+@bp.route("/<int:project_id>/comments/stream")
+@login_required
+def comment_stream(project_id):
+    """
+    Новые комментарии проекта через Server-Sent Events.
+
+    Событие pub/sub процесса или таймаут keepalive будит поток, и он
+    дочитывает из БД комментарии новее последнего отправленного — так
+    доходят и комментарии, записанные другими воркерами. Комментарии
+    последних SSE_REREAD_SECONDS перечитываются: id выдаётся до коммита,
+    и меньший id может стать видимым позже. Комментарий из транзакции
+    дольше этого окна может не дойти до открытого потока (он виден после
+    перезагрузки страницы). Поток живёт не дольше SSE_MAX_SECONDS,
+    браузер переподключается с Last-Event-ID. Если в процессе уже
+    открыто SSE_MAX_STREAMS потоков, ответ — 204: EventSource не
+    переподключается, и страница переходит на опрос comments.json.
+    """
+    if db.session.get(Project, project_id) is None:
+        abort(404)
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("last_id", type=int)
+    engine = db.engine
+    if last_id is None:
+        with engine.connect() as conn:
+            last_id = comments.latest_id(conn, project_id)
+    # соединение сессии не держится всё время жизни потока
+    db.session.close()
+
+    broker = current_app.extensions["pubsub"]
+    keepalive = current_app.config["SSE_KEEPALIVE"]
+    max_seconds = current_app.config["SSE_MAX_SECONDS"]
+    retry_ms = current_app.config["SSE_RETRY_MS"]
+    reread = current_app.config["SSE_REREAD_SECONDS"]
+
+    # id -> время отправки; отправленное из окна перечитывания не дублируется
+    recent = {}
+
+    def unsent(after):
+        since = datetime.utcnow() - timedelta(seconds=reread)
+        with engine.connect() as conn:
+            rows = comments.newer_than(conn, project_id, after, since=since)
+        return [comments.comment_dict(r) for r in rows if r.id not in recent]
+
+    def events():
+        sent = last_id
+        deadline = time.monotonic() + max_seconds
+        # подписка раньше догрузки: между ними ничего не теряется
+        with broker.subscribe(comments.topic(project_id)) as sub:
+            yield f"retry: {retry_ms}\n\n"
+            items = unsent(sent)
+            while True:
+                now = time.monotonic()
+                for item in items:
+                    recent[item["id"]] = now
+                    sent = max(sent, item["id"])
+                    # Last-Event-ID — курсор, а не id опоздавшего комментария
+                    yield _sse("comment", item, event_id=sent)
+                for comment_id, at in list(recent.items()):
+                    if at < now - reread:
+                        del recent[comment_id]
+                if time.monotonic() >= deadline or sub.overflowed:
+                    return
+                # сообщение pub/sub — только сигнал проснуться: отправляется
+                # то, что видно в БД после sent и в окне перечитывания
+                woken = sub.get(keepalive) is not None
+                items = unsent(sent)
+                if not items and not woken:
+                    yield ": keepalive\n\n"
+
+    if not broker.acquire_stream():
+        return Response(status=204)
+    response = Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # место освобождается и при обрыве соединения клиентом
+    response.call_on_close(broker.release_stream)
+    return response
 
 
 @bp.route("/<int:project_id>/edit", methods=["GET", "POST"])
@@ -90,6 +260,7 @@ def edit_project(project_id):
         project.description = description or None
 
         db.session.commit()
+        invalidate_dashboard_counters()
         flash("Проект обновлён", "success")
         return redirect(url_for("projects.view_project", project_id=project.id))
 
@@ -100,8 +271,12 @@ def edit_project(project_id):
 @login_required
 def delete_project(project_id):
     project = Project.query.get_or_404(project_id)
-    db.session.delete(project)
-    db.session.commit()
+    # резервы удаляемого проекта возвращаются в доступный остаток
+    with inventory.locked_session(db.session) as conn:
+        inventory.release_project(conn, project.id, user_id=current_user.id, note="Проект удалён")
+        db.session.delete(project)
+        db.session.commit()
+    invalidate_dashboard_counters()
     flash("Проект удалён", "success")
     return redirect(url_for("projects.list_projects"))
 
@@ -109,13 +284,19 @@ def delete_project(project_id):
 @bp.route("/<int:project_id>/comment", methods=["POST"])
 @login_required
 def add_comment(project_id):
-    from flask_login import current_user
-    
-    project = Project.query.get_or_404(project_id)
+    project = Project.query.options(raiseload("*")).get_or_404(project_id)
     text = request.form.get("text", "").strip()
+    wants_json = request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json"
 
+    error = None
     if not text:
-        flash("Текст комментария не может быть пустым", "danger")
+        error = "Текст комментария не может быть пустым"
+    elif len(text) > comments.MAX_COMMENT_LENGTH:
+        error = f"Комментарий длиннее {comments.MAX_COMMENT_LENGTH} символов"
+    if error:
+        if wants_json:
+            return jsonify({"error": error}), 400
+        flash(error, "danger")
         return redirect(url_for("projects.view_project", project_id=project.id))
 
     comment = Comment(
@@ -126,5 +307,12 @@ def add_comment(project_id):
     db.session.add(comment)
     db.session.commit()
 
+    item = comments.comment_dict(
+        comments.thread_query(project.id).filter(Comment.id == comment.id).one()
+    )
+    current_app.extensions["pubsub"].publish(comments.topic(project.id), item)
+
+    if wants_json:
+        return jsonify({"data": item}), 201
     flash("Комментарий добавлен", "success")
     return redirect(url_for("projects.view_project", project_id=project.id))
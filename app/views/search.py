@@ -0,0 +1,33 @@
+from flask import Blueprint, current_app, render_template, request
+from flask_login import login_required
+
+from app.extensions import db
+from app.services import search as search_service
+
+bp = Blueprint("search", __name__, url_prefix="/search")
+
+
+@bp.route("/")
+@login_required
+def search():
+    q = request.args.get("q", "").strip()
+    kind = request.args.get("kind", "")
+    if kind not in search_service.KINDS:
+        kind = ""
+
+    results = []
+    if q:
+        results = search_service.search(
+            db.session.connection(),
+            q,
+            kind=kind or None,
+            limit=current_app.config["SEARCH_RESULTS_LIMIT"],
+        )
+
+    return render_template(
+        "search.html",
+        q=q,
+        kind=kind,
+        kinds=search_service.KINDS,
+        results=results,
+    )
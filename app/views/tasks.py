@@ -1,19 +1,68 @@
 from datetime import datetime
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, current_app, jsonify, render_template, request, redirect, url_for, flash
 from flask_login import login_required
+from sqlalchemy.orm import joinedload, raiseload
 
 from app.extensions import db
-from app.models import Task, Project
+from app.models import TASK_PRIORITY_CHOICES, TASK_STATUS_CHOICES, Task, Project
+from app.services import importer, task_bulk
+from app.services.dashboard_stats import invalidate_dashboard_counters
+from app.utils.pagination import paginate_request
+from app.utils.security import roles_required
 
 bp = Blueprint("tasks", __name__, url_prefix="/tasks")
 
+# варианты сортировки списка: ключ keyset-пагинации и направление
+TASK_SORTS = {
+    "created": ((Task.created_at, Task.id), True),
+    "title": ((Task.title, Task.id), False),
+}
+
+# список задач: имя проекта тем же JOIN, остальные связи не грузятся
+TASK_LIST_LOADING = (
+    joinedload(Task.project).load_only(Project.name),
+    raiseload("*"),
+)
+
 
 @bp.route("/")
 @login_required
 def list_tasks():
-    tasks = Task.query.order_by(Task.created_at.desc()).all()
-    return render_template("tasks_list.html", tasks=tasks)
+    sort = request.args.get("sort", "created")
+    if sort not in TASK_SORTS:
+        sort = "created"
+    status = request.args.get("status", "").strip()
+    priority = request.args.get("priority", "").strip()
+    project_id = request.args.get("project_id", type=int)
+
+    query = Task.query.options(*TASK_LIST_LOADING)
+    if status:
+        query = query.filter(Task.status == status)
+    if priority:
+        query = query.filter(Task.priority == priority)
+    if project_id:
+        query = query.filter(Task.project_id == project_id)
+
+    columns, descending = TASK_SORTS[sort]
+    page = paginate_request(query, columns, descending=descending)
+    projects = (
+        Project.query
+        .with_entities(Project.id, Project.name)
+        .filter_by(status="active")
+        .order_by(Project.name.asc())
+        .all()
+    )
+    return render_template(
+        "tasks_list.html",
+        tasks=page.items,
+        page=page,
+        sort=sort,
+        filters={"status": status, "priority": priority, "project_id": project_id},
+        statuses=TASK_STATUS_CHOICES,
+        priorities=TASK_PRIORITY_CHOICES,
+        projects=projects,
+    )
 
 
 @bp.route("/new", methods=["GET", "POST"])
@@ -52,6 +101,7 @@ def create_task():
         )
         db.session.add(task)
         db.session.commit()
+        invalidate_dashboard_counters()
 
         flash("Задача создана", "success")
         return redirect(url_for("tasks.list_tasks"))
@@ -90,6 +140,7 @@ def edit_task(task_id):
         task.end_date = deadline
 
         db.session.commit()
+        invalidate_dashboard_counters()
         flash("Задача обновлена", "success")
         return redirect(url_for("tasks.list_tasks"))
 
@@ -103,5 +154,113 @@ def delete_task(task_id):
     task = Task.query.get_or_404(task_id)
     db.session.delete(task)
     db.session.commit()
+    invalidate_dashboard_counters()
     flash("Задача удалена", "success")
     return redirect(url_for("tasks.list_tasks"))
+
+
+def _bulk_params():
+    """
+    Параметры массовой операции из формы списка задач или из JSON:
+    {"ids": [...]} либо {"filter": {"status": ..., "priority": ..., "project_id": ...}},
+    плюс изменяемые поля на верхнем уровне.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        return data, data.get("ids") or [], data.get("filter") or {}
+
+    form = request.form
+    if form.get("scope") == "filter":
+        filters = {name: form.get(f"filter_{name}") for name in ("status", "priority", "project_id")}
+        return form, [], filters
+    return form, form.getlist("ids"), {}
+
+
+def _bulk_selection(ids, filters):
+    project_id = filters.get("project_id") or None
+    if project_id is not None:
+        try:
+            project_id = int(project_id)
+        except (TypeError, ValueError):
+            raise task_bulk.BulkError("Некорректный проект в фильтре") from None
+    return task_bulk.selection(
+        ids=task_bulk.parse_ids(ids if isinstance(ids, list) else [ids]),
+        status=filters.get("status") or None,
+        priority=filters.get("priority") or None,
+        project_id=project_id,
+    )
+
+
+def _bulk_response(message, count=None, error=False):
+    if request.is_json:
+        if error:
+            return jsonify({"error": message}), 400
+        return jsonify({"affected": count})
+    flash(message, "danger" if error else "success")
+    return redirect(url_for("tasks.list_tasks"))
+
+
+@bp.route("/bulk/update", methods=["POST"])
+@login_required
+def bulk_update_tasks():
+    """Статус/приоритет/проект/дедлайн для выбранных задач одним UPDATE"""
+    params, ids, filters = _bulk_params()
+    try:
+        where = _bulk_selection(ids, filters)
+        changes = task_bulk.clean_changes(
+            status=params.get("status"),
+            priority=params.get("priority"),
+            project_id=params.get("project_id"),
+            end_date=params.get("end_date"),
+            clear_end_date=bool(params.get("clear_end_date")),
+        )
+    except task_bulk.BulkError as exc:
+        return _bulk_response(str(exc), error=True)
+
+    updated = task_bulk.bulk_update(where, changes)
+    return _bulk_response(f"Обновлено задач: {updated}", updated)
+
+
+@bp.route("/bulk/delete", methods=["POST"])
+@login_required
+@roles_required("admin", "manager")
+def bulk_delete_tasks():
+    """Удаление выбранных задач одним DELETE, без загрузки строк"""
+    _, ids, filters = _bulk_params()
+    try:
+        where = _bulk_selection(ids, filters)
+    except task_bulk.BulkError as exc:
+        return _bulk_response(str(exc), error=True)
+
+    deleted = task_bulk.bulk_delete(where)
+    return _bulk_response(f"Удалено задач: {deleted}", deleted)
+
+
+@bp.route("/import", methods=["GET", "POST"])
+@login_required
+def import_tasks():
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Выберите файл", "danger")
+            return redirect(url_for("tasks.import_tasks"))
+
+        fmt = request.form.get("format") or upload.filename.rsplit(".", 1)[-1].lower()
+        if fmt not in importer.IMPORT_FORMATS:
+            flash("Поддерживаются файлы CSV и JSONL", "danger")
+            return redirect(url_for("tasks.import_tasks"))
+
+        report = importer.import_tasks(
+            importer.read_rows(upload.stream, fmt),
+            chunk_size=current_app.config["IMPORT_CHUNK_SIZE"],
+        )
+        flash(f"Импорт завершён: {report.summary()}", "warning" if report.errors else "success")
+
+    return render_template(
+        "import_form.html",
+        title="Импорт задач",
+        fields=("title", "project_id", "status", "priority", "deadline", "description"),
+        back_url=url_for("tasks.list_tasks"),
+        report=report,
+    )
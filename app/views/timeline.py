@@ -0,0 +1,56 @@
+from datetime import datetime
+
+from flask import Blueprint, abort, jsonify, render_template, request
+from flask_login import login_required
+
+from app.extensions import db
+from app.models import Project
+from app.services.timeline import build_timeline
+
+bp = Blueprint("timeline", __name__, url_prefix="/timeline")
+
+
+def _date_arg(name):
+    raw = request.args.get(name, "").strip()
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        abort(400)
+
+
+@bp.route("/")
+@login_required
+def timeline():
+    projects = (
+        Project.query
+        .with_entities(Project.id, Project.name)
+        .filter(Project.status != "closed")
+        .order_by(Project.name.asc())
+        .all()
+    )
+    return render_template(
+        "timeline.html",
+        projects=projects,
+        project_id=request.args.get("project_id", type=int),
+        date_from=request.args.get("from", ""),
+        date_to=request.args.get("to", ""),
+    )
+
+
+@bp.route("/data.json")
+@login_required
+def timeline_data():
+    """Колоночный JSON таймлайна: проект (?project_id=) или весь портфель"""
+    project_id = request.args.get("project_id", type=int)
+    if project_id is not None and db.session.get(Project, project_id) is None:
+        abort(404)
+    return jsonify(
+        build_timeline(
+            db.session,
+            project_id=project_id,
+            date_from=_date_arg("from"),
+            date_to=_date_arg("to"),
+        )
+    )
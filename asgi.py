@@ -0,0 +1,22 @@
+"""
+ASGI-точка входа для uvicorn/hypercorn:
+
+    uvicorn asgi:app --workers 4 --timeout-keep-alive 5
+
+Flask остаётся WSGI-приложением: a2wsgi выполняет его в пуле из
+WEB_THREADS потоков, а сервер держит соединения в event loop, поэтому
+медленные клиенты и keep-alive не занимают потоки приложения. Для
+gunicorn с gevent используйте wsgi.py и GUNICORN_WORKER_CLASS=gevent.
+"""
+
+import os
+
+from a2wsgi import WSGIMiddleware
+
+threads = int(os.environ.get("WEB_THREADS", 16))
+# поток SSE занимает поток пула: не больше четверти пула на живые комментарии
+os.environ.setdefault("SSE_MAX_STREAMS", str(threads // 4))
+
+from wsgi import app as wsgi_app  # noqa: E402
+
+app = WSGIMiddleware(wsgi_app, workers=threads)
@@ -0,0 +1,212 @@
+"""
+Нагрузочный тест Telegram-бота против локального фейкового Bot API.
+
+Фейковый сервер отдаёт через getUpdates N команд от зарегистрированного
+пользователя и считает ответы sendMessage. Бот работает с отдельной
+SQLite-БД, заполненной синтетическими данными.
+
+    python bench/bot_throughput.py --updates 2000 --tasks 20000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TOKEN = "123456:BENCH"
+TELEGRAM_ID = 424242
+COMMANDS = ("/tasks", "/due 7", "/project 1", "/status 1 in_progress")
+
+
+class FakeTelegram:
+    """Минимальный Bot API: getMe, deleteWebhook, getUpdates, sendMessage"""
+
+    def __init__(self, total_updates):
+        self.total = total_updates
+        self.next_update = 0
+        self.sent_at = {}
+        self.replied_at = {}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def get_updates(self, offset, limit=100):
+        with self.lock:
+            start = max(self.next_update, offset or 0)
+            end = min(start + limit, self.total)
+            self.next_update = end
+            now = time.perf_counter()
+            batch = []
+            for i in range(start, end):
+                self.sent_at[i] = now
+                text = COMMANDS[i % len(COMMANDS)]
+                batch.append({
+                    "update_id": i,
+                    "message": {
+                        "message_id": i,
+                        "date": int(time.time()),
+                        # отдельный чат на обновление, чтобы сопоставить ответ
+                        "chat": {"id": 10_000_000 + i, "type": "private"},
+                        "from": {"id": TELEGRAM_ID, "is_bot": False, "first_name": "Bench"},
+                        "text": text,
+                        "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+                    },
+                })
+            return batch
+
+    def reply(self, chat_id):
+        with self.lock:
+            self.replied_at[chat_id - 10_000_000] = time.perf_counter()
+            if len(self.replied_at) >= self.total:
+                self.done.set()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # незавершённый long-poll при остановке бота — не ошибка теста
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _params(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length).decode() if length else ""
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                return json.loads(body or "{}")
+            from urllib.parse import parse_qs
+            return {k: v[0] for k, v in parse_qs(body).items()}
+
+        def do_POST(self):
+            method = self.path.rsplit("/", 1)[-1]
+            params = self._params()
+            if method == "getMe":
+                result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+            elif method == "getUpdates":
+                result = fake.get_updates(int(params.get("offset") or 0), int(params.get("limit") or 100))
+                if not result:
+                    time.sleep(0.05)
+            elif method == "sendMessage":
+                chat_id = int(params["chat_id"])
+                fake.reply(chat_id)
+                result = {
+                    "message_id": 1,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": params.get("text", ""),
+                }
+            else:
+                result = True
+            payload = json.dumps({"ok": True, "result": result}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def seed(app, projects, tasks_per_project):
+    from app.extensions import db
+    from app.models import Project, Task, User
+
+    with app.app_context():
+        db.session.add(User(telegram_id=TELEGRAM_ID, username="bench", role="manager"))
+        now = datetime.utcnow()
+        for p in range(projects):
+            project = Project(name=f"Проект {p}", client=f"Клиент {p % 50}")
+            db.session.add(project)
+            db.session.flush()
+            db.session.add_all(
+                Task(
+                    title=f"Задача {p}-{t}",
+                    project_id=project.id,
+                    status=("to_do", "in_progress", "done")[t % 3],
+                    end_date=now + timedelta(days=(t % 30) - 10),
+                )
+                for t in range(tasks_per_project)
+            )
+        db.session.commit()
+
+
+async def drive(app, fake, base_url, timeout):
+    import bot
+
+    application = bot.build_application(app, TOKEN, base_url=base_url)
+    started = time.perf_counter()
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0.0, timeout=0)
+        await asyncio.get_running_loop().run_in_executor(None, fake.done.wait, timeout)
+        elapsed = time.perf_counter() - started
+        await application.updater.stop()
+        await application.stop()
+    application.bot_data["crm"].close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--tasks-per-project", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="crm-bot-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("SEARCH_ENABLED", "0")
+
+    import logging
+    from app import create_app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    app = create_app()
+    seed(app, args.projects, args.tasks_per_project)
+
+    fake = FakeTelegram(args.updates)
+    server = _Server(("127.0.0.1", 0), make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/bot"
+
+    elapsed = asyncio.run(drive(app, fake, base_url, args.timeout))
+    server.shutdown()
+
+    latencies = sorted(
+        (fake.replied_at[i] - fake.sent_at[i]) * 1000
+        for i in fake.replied_at if i in fake.sent_at
+    )
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(json.dumps({
+        "updates": args.updates,
+        "replied": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(quantiles[49], 2),
+            "p95": round(quantiles[94], 2),
+            "p99": round(quantiles[98], 2),
+        },
+        "db_pool_size": app.config["BOT_DB_POOL_SIZE"],
+        "concurrent_updates": app.config["BOT_CONCURRENT_UPDATES"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
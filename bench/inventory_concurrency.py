@@ -0,0 +1,185 @@
+"""
+Нагрузочный тест резервов склада: много потоков одновременно резервируют
+несколько «горячих» материалов под разные проекты.
+
+Проверяет, что резервов не больше, чем было на складе, снимок
+(materials.reserved_quantity) равен сумме успешных резервов, а журнал
+движений сходится со снимком. Печатает JSON: пропускная способность,
+p50/p95/p99 одной операции, отказы и результат сверки.
+
+    python bench/inventory_concurrency.py --threads 16 --operations 2000
+    python bench/inventory_concurrency.py --database-url postgresql://...
+
+Код выхода 1, если хоть одна проверка не прошла.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(sorted_values, q):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[q - 1]
+
+
+def _prepare(app, materials, projects, stock):
+    from sqlalchemy import insert, select
+
+    from app.extensions import db
+    from app.models import Material, Project
+    from app.services import inventory
+
+    with app.app_context():
+        db.session.execute(insert(Project), [
+            {"name": f"bench-{i}", "client": "bench", "status": "active"} for i in range(projects)
+        ])
+        db.session.execute(insert(Material), [
+            {"name": f"bench-{i}", "unit": "шт", "price_per_unit": 1.0, "stock_quantity": 0.0}
+            for i in range(materials)
+        ])
+        db.session.commit()
+        project_ids = list(db.session.scalars(select(Project.id).where(Project.client == "bench")))
+        material_ids = list(db.session.scalars(select(Material.id).where(Material.name.like("bench-%"))))
+        for material_id in material_ids:
+            inventory.run_movement(db.engine, "receipt", material_id, stock, note="bench")
+    return material_ids, project_ids
+
+
+def run(app, threads, operations, material_ids, project_ids, quantity, seed):
+    from app.extensions import db
+    from app.services import inventory
+
+    with app.app_context():
+        engine = db.engine
+
+    rng = random.Random(seed)
+    plan = [(rng.choice(material_ids), rng.choice(project_ids)) for _ in range(operations)]
+    lock = threading.Lock()
+    latencies = []
+    reserved = {}  # material_id -> успешно зарезервировано
+    counts = {"ok": 0, "rejected": 0, "errors": 0}
+    start = threading.Barrier(threads)
+
+    def worker(part):
+        start.wait()
+        local = []
+        for material_id, project_id in part:
+            t0 = time.perf_counter()
+            try:
+                inventory.run_movement(engine, "reserve", material_id, quantity, project_id=project_id)
+                outcome = "ok"
+            except inventory.StockError:
+                outcome = "rejected"
+            except Exception:
+                outcome = "errors"
+            local.append(time.perf_counter() - t0)
+            with lock:
+                counts[outcome] += 1
+                if outcome == "ok":
+                    reserved[material_id] = reserved.get(material_id, 0.0) + quantity
+        with lock:
+            latencies.extend(local)
+
+    pool = [
+        threading.Thread(target=worker, args=(plan[i::threads],)) for i in range(threads)
+    ]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda q: round(_percentile(latencies, q) * 1000, 2)  # noqa: E731
+    return {
+        "threads": threads,
+        "operations": operations,
+        "elapsed_s": round(elapsed, 3),
+        "ops_per_second": round(operations / elapsed, 1),
+        "p50_ms": ms(50),
+        "p95_ms": ms(95),
+        "p99_ms": ms(99),
+        **counts,
+    }, reserved
+
+
+def verify(app, material_ids, stock, reserved):
+    """Сверка снимка с успешными операциями и с журналом"""
+    from app.extensions import db
+    from app.services import inventory
+
+    problems = []
+    with app.app_context():
+        conn = db.session.connection()
+        for material_id in material_ids:
+            snapshot = inventory.stock_of(conn, material_id)
+            ledger = inventory.reconcile(conn, material_id)
+            held = sum(q for _, q in inventory.reservations_of(conn, material_id))
+            expected = reserved.get(material_id, 0.0)
+            if snapshot["reserved"] > stock + inventory.EPSILON:
+                problems.append(f"material {material_id}: oversold {snapshot['reserved']} > {stock}")
+            if abs(snapshot["reserved"] - expected) > 1e-6:
+                problems.append(f"material {material_id}: reserved {snapshot['reserved']} != ok {expected}")
+            if abs(held - snapshot["reserved"]) > 1e-6:
+                problems.append(f"material {material_id}: reservations {held} != snapshot")
+            if abs(ledger["on_hand"] - snapshot["on_hand"]) > 1e-6 or abs(ledger["reserved"] - snapshot["reserved"]) > 1e-6:
+                problems.append(f"material {material_id}: ledger {ledger} != snapshot {snapshot}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--materials", type=int, default=4, help="число «горячих» материалов")
+    parser.add_argument("--projects", type=int, default=20)
+    # по умолчанию остатка меньше, чем операций: часть резервов обязана
+    # получить отказ, иначе защита от перепродажи не проверяется
+    parser.add_argument("--stock", type=float, default=100.0, help="начальный остаток материала")
+    parser.add_argument("--quantity", type=float, default=1.0, help="размер одного резерва")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="по умолчанию — временный файл SQLite")
+    parser.add_argument("-o", "--output", help="куда записать JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix="crm-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("REQUEST_LOG", "0")
+    # пул не меньше числа потоков, иначе замеряется ожидание соединения
+    os.environ.setdefault("DB_POOL_SIZE", str(args.threads))
+
+    from app import create_app
+
+    app = create_app()
+    material_ids, project_ids = _prepare(app, args.materials, args.projects, args.stock)
+    report, reserved = run(
+        app, args.threads, args.operations, material_ids, project_ids, args.quantity, args.seed
+    )
+    report["database"] = app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0]
+    report["problems"] = verify(app, material_ids, args.stock, reserved)
+
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+    return 1 if report["problems"] or report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
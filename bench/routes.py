@@ -0,0 +1,199 @@
+"""
+Бенчмарк маршрутов CRM через Flask test client.
+
+Заполняет временную БД синтетическими данными, прогоняет маршруты
+всех blueprint'ов от имени залогиненного администратора и печатает JSON:
+перцентили задержки, число SQL-запросов и пиковую память на маршрут.
+
+    python bench/routes.py --projects 1000 --tasks-per-project 50 -o new.json
+    python bench/routes.py ... --baseline old.json --max-regression 0.25
+
+С --baseline код выхода 1, если p95 вырос больше чем на max-regression
+или маршрут стал делать больше запросов.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (имя, blueprint, URL); {project_id} подставляется из данных
+ROUTES = (
+    ("dashboard", "dashboard", "/dashboard/"),
+    ("projects_list", "projects", "/projects/"),
+    ("projects_list_filtered", "projects", "/projects/?status=active&sort=name&per_page=100"),
+    ("project_detail", "projects", "/projects/{project_id}"),
+    ("project_comments", "projects", "/projects/{project_id}/comments.json"),
+    ("tasks_list", "tasks", "/tasks/"),
+    ("tasks_list_filtered", "tasks", "/tasks/?status=to_do&priority=high&per_page=100"),
+    ("tasks_by_project", "tasks", "/tasks/?project_id={project_id}"),
+    ("materials_list", "materials", "/materials/"),
+    ("auth_login", "auth", "/auth/login"),
+    ("search", "search", "/search/?q=бетон"),
+    ("costs_summary", "costs", "/costs/summary.json"),
+    ("timeline_data", "timeline", "/timeline/data.json"),
+    ("api_projects", "api", "/api/v1/projects?fields=name,status&include=tasks&fields[tasks]=id,status"),
+    ("api_tasks_batch", "api", "/api/v1/tasks?ids=" + ",".join(str(i) for i in range(1, 201))),
+)
+
+
+def _percentile(sorted_values, q):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[q - 1]
+
+
+def run_benchmark(app, iterations, warmup, project_id):
+    from sqlalchemy import event
+
+    from app.extensions import db
+
+    query_count = [0]
+
+    def _count(*args):
+        query_count[0] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _count)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+
+    results = {}
+    for name, blueprint, template in ROUTES:
+        url = template.format(project_id=project_id)
+        for _ in range(warmup):
+            client.get(url)
+
+        timings, queries, status = [], [], None
+        for _ in range(iterations):
+            query_count[0] = 0
+            started = time.perf_counter()
+            response = client.get(url)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(query_count[0])
+            status = response.status_code
+
+        # память отдельным проходом: tracemalloc заметно замедляет запросы
+        gc.collect()
+        tracemalloc.start()
+        client.get(url).get_data()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings.sort()
+        results[name] = {
+            "blueprint": blueprint,
+            "url": url,
+            "status": status,
+            "latency_ms": {
+                "p50": round(_percentile(timings, 50), 3),
+                "p95": round(_percentile(timings, 95), 3),
+                "p99": round(_percentile(timings, 99), 3),
+                "max": round(timings[-1], 3),
+            },
+            "queries_per_request": max(queries),
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+
+    event.remove(engine, "before_cursor_execute", _count)
+    return results
+
+
+def compare(baseline, current, max_regression):
+    """Список описаний регрессий относительно baseline"""
+    problems = []
+    for name, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None:
+            continue
+        old_p95, new_p95 = before["latency_ms"]["p95"], now["latency_ms"]["p95"]
+        if old_p95 > 0 and new_p95 > old_p95 * (1 + max_regression):
+            problems.append(f"{name}: p95 {old_p95:.2f}ms -> {new_p95:.2f}ms")
+        if now["queries_per_request"] > before["queries_per_request"]:
+            problems.append(
+                f"{name}: queries {before['queries_per_request']} -> {now['queries_per_request']}"
+            )
+        if now["status"] != before["status"]:
+            problems.append(f"{name}: status {before['status']} -> {now['status']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--tasks-per-project", type=int, default=25)
+    parser.add_argument("--materials", type=int, default=500)
+    parser.add_argument("--materials-per-project", type=int, default=5)
+    parser.add_argument("--comments-per-project", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--database-url", help="по умолчанию — временный файл SQLite")
+    parser.add_argument("-o", "--output", help="куда записать JSON (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix="crm-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # JSON-лог каждого запроса только мешает замерам
+    os.environ.setdefault("REQUEST_LOG", "0")
+
+    from app import create_app
+    from bench.seed import seed_database
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        counts = seed_database(
+            users=args.users,
+            projects=args.projects,
+            tasks_per_project=args.tasks_per_project,
+            materials=args.materials,
+            materials_per_project=args.materials_per_project,
+            comments_per_project=args.comments_per_project,
+        )
+    seed_seconds = time.perf_counter() - started
+
+    report = {
+        "scale": counts,
+        "seed_seconds": round(seed_seconds, 2),
+        "iterations": args.iterations,
+        "dialect": app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+        "routes": run_benchmark(app, args.iterations, args.warmup, project_id=1),
+    }
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(json.load(f), report, args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Синтетические данные для бенчмарков: пакетные INSERT без ORM-объектов"""
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app.extensions import db
+from app.models import (
+    TASK_PRIORITY_CHOICES,
+    TASK_STATUS_CHOICES,
+    Comment,
+    Material,
+    Project,
+    ProjectMaterial,
+    Task,
+    User,
+)
+from app.services.costs import rebuild_rollups
+from app.services.search import rebuild_search_index
+
+WORDS = (
+    "монтаж бетон арматура кровля фасад окна двери электрика сантехника "
+    "отделка фундамент смета поставка проект клиент договор акт проверка "
+    "install concrete roof facade wiring plumbing delivery invoice review"
+).split()
+
+
+def _text(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _chunked_insert(model, rows, chunk=5000):
+    for start in range(0, len(rows), chunk):
+        db.session.execute(insert(model), rows[start:start + chunk])
+
+
+def seed_database(
+    users=10,
+    projects=100,
+    tasks_per_project=20,
+    materials=200,
+    materials_per_project=5,
+    comments_per_project=10,
+    seed=42,
+):
+    """
+    Заполняет пустую БД в текущем app context. Первый пользователь — admin.
+    Поисковый индекс и стоимости пересчитываются одним проходом в конце.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    roles = ("admin", "manager", "user")
+
+    _chunked_insert(User, [
+        {
+            "telegram_id": 1_000_000 + i,
+            "username": f"user{i}",
+            "first_name": f"Пользователь {i}",
+            "role": "admin" if i == 0 else roles[i % 3],
+        }
+        for i in range(users)
+    ])
+    _chunked_insert(Material, [
+        {
+            "name": f"Материал {i} {rng.choice(WORDS)}",
+            "unit": rng.choice(("шт", "кг", "м", "м2", "л")),
+            "price_per_unit": round(rng.uniform(1, 5000), 2),
+            "stock_quantity": round(rng.uniform(0, 1000), 1),
+            "description": _text(rng, 8),
+        }
+        for i in range(materials)
+    ])
+    _chunked_insert(Project, [
+        {
+            "name": f"Проект {i} {rng.choice(WORDS)}",
+            "client": f"Клиент {i % 97}",
+            "status": rng.choice(("active", "active", "on_hold", "closed")),
+            "deadline": now + timedelta(days=rng.randint(-60, 180)),
+            "description": _text(rng, 20),
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now,
+        }
+        for i in range(projects)
+    ])
+    db.session.flush()
+
+    user_ids = db.session.scalars(select(User.id)).all()
+    material_ids = db.session.scalars(select(Material.id)).all()
+    project_ids = db.session.scalars(select(Project.id)).all()
+
+    tasks, links, comments = [], [], []
+    for pid in project_ids:
+        for t in range(tasks_per_project):
+            start = now - timedelta(days=rng.randint(0, 120))
+            tasks.append({
+                "title": f"Задача {pid}-{t} {rng.choice(WORDS)}",
+                "description": _text(rng, 15),
+                "status": rng.choice(TASK_STATUS_CHOICES),
+                "priority": rng.choice(TASK_PRIORITY_CHOICES),
+                "start_date": start,
+                "end_date": start + timedelta(days=rng.randint(1, 60)),
+                "project_id": pid,
+                "created_at": start,
+                "updated_at": start,
+            })
+        for mid in rng.sample(material_ids, min(materials_per_project, len(material_ids))):
+            links.append({"project_id": pid, "material_id": mid, "quantity": rng.randint(1, 100)})
+        for c in range(comments_per_project):
+            comments.append({
+                "project_id": pid,
+                "user_id": rng.choice(user_ids),
+                "text": _text(rng, 12),
+                "created_at": now - timedelta(minutes=c),
+                "updated_at": now,
+            })
+    _chunked_insert(Task, tasks)
+    _chunked_insert(ProjectMaterial, links)
+    _chunked_insert(Comment, comments)
+
+    conn = db.session.connection()
+    rebuild_search_index(conn)
+    rebuild_rollups(conn)
+    db.session.commit()
+    return {
+        "users": users,
+        "projects": projects,
+        "tasks": len(tasks),
+        "materials": materials,
+        "project_materials": len(links),
+        "comments": len(comments),
+    }
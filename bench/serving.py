@@ -0,0 +1,270 @@
+"""
+Сравнение режимов запуска веб-сервера под нагрузкой.
+
+Заполняет временную SQLite-БД, по очереди поднимает сервер в каждом
+режиме и гоняет по маршрутам из bench/routes.py CONCURRENCY клиентов
+с keep-alive в течение DURATION секунд. Печатает JSON: запросы в секунду,
+p50/p95/p99, ошибки на режим.
+
+Режимы:
+  dev     — python run.py (сервер разработки Flask, как раньше);
+  sync    — gunicorn, sync-воркеры: один запрос на процесс;
+  gthread — gunicorn -c gunicorn_conf.py (по умолчанию в продакшене);
+  gevent  — gunicorn с GUNICORN_WORKER_CLASS=gevent;
+  asgi    — uvicorn asgi:app.
+Режимы, для которых не установлен сервер, пропускаются.
+
+--stream-clients держит столько SSE-потоков (/projects/1/comments/stream)
+открытыми всё время замера — так видно, что долгие соединения делают
+с sync-воркерами.
+
+    python bench/serving.py --modes dev,sync,gthread --concurrency 32 --duration 15
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("dev", "sync", "gthread", "gevent", "asgi")
+# модуль, без которого режим не запустить
+_REQUIRES = {"sync": "gunicorn", "gthread": "gunicorn", "gevent": "gevent", "asgi": "uvicorn"}
+
+
+def _percentile(sorted_values, q):
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[q - 1]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _command(mode, port):
+    """(команда, доп. переменные окружения) для режима"""
+    gunicorn = [sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py", "wsgi:app"]
+    bind = {"WEB_BIND": f"127.0.0.1:{port}"}
+    if mode == "dev":
+        return [sys.executable, "run.py"], {"PORT": str(port)}
+    if mode == "sync":
+        return gunicorn, dict(bind, GUNICORN_WORKER_CLASS="sync")
+    if mode == "gthread":
+        return gunicorn, dict(bind, GUNICORN_WORKER_CLASS="gthread")
+    if mode == "gevent":
+        return gunicorn, dict(bind, GUNICORN_WORKER_CLASS="gevent")
+    if mode == "asgi":
+        workers = str(os.cpu_count() or 1)
+        return [
+            sys.executable, "-m", "uvicorn", "asgi:app",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", workers, "--log-level", "warning",
+        ], {}
+    raise ValueError(mode)
+
+
+def _wait_ready(port, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/auth/login")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def _session_cookie(app):
+    """Подписанная cookie сессии администратора (user id 1)"""
+    serializer = app.session_interface.get_signing_serializer(app)
+    name = app.config["SESSION_COOKIE_NAME"]
+    return f"{name}={serializer.dumps({'_user_id': '1', '_fresh': True})}"
+
+
+def _load(port, urls, cookie, concurrency, duration):
+    latencies = []
+    counts = {"ok": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        local, ok, errors = [], 0, 0
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = offset
+        while time.monotonic() < deadline:
+            url = urls[i % len(urls)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", url, headers={"Cookie": cookie})
+                response = conn.getresponse()
+                response.read()
+                if response.status < 400:
+                    ok += 1
+                else:
+                    errors += 1
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            local.append(time.perf_counter() - t0)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            counts["ok"] += ok
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        return dict(counts, requests=0)
+    ms = lambda q: round(_percentile(latencies, q) * 1000, 2)  # noqa: E731
+    return dict(
+        counts,
+        requests=len(latencies),
+        rps=round(len(latencies) / elapsed, 1),
+        p50_ms=ms(50),
+        p95_ms=ms(95),
+        p99_ms=ms(99),
+    )
+
+
+def _open_streams(port, cookie, count, stop):
+    """Держит count SSE-соединений открытыми до stop.set()"""
+    def stream():
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/projects/1/comments/stream", headers={"Cookie": cookie})
+            response = conn.getresponse()
+            while not stop.is_set():
+                try:
+                    if not response.read1(1024):
+                        return
+                except socket.timeout:
+                    continue
+        except (OSError, http.client.HTTPException):
+            return
+
+    threads = [threading.Thread(target=stream, daemon=True) for _ in range(count)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def run_mode(mode, env, urls, cookie, args):
+    port = _free_port()
+    command, extra = _command(mode, port)
+    # лог сервера — в файл: заполненный pipe остановил бы сервер на записи
+    log = tempfile.TemporaryFile(mode="w+")
+    proc = subprocess.Popen(
+        command, cwd=ROOT, env=dict(env, **extra), stdout=log, stderr=subprocess.STDOUT,
+    )
+    stop = threading.Event()
+    try:
+        _wait_ready(port, proc)
+        _load(port, urls, cookie, args.concurrency, min(2.0, args.duration))  # прогрев
+        _open_streams(port, cookie, args.stream_clients, stop)
+        time.sleep(0.5 if args.stream_clients else 0)
+        return _load(port, urls, cookie, args.concurrency, args.duration)
+    except RuntimeError as exc:
+        log.seek(0)
+        return {"error": str(exc), "log": log.read()[-2000:]}
+    finally:
+        stop.set()
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--stream-clients", type=int, default=0)
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--tasks-per-project", type=int, default=25)
+    parser.add_argument("-o", "--output", help="куда записать JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="crm-serving-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        REQUEST_LOG="0",
+        SECRET_KEY="bench-secret",
+        LOG_LEVEL="WARNING",
+        # процессный кэш фрагментов у каждого воркера свой — сравнение честнее без него
+        RESPONSE_CACHE=os.environ.get("RESPONSE_CACHE", "none"),
+    )
+    os.environ.update(env)
+    os.environ.pop("TELEGRAM_BOT_TOKEN", None)
+    env.pop("TELEGRAM_BOT_TOKEN", None)
+
+    from app import create_app
+    from bench.routes import ROUTES
+    from bench.seed import seed_database
+
+    app = create_app()
+    with app.app_context():
+        counts = seed_database(projects=args.projects, tasks_per_project=args.tasks_per_project)
+    cookie = _session_cookie(app)
+    urls = [quote(url.format(project_id=1), safe="/?=&,[]:") for _, _, url in ROUTES]
+
+    report = {
+        "scale": counts,
+        "cpu_count": os.cpu_count(),
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "stream_clients": args.stream_clients,
+        "modes": {},
+    }
+    for mode in args.modes.split(","):
+        required = _REQUIRES.get(mode)
+        if required and importlib.util.find_spec(required) is None:
+            report["modes"][mode] = {"skipped": f"{required} is not installed"}
+            continue
+        report["modes"][mode] = run_mode(mode, env, urls, cookie, args)
+
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
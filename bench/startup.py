@@ -0,0 +1,111 @@
+"""
+Замер холодного старта приложения в отдельных процессах.
+
+Для каждого прогона: запуск интерпретатора, импорт пакета app,
+create_app() и первый ответ (/health без БД и /auth/login с шаблоном).
+Первый прогон идёт на пустой БД (создание схемы), остальные — на уже
+обновлённой. Плюс самые тяжёлые модули по данным python -X importtime.
+
+    python bench/startup.py --runs 5 -o startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app as package
+t1 = time.perf_counter()
+application = package.create_app()
+t2 = time.perf_counter()
+client = application.test_client()
+client.get("/health")
+t3 = time.perf_counter()
+client.get("/auth/login")
+t4 = time.perf_counter()
+print(json.dumps({
+    "import": t1 - t0,
+    "create_app": t2 - t1,
+    "first_response": t3 - t2,
+    "first_page": t4 - t3,
+}))
+"""
+
+
+def _probe(env, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", _PROBE]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - started
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    timings["process_wall"] = wall
+    return timings, proc.stderr
+
+
+def _heaviest_imports(stderr, top):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative.isdigit():
+            rows.append((int(cumulative), name))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+
+def _summary(runs):
+    keys = runs[0].keys()
+    return {
+        key: {
+            "median_ms": round(statistics.median(r[key] for r in runs) * 1000, 1),
+            "max_ms": round(max(r[key] for r in runs) * 1000, 1),
+        }
+        for key in keys
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="прогонов на обновлённой БД")
+    parser.add_argument("--top", type=int, default=15, help="сколько модулей показать")
+    parser.add_argument("-o", "--output", help="куда записать JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="crm-startup-")
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+    env["REQUEST_LOG"] = "0"
+
+    cold, _ = _probe(env)
+    warm = [_probe(env)[0] for _ in range(args.runs)]
+    _, importtime = _probe(env, importtime=True)
+
+    report = {
+        "python": sys.version.split()[0],
+        "empty_database": {f"{k}_ms": round(v * 1000, 1) for k, v in cold.items()},
+        "migrated_database": _summary(warm),
+        "heaviest_imports": _heaviest_imports(importtime, args.top),
+    }
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
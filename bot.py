@@ -1,5 +1,9 @@
+import asyncio
 import os
 import logging
+import threading
+from datetime import datetime
+
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
@@ -13,6 +17,31 @@ logger = logging.getLogger(__name__)
 # Получаем токен бота из переменных окружения
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 WEBAPP_URL = os.getenv('WEBAPP_URL', 'https://crm-flask-ricn.onrender.com')
+# адрес Bot API (для нагрузочного теста — локальный фейковый сервер)
+BOT_API_URL = os.getenv('TELEGRAM_BOT_API_URL')
+
+STATUS_LABELS = {"to_do": "к выполнению", "in_progress": "в работе", "done": "готово"}
+
+
+def _fmt_date(value):
+    return value.strftime('%d.%m.%Y') if value else '—'
+
+
+def _data(context):
+    return context.application.bot_data["crm"]
+
+
+async def _crm_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Пользователь CRM по telegram_id; незарегистрированным — подсказка"""
+    from app.services.bot_data import find_user
+
+    user = await _data(context).run(find_user, update.effective_user.id)
+    if user is None:
+        await update.message.reply_text(
+            f"Вы не зарегистрированы в CRM. Войдите через {WEBAPP_URL}/auth/login"
+        )
+    return user
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Отправляет сообщение при получении команды /start"""
@@ -29,26 +58,192 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     await update.message.reply_text(
         "Доступные команды:\n"
         "/start - Начать работу с ботом\n"
+        "/tasks - Открытые задачи\n"
+        "/due [дней] - Задачи с дедлайном в ближайшие дни и просроченные\n"
+        "/project <id> - Сводка по проекту\n"
+        "/status <id задачи> <to_do|in_progress|done> - Сменить статус задачи\n"
         "/help - Показать это сообщение\n\n"
         f"Веб-интерфейс: {WEBAPP_URL}"
     )
 
-def main() -> None:
+
+async def tasks_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Открытые задачи, ближайшие дедлайны первыми"""
+    from app.services.bot_data import open_tasks
+
+    if await _crm_user(update, context) is None:
+        return
+    rows = await _data(context).run(open_tasks)
+    if not rows:
+        await update.message.reply_text("Открытых задач нет")
+        return
+    lines = [
+        f"#{task_id} {title} [{project}] — {STATUS_LABELS.get(status, status)}, "
+        f"{priority}, до {_fmt_date(end_date)}"
+        for task_id, title, status, priority, end_date, project in rows
+    ]
+    await update.message.reply_text("\n".join(lines))
+
+
+async def due_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Задачи с дедлайном в ближайшие N дней (по умолчанию 3) и просроченные"""
+    from app.services.bot_data import due_tasks
+
+    if await _crm_user(update, context) is None:
+        return
+    try:
+        days = int(context.args[0]) if context.args else 3
+    except ValueError:
+        await update.message.reply_text("Использование: /due [дней]")
+        return
+
+    now = datetime.utcnow()
+    rows = await _data(context).run(due_tasks, now, days)
+    if not rows:
+        await update.message.reply_text(f"Задач с дедлайном в ближайшие {days} дн. нет")
+        return
+    lines = []
+    for task_id, title, status, end_date, project in rows:
+        mark = "⚠️ " if end_date < now else ""
+        lines.append(f"{mark}#{task_id} {title} [{project}] — до {_fmt_date(end_date)}")
+    await update.message.reply_text("\n".join(lines))
+
+
+async def project_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Сводка по проекту: статус, дедлайн, задачи по статусам"""
+    from app.services.bot_data import project_summary
+
+    if await _crm_user(update, context) is None:
+        return
+    try:
+        project_id = int(context.args[0])
+    except (IndexError, ValueError):
+        await update.message.reply_text("Использование: /project <id>")
+        return
+
+    summary = await _data(context).run(project_summary, project_id)
+    if summary is None:
+        await update.message.reply_text(f"Проект {project_id} не найден")
+        return
+    project, by_status = summary
+    tasks = ", ".join(
+        f"{STATUS_LABELS.get(s, s)}: {n}" for s, n in sorted(by_status.items())
+    ) or "нет"
+    await update.message.reply_text(
+        f"{project.name} (#{project.id})\n"
+        f"Клиент: {project.client or '—'}\n"
+        f"Статус: {project.status}\n"
+        f"Дедлайн: {_fmt_date(project.deadline)}\n"
+        f"Задачи: {tasks}\n"
+        f"{WEBAPP_URL}/projects/{project.id}"
+    )
+
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Смена статуса задачи: /status <id> <to_do|in_progress|done>"""
+    from app.models import TASK_STATUS_CHOICES
+    from app.services.bot_data import set_task_status
+    from app.services.dashboard_stats import invalidate_dashboard_counters
+
+    user = await _crm_user(update, context)
+    if user is None:
+        return
+    try:
+        task_id = int(context.args[0])
+        status = context.args[1]
+    except (IndexError, ValueError):
+        status = None
+    if status not in TASK_STATUS_CHOICES:
+        await update.message.reply_text(
+            f"Использование: /status <id задачи> <{'|'.join(TASK_STATUS_CHOICES)}>"
+        )
+        return
+
+    title = await _data(context).run(set_task_status, task_id, status, user.id)
+    if title is None:
+        await update.message.reply_text(f"Задача {task_id} не найдена")
+        return
+    invalidate_dashboard_counters()
+    await update.message.reply_text(f"#{task_id} {title}: {STATUS_LABELS[status]}")
+
+
+async def _start_notifier(application: Application) -> None:
+    """Фоновая рассылка уведомлений о дедлайнах в event loop бота"""
+    from app.services.notifications import BotTransport, DeadlineNotifier
+
+    flask_app = application.bot_data["flask_app"]
+    notifier = DeadlineNotifier.from_app(
+        flask_app, application.bot_data["crm"], BotTransport(application.bot)
+    )
+    application.bot_data["notifier_task"] = asyncio.create_task(
+        notifier.run_forever(flask_app.config["NOTIFY_INTERVAL"])
+    )
+
+
+async def _stop_notifier(application: Application) -> None:
+    task = application.bot_data.pop("notifier_task", None)
+    if task is not None:
+        task.cancel()
+
+
+def build_application(flask_app, token, base_url=None, notifications=False):
+    """Приложение бота с обработчиками и доступом к данным CRM"""
+    from app.services.bot_data import BotDataAccess
+
+    builder = (
+        Application.builder()
+        .token(token)
+        # обновления обрабатываются параллельно, медленный запрос
+        # одного пользователя не задерживает остальных
+        .concurrent_updates(flask_app.config["BOT_CONCURRENT_UPDATES"])
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    if notifications:
+        builder = builder.post_init(_start_notifier).post_stop(_stop_notifier)
+    application = builder.build()
+    application.bot_data["flask_app"] = flask_app
+    application.bot_data["crm"] = BotDataAccess.from_app(flask_app)
+
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("tasks", tasks_command))
+    application.add_handler(CommandHandler("due", due_command))
+    application.add_handler(CommandHandler("project", project_command))
+    application.add_handler(CommandHandler("status", status_command))
+    return application
+
+
+def main(flask_app=None) -> None:
     """Запуск бота"""
     if not BOT_TOKEN:
         logger.error("Не установлена переменная окружения TELEGRAM_BOT_TOKEN")
         return
-    
+
+    if flask_app is None:
+        from app import create_app
+        flask_app = create_app()
+
     # Создаём приложение бота
-    application = Application.builder().token(BOT_TOKEN).build()
-    
-    # Регистрируем обработчики команд
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    
+    application = build_application(
+        flask_app,
+        BOT_TOKEN,
+        base_url=BOT_API_URL,
+        notifications=flask_app.config["NOTIFY_ENABLED"],
+    )
+
+    # вне главного потока нет event loop и нельзя ставить обработчики сигналов
+    polling_options = {}
+    if threading.current_thread() is not threading.main_thread():
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        polling_options["stop_signals"] = None
+
     # Запускаем бота
     logger.info("Бот запущен...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    try:
+        application.run_polling(allowed_updates=Update.ALL_TYPES, **polling_options)
+    finally:
+        application.bot_data["crm"].close()
 
 if __name__ == '__main__':
     main()
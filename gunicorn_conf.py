@@ -0,0 +1,74 @@
+"""
+Настройки gunicorn, выведенные из числа CPU:
+
+    gunicorn -c gunicorn_conf.py wsgi:app
+
+GUNICORN_WORKER_CLASS:
+  gthread (по умолчанию) — (2 * CPU + 1) процессов по WEB_THREADS потоков:
+      поток, ждущий БД, не блокирует остальные запросы воркера;
+  gevent — CPU процессов по WEB_WORKER_CONNECTIONS гринлетов: для SSE
+      и множества долгих соединений (нужен пакет gevent; для PostgreSQL
+      ещё psycogreen, иначе psycopg2 блокирует весь воркер). Одновременных
+      запросов к БД всё равно не больше DB_POOL_SIZE + DB_MAX_OVERFLOW;
+  sync — прежний режим: один запрос на процесс.
+
+Любое значение перекрывается переменными окружения WEB_*.
+"""
+
+import multiprocessing
+import os
+
+cpu = multiprocessing.cpu_count()
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+bind = os.environ.get("WEB_BIND", f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+if worker_class == "gevent":
+    _workers, _threads = cpu, 1
+elif worker_class == "gthread":
+    _workers, _threads = 2 * cpu + 1, 4
+else:
+    _workers, _threads = 2 * cpu + 1, 1
+workers = int(os.environ.get("WEB_WORKERS", _workers))
+threads = int(os.environ.get("WEB_THREADS", _threads))
+worker_connections = int(os.environ.get("WEB_WORKER_CONNECTIONS", 1000))
+
+# потоков SSE на воркер (SSE_MAX_STREAMS приложения): гринлеты gevent
+# дешёвые, в gthread поток SSE занимает один из threads, в sync — весь
+# процесс, поэтому там живые комментарии идут опросом
+if worker_class == "gevent":
+    _sse_streams = worker_connections // 2
+elif worker_class == "gthread":
+    _sse_streams = threads // 4
+else:
+    _sse_streams = 0
+os.environ.setdefault("SSE_MAX_STREAMS", str(_sse_streams))
+
+# keep-alive чуть короче idle-таймаута балансировщика перед gunicorn
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+timeout = int(os.environ.get("WEB_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+
+# приложение и миграции (AUTO_MIGRATE) — один раз в мастере, воркеры
+# получают готовый код через fork; пул соединений после fork сбрасывается
+# (app.engine_profiles.install_fork_safety). gevent патчит стандартную
+# библиотеку уже в воркере, поэтому там приложение грузится после патча
+preload_app = os.environ.get("WEB_PRELOAD", "0" if worker_class == "gevent" else "1") == "1"
+
+# плавная замена воркеров против утечек памяти
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", 200))
+
+accesslog = os.environ.get("WEB_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info").lower()
+
+
+def post_fork(server, worker):
+    if worker_class != "gevent":
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        return
+    patch_psycopg()
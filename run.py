@@ -12,15 +12,20 @@ def start_bot():
     
     try:
         import bot
-        bot.main()
+        bot.main(app)
     except Exception as e:
         print(f"Ошибка запуска бота: {e}")
 
 if __name__ == "__main__":
-    # Запускаем бота в фоновом режиме
-    bot_thread = threading.Thread(target=start_bot, daemon=True)
-    bot_thread.start()
-    print("Бот запущен в фоновом режиме")
+    # Сервер разработки. В продакшене: gunicorn -c gunicorn_conf.py wsgi:app
+    # и бот отдельным процессом: python run_bot.py
+    # BOT_IN_PROCESS=1 — по-старому запустить бота потоком рядом с сервером
+    if os.getenv('BOT_IN_PROCESS') == '1':
+        bot_thread = threading.Thread(target=start_bot, daemon=True)
+        bot_thread.start()
+        print("Бот запущен в фоновом режиме")
+    else:
+        print("Бот не запущен: python run_bot.py или BOT_IN_PROCESS=1")
     
     # Запускаем Flask приложение
     app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=False)
@@ -0,0 +1,71 @@
+"""
+Отдельный процесс Telegram-бота под присмотром супервизора:
+
+    python run_bot.py
+
+Бот (bot.py) запускается дочерним процессом. Упал — перезапуск с
+экспоненциальной паузой от 1 секунды до BOT_RESTART_MAX_DELAY; проработал
+дольше BOT_HEALTHY_SECONDS — пауза сбрасывается. SIGTERM/SIGINT
+передаются боту, после его выхода супервизор завершается. Код выхода 0
+(например, нет TELEGRAM_BOT_TOKEN) перезапуска не вызывает.
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+)
+logger = logging.getLogger("bot-supervisor")
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+
+
+def supervise(command, max_delay, healthy_seconds):
+    stopping = False
+    child = None
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        if child is not None and child.poll() is None:
+            child.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    delay = 1.0
+    while True:
+        started = time.monotonic()
+        child = subprocess.Popen(command)
+        logger.info("бот запущен, pid %s", child.pid)
+        code = child.wait()
+        if stopping:
+            logger.info("бот остановлен (код %s)", code)
+            return 0
+        if code == 0:
+            logger.info("бот завершился штатно")
+            return 0
+
+        if time.monotonic() - started >= healthy_seconds:
+            delay = 1.0
+        logger.warning("бот упал с кодом %s, перезапуск через %.0f с", code, delay)
+        deadline = time.monotonic() + delay
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.2)
+        if stopping:
+            return 0
+        delay = min(delay * 2, max_delay)
+
+
+if __name__ == "__main__":
+    sys.exit(supervise(
+        [sys.executable, BOT_SCRIPT],
+        max_delay=float(os.environ.get("BOT_RESTART_MAX_DELAY", 60)),
+        healthy_seconds=float(os.environ.get("BOT_HEALTHY_SECONDS", 60)),
+    ))
@@ -0,0 +1,13 @@
+"""
+WSGI-точка входа для продакшена:
+
+    gunicorn -c gunicorn_conf.py wsgi:app
+
+Telegram-бот здесь не запускается — он работает отдельным процессом
+(python run_bot.py), чтобы падение или долгий опрос Bot API не занимали
+веб-воркеры.
+"""
+
+from app import create_app
+
+app = create_app()